@@ -0,0 +1,166 @@
+"""Run a JSONL file of questions through one or more model variants.
+
+Usage: ``python -m backend.batch questions.jsonl [--variant finetuned]
+[--variant baseline] [--output results.ndjson] [--save]``
+
+Each input line is ``{"id": ..., "message": ..., "history": [...]}`` (``id``
+and ``history`` are optional). One NDJSON result per question and variant is
+written as soon as it completes, so output order differs from input order.
+Conversations are only written to ``chat_logs/`` with ``--save``.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import sys
+import time
+
+from pydantic import ValidationError
+
+from . import config
+from .schemas import BatchItem
+from .services.admission import AdmissionRejected
+from .services.vllm_client import generate_reply
+from .storage import save_conversation_later
+
+logger = logging.getLogger(__name__)
+
+
+def parse_items(lines):
+    """Parse JSONL lines into ``BatchItem``s; raises ``ValueError``."""
+
+    items = []
+    for number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            items.append(BatchItem.model_validate_json(line))
+        except ValidationError as exc:
+            raise ValueError(f"line {number}: {exc}") from None
+    return items
+
+
+async def _run_one(index, item, variant, save, semaphore):
+    started = time.perf_counter()
+    result = {"index": index, "id": item.id, "variant": variant}
+    async with semaphore:
+        while True:
+            try:
+                (reply, usage), model_label = await generate_reply(
+                    item.history,
+                    item.message,
+                    variant,
+                    priority_class="batch",
+                )
+                break
+            except AdmissionRejected as exc:
+                await asyncio.sleep(exc.retry_after)
+            except Exception as exc:  # noqa: BLE001
+                logger.exception("Batch item %s failed on %s", index, variant)
+                result["error"] = str(exc)
+                result["elapsed_seconds"] = time.perf_counter() - started
+                return result
+
+    result.update(
+        model=model_label,
+        reply=reply,
+        usage=usage.model_dump() if usage else None,
+        elapsed_seconds=time.perf_counter() - started,
+    )
+    if save:
+        record = await save_conversation_later(
+            None,
+            item.message,
+            reply,
+            [msg.dict() for msg in item.history],
+        )
+        result["conversation_id"] = record["id"]
+    return result
+
+
+async def run_batch(items, variants, save=False):
+    """Yield one result dict per ``(item, variant)`` as generations finish.
+
+    Every question is submitted up front with the ``batch`` scheduler class;
+    at most ``BATCH_MAX_IN_FLIGHT_PER_VARIANT`` generations per variant are
+    open at a time. Closing the iterator cancels unfinished generations.
+    """
+
+    unknown = [variant for variant in variants if variant not in config.MODEL_VARIANTS]
+    if unknown:
+        raise ValueError(f"Unknown model variant(s): {', '.join(unknown)}")
+
+    semaphores = {
+        variant: asyncio.Semaphore(config.BATCH_MAX_IN_FLIGHT_PER_VARIANT)
+        for variant in variants
+    }
+    tasks = [
+        asyncio.create_task(
+            _run_one(index, item, variant, save, semaphores[variant])
+        )
+        for index, item in enumerate(items)
+        for variant in variants
+    ]
+    try:
+        for finished in asyncio.as_completed(tasks):
+            yield await finished
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+async def _write_results(items, variants, save, output):
+    completed = failed = 0
+    async for result in run_batch(items, variants, save):
+        output.write(json.dumps(result, ensure_ascii=False) + "\n")
+        output.flush()
+        completed += 1
+        failed += "error" in result
+    return completed, failed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("input", help="JSONL file of questions, or - for stdin")
+    parser.add_argument(
+        "--variant",
+        action="append",
+        dest="variants",
+        choices=sorted(config.MODEL_VARIANTS),
+        help=f"Model variant to run (repeatable, default: {config.DEFAULT_MODEL_VARIANT})",
+    )
+    parser.add_argument("--output", "-o", help="NDJSON output file (default: stdout)")
+    parser.add_argument(
+        "--save", action="store_true", help="Also save each reply to chat_logs/"
+    )
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+
+    variants = args.variants or [config.DEFAULT_MODEL_VARIANT]
+    if args.input == "-":
+        items = parse_items(sys.stdin)
+    else:
+        with open(args.input, "r", encoding="utf-8") as f:
+            items = parse_items(f)
+
+    started = time.perf_counter()
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output:
+            completed, failed = asyncio.run(
+                _write_results(items, variants, args.save, output)
+            )
+    else:
+        completed, failed = asyncio.run(
+            _write_results(items, variants, args.save, sys.stdout)
+        )
+    logger.info(
+        "Finished %d generations (%d failed) in %.1fs",
+        completed,
+        failed,
+        time.perf_counter() - started,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,4 @@
+import os
 from pathlib import Path
 
 MODEL_DISPLAY_NAME = "LexAI-Qwen3 1.7B"
@@ -5,6 +6,36 @@ MAX_NEW_TOKENS = 8192
 TEMPERATURE = 0
 TOP_P = 0.1
 
+# "vllm" serves the real models. "stub" swaps in a simulated engine that
+# needs no GPU, vLLM or transformers, for measuring the server's own
+# overhead (benchmarks/bench_e2e.py). LEXAI_ENGINE overrides this.
+ENGINE_BACKEND = os.environ.get("LEXAI_ENGINE", "vllm")
+STUB_ENGINE_PROFILE = {
+    "prefill_seconds": 0.02,
+    "prefill_seconds_per_token": 0.00002,
+    "token_seconds": 0.01,
+    "think_tokens": 24,
+    "answer_tokens": 160,
+}
+
+# Conversation storage: "json" keeps one file per conversation in
+# CHAT_LOG_DIR, "sqlite" keeps them all in SQLITE_DB_PATH (WAL mode, listing
+# served from an index). LEXAI_STORAGE overrides this. Existing JSON logs
+# are copied into SQLite with ``python -m tools.migrate_storage``.
+STORAGE_BACKEND = os.environ.get("LEXAI_STORAGE", "json")
+CHAT_LOG_DIR = Path(__file__).resolve().parents[1] / "chat_logs"
+SQLITE_DB_PATH = CHAT_LOG_DIR / "conversations.sqlite3"
+# Finished turns are handed to a background writer instead of being saved
+# before the final SSE event. It drains up to PERSIST_BATCH_MAX turns per
+# write (one fsync/transaction each); past PERSIST_QUEUE_MAX queued turns
+# requests wait for it. The queue is flushed on shutdown.
+PERSIST_WRITE_BEHIND = True
+PERSIST_QUEUE_MAX = 1024
+PERSIST_BATCH_MAX = 64
+# GET /conversations pages: default and largest accepted ``limit``.
+CONVERSATION_PAGE_SIZE = 50
+CONVERSATION_PAGE_MAX = 500
+
 BASELINE_MODEL = "Qwen/Qwen3-1.7B"
 FINETUNED_MODEL = "Qwen/Qwen3-1.7B"
 FINETUNED_WEIGHTS_PATH = Path("local_model/")
@@ -19,6 +50,7 @@ MODEL_VARIANTS = {
         "device_ids": "0,1",
         "tensor_parallel_size": 2,
         "gpu_memory_utilization": 0.85,
+        "enable_prefix_caching": True,
     },
     "finetuned": {
         "display_name": MODEL_DISPLAY_NAME,
@@ -27,13 +59,117 @@ MODEL_VARIANTS = {
         "device_ids": "2,3",
         "tensor_parallel_size": 2,
         "gpu_memory_utilization": 0.85,
+        "enable_prefix_caching": True,
     },
 }
 
+# Serve every variant built on SHARED_ENGINE_PROFILE["base_model"] from one
+# vLLM instance and toggle the LoRA adapter per request. Variants whose
+# weights_path holds full weights always get a dedicated engine.
+SHARE_BASE_ENGINE = True
+SHARED_ENGINE_PROFILE = {
+    "base_model": BASELINE_MODEL,
+    "device_ids": "0,1",
+    "tensor_parallel_size": 2,
+    "gpu_memory_utilization": 0.85,
+    "max_lora_rank": 16,
+    "max_loras": 1,
+    "enable_prefix_caching": True,
+}
+
+# Greedy (TEMPERATURE = 0) generations are deterministic, so finished replies
+# are cached by prompt, adapter and sampling config and replayed on a hit.
+# Set RESPONSE_CACHE_DIR to add an on-disk tier shared across restarts.
+RESPONSE_CACHE_ENABLED = True
+RESPONSE_CACHE_MAX_ENTRIES = 512
+RESPONSE_CACHE_DIR = None
+RESPONSE_CACHE_DISK_MAX_BYTES = 256 * 1024 * 1024
+RESPONSE_CACHE_TTL_SECONDS = 7 * 24 * 60 * 60
+RESPONSE_CACHE_REPLAY_CHARS = 64
+
+# Identical greedy requests that arrive while the first one is still
+# generating subscribe to that generation instead of starting their own.
+SINGLE_FLIGHT_ENABLED = True
+
 LOCAL_BASE_MODEL = FINETUNED_MODEL
 LOCAL_WEIGHTS_PATH = FINETUNED_WEIGHTS_PATH
 TENSOR_PARALLEL_SIZE = 2
 GPU_MEMORY_UTILIZATION = 0.85
+# Every prompt starts with SYSTEM_PROMPT and follow-up turns resend the whole
+# history, so reuse KV blocks across requests. Profiles may override this
+# with "enable_prefix_caching". The warm-up prefills the system prompt once
+# per variant (adapter) at startup.
+ENABLE_PREFIX_CACHING = True
+PREFIX_CACHE_WARMUP = True
+# Token ids of each conversation's templated history are kept between turns
+# so only newly appended messages are templated and tokenized.
+PROMPT_CACHE_MAX_CONVERSATIONS = 1024
+
+# How often open /chat/stream responses check whether the client is gone so
+# the generation can be aborted and its KV blocks freed.
+STREAM_DISCONNECT_POLL_SECONDS = 0.5
+
+# /chat/stream responses are produced in the background and buffered so a
+# client that drops can resume with GET /chat/stream/{generation_id} and
+# Last-Event-ID. Only requests sent with "resumable": true get this: a
+# resumable generation with no client is aborted after
+# STREAM_RESUME_GRACE_SECONDS, any other one as soon as its client leaves.
+# The grace is decode time (and KV blocks) spent on a client that may never
+# come back, so it is kept to a few seconds, enough to ride out a dropped
+# connection but not a closed tab. Finished streams stay resumable for
+# STREAM_RESUME_TTL_SECONDS (at most STREAM_RESUME_MAX_FINISHED of them).
+# Each buffer keeps the newest STREAM_RESUME_BUFFER_FRAMES SSE frames, enough
+# for a MAX_NEW_TOKENS reply at one protocol v1 frame per token (buffered v1
+# frames share one copy of the text, so this costs memory linear in the
+# reply); a client that falls further behind gets an error event and [DONE].
+STREAM_RESUME_GRACE_SECONDS = 5.0
+STREAM_RESUME_TTL_SECONDS = 300.0
+STREAM_RESUME_MAX_FINISHED = 64
+STREAM_RESUME_BUFFER_FRAMES = 8192
+
+# Requests wait in a per-engine queue and are handed to vLLM at most
+# SCHEDULER_MAX_RUNNING at a time (None = the engine's max_num_seqs). Waiting
+# requests are ordered by arrival time plus a per-class delay plus a prompt
+# length penalty (capped), so short first questions overtake long
+# consultations and batch work without starving them. Profiles may override
+# the limit with "scheduler_max_running".
+SCHEDULER_MAX_RUNNING = None
+SCHEDULER_CLASS_DELAY_SECONDS = {
+    "interactive": 0.0,
+    "compare": 1.0,
+    "batch": 30.0,
+}
+SCHEDULER_SECONDS_PER_PROMPT_TOKEN = 0.0005
+SCHEDULER_MAX_LENGTH_PENALTY_SECONDS = 10.0
+
+# Protocol v2 streams (ChatRequest.protocol_version = 2) send delta-only
+# frames. Tokens are coalesced into one frame per SSE_COALESCE_MS or
+# SSE_COALESCE_CHARS, whichever comes first, and a frame carries the answer
+# offset and CRC32 checksum after every SSE_MARKER_CHARS of answer text.
+SSE_COALESCE_MS = 50
+SSE_COALESCE_CHARS = 256
+SSE_MARKER_CHARS = 2048
+
+# Admission control: each running request reserves its prompt tokens plus
+# MAX_NEW_TOKENS against its variant's budget. Requests that do not fit are
+# rejected up front (503, or 429 past the request cap) with Retry-After
+# instead of queueing until they time out. Profiles may override both limits
+# with "admission_token_budget" / "admission_max_requests".
+ADMISSION_CONTROL_ENABLED = True
+ADMISSION_TOKEN_BUDGET = 600_000
+ADMISSION_MAX_REQUESTS = 128
+ADMISSION_DEFAULT_RETRY_AFTER_SECONDS = 5.0
+# Bulk runs (/chat/batch, python -m backend.batch) keep at most this many
+# generations per variant open at once; they are queued with the "batch"
+# scheduler class so interactive traffic still goes first.
+BATCH_MAX_IN_FLIGHT_PER_VARIANT = 32
+
+# Default per-request deadline in seconds (None = no deadline). Clients can
+# set their own with ChatRequest.deadline_seconds.
+REQUEST_DEADLINE_SECONDS = None
+# In compare mode each variant is also cut off after this many seconds (None
+# = only the request deadline applies); the other variants keep streaming.
+COMPARE_VARIANT_TIMEOUT_SECONDS = None
 
 SYSTEM_PROMPT = (
     "당신은 'Lexi'라는 이름의 한국 법률 전문가입니다. "
@@ -1,34 +1,67 @@
 import asyncio
+import base64
+import binascii
 import json
 import logging
-from queue import Queue
-from threading import Thread
 
-from fastapi import FastAPI, HTTPException
-from fastapi.concurrency import iterate_in_threadpool
+from fastapi import FastAPI, Header, HTTPException, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import StreamingResponse
 
-from . import config
+from . import config, storage
+from .batch import parse_items, run_batch
 from .schemas import ChatRequest, ChatResponse, GenerationConfig
+from .sse import (
+    SSE_DONE,
+    CompactDeltaEncoder,
+    CumulativeEncoder,
+    coalesce_chunks,
+    merge_streams,
+    sse_event,
+)
+from .services.admission import (
+    AdmissionRejected,
+    DeadlineExceeded,
+    retry_after_header,
+)
+from .services.resumable import GenerationStore, ResumeUnavailable
 from .services.vllm_client import (
+    admission_stats,
+    close_response_cache,
     generate_reply,
+    prefix_cache_stats,
+    abort_stats,
+    response_cache_stats,
+    scheduler_stats,
+    single_flight_stats,
     stream_reply_chunks,
+    stream_reply_group,
     warm_up_local_engine,
 )
 from .storage import (
+    count_conversations,
     list_conversations,
     load_conversation,
-    save_conversation,
+    save_conversation_later,
     update_conversation_title,
 )
 
-import numpy as np
-import torch
-import random
-
 logger = logging.getLogger(__name__)
 
+_GENERATIONS: GenerationStore | None = None
+
+
+def _generations():
+    global _GENERATIONS
+    if _GENERATIONS is None:
+        _GENERATIONS = GenerationStore(
+            ttl_seconds=config.STREAM_RESUME_TTL_SECONDS,
+            grace_seconds=config.STREAM_RESUME_GRACE_SECONDS,
+            max_frames=config.STREAM_RESUME_BUFFER_FRAMES,
+            max_finished=config.STREAM_RESUME_MAX_FINISHED,
+        )
+    return _GENERATIONS
+
 def _generation_config_payload():
     return {
         "max_new_tokens": config.MAX_NEW_TOKENS,
@@ -37,8 +70,113 @@ def _generation_config_payload():
     }
 
 
-def _sse_payload(data):
-    return f"data: {json.dumps(data, ensure_ascii=False)}\n\n"
+def _protocol_payload(request: ChatRequest):
+    if request.protocol_version == 1:
+        return {}
+    return {
+        "protocol": request.protocol_version,
+        "coalesce_ms": config.SSE_COALESCE_MS,
+        "coalesce_chars": config.SSE_COALESCE_CHARS,
+        "marker_chars": config.SSE_MARKER_CHARS,
+    }
+
+
+def _delta_stream(request: ChatRequest, generator):
+    """Chunks to send: coalesced for protocol v2, one per engine step for v1."""
+
+    if request.protocol_version == 1:
+        return generator
+    return coalesce_chunks(
+        generator, config.SSE_COALESCE_MS / 1000, config.SSE_COALESCE_CHARS
+    )
+
+
+def _deadline(request: ChatRequest):
+    seconds = request.deadline_seconds or config.REQUEST_DEADLINE_SECONDS
+    if seconds is None:
+        return None
+    return asyncio.get_running_loop().time() + seconds
+
+
+def _compare_deadline(request: ChatRequest):
+    """Per-variant deadline: the request's own one, capped by the compare limit."""
+
+    deadline = _deadline(request)
+    if config.COMPARE_VARIANT_TIMEOUT_SECONDS is None:
+        return deadline
+    capped = asyncio.get_running_loop().time() + config.COMPARE_VARIANT_TIMEOUT_SECONDS
+    return capped if deadline is None else min(deadline, capped)
+
+
+def _admission_error(exc: AdmissionRejected):
+    return HTTPException(
+        status_code=exc.status_code,
+        detail=str(exc),
+        headers={"Retry-After": retry_after_header(exc.retry_after)},
+    )
+
+
+def _error_stream(message):
+    async def event_stream():
+        yield sse_event({"type": "error", "message": message})
+        yield SSE_DONE
+
+    return event_stream()
+
+
+_STREAM_END = object()
+
+
+async def _watch_disconnect(http_request: Request, producer: asyncio.Task):
+    while not producer.done():
+        if await http_request.is_disconnected():
+            logger.info("Client disconnected; cancelling stream.")
+            producer.cancel()
+            return
+        await asyncio.sleep(config.STREAM_DISCONNECT_POLL_SECONDS)
+
+
+async def _stream_until_disconnect(http_request: Request, events):
+    """Relay ``events`` to the client, cancelling them if the client leaves.
+
+    The generator runs in its own task so a disconnect noticed while it is
+    waiting (not only on the next write) cancels it. For batches its
+    ``finally`` blocks abort the underlying vLLM requests; for SSE streams it
+    only detaches the client from the buffered generation.
+    """
+
+    queue: asyncio.Queue = asyncio.Queue()
+
+    async def produce():
+        async for item in events:
+            queue.put_nowait(item)
+
+    producer = asyncio.create_task(produce())
+    producer.add_done_callback(lambda _: queue.put_nowait(_STREAM_END))
+    watcher = asyncio.create_task(_watch_disconnect(http_request, producer))
+    try:
+        while True:
+            item = await queue.get()
+            if item is _STREAM_END:
+                break
+            yield item
+        if not producer.cancelled():
+            producer.result()
+    finally:
+        watcher.cancel()
+        producer.cancel()
+
+
+def _sse_response(http_request: Request, generation, frames):
+    return StreamingResponse(
+        _stream_until_disconnect(http_request, frames),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "Connection": "keep-alive",
+            "X-Generation-Id": generation.id,
+        },
+    )
 
 app = FastAPI(
     title="Lexi Legal Chatbot API",
@@ -62,11 +200,34 @@ async def startup_event():
     await loop.run_in_executor(None, warm_up_local_engine)
 
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Write out queued conversation turns and response-cache files."""
+
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(None, storage.close)
+    await loop.run_in_executor(None, close_response_cache)
+
+
 @app.get("/health")
 async def health_check():
     return {"status": "ok"}
 
 
+@app.get("/metrics")
+async def metrics():
+    return {
+        "admission": admission_stats(),
+        "aborts": abort_stats(),
+        "persistence": storage.persistence_stats(),
+        "prefix_cache": prefix_cache_stats(),
+        "response_cache": response_cache_stats(),
+        "scheduler": scheduler_stats(),
+        "single_flight": single_flight_stats(),
+        "streams": _generations().stats(),
+    }
+
+
 @app.post("/chat", response_model=ChatResponse)
 async def chat_endpoint(request: ChatRequest):
     history_dicts = [msg.dict() for msg in request.history]
@@ -76,15 +237,23 @@ async def chat_endpoint(request: ChatRequest):
         )
     try:
         (reply, usage), model_label = await generate_reply(
-            request.history, request.message, request.model_variant
+            request.history,
+            request.message,
+            request.model_variant,
+            request.conversation_id,
+            deadline=_deadline(request),
         )
     except ValueError as exc:
         raise HTTPException(status_code=400, detail=str(exc))
+    except AdmissionRejected as exc:
+        raise _admission_error(exc)
+    except DeadlineExceeded as exc:
+        raise HTTPException(status_code=504, detail=str(exc))
     except Exception as exc:  # noqa: BLE001
         logger.exception("Failed to get response from vLLM.")
         raise HTTPException(status_code=502, detail=str(exc))
 
-    record = save_conversation(
+    record = await save_conversation_later(
         request.conversation_id,
         request.message,
         reply,
@@ -106,66 +275,62 @@ async def chat_endpoint(request: ChatRequest):
     )
 
 
-def _single_stream_generator(request: ChatRequest, history_dicts):
-    def event_stream():
-        try:
-            model_label, generator = stream_reply_chunks(
-                request.history, request.message, request.model_variant
-            )
-        except ValueError as exc:
-            yield _sse_payload({"type": "error", "message": str(exc)})
-            yield "data: [DONE]\n\n"
-            return
-
-        final_reply = ""
+def _single_stream_generator(
+    request: ChatRequest, history_dicts, model_label, generator
+):
+    async def event_stream():
+        last_chunk = None
         last_usage = None
         last_finish_reason = None
-
-        yield _sse_payload(
-            {
-                "type": "start",
-                "mode": "single",
-                "model": model_label,
-                "models": [
-                    {"variant": request.model_variant, "model": model_label}
-                ],
-                "generation_config": _generation_config_payload(),
-            }
-        )
+        compact_encoder = None
+        if request.protocol_version == 2:
+            compact_encoder = CompactDeltaEncoder(
+                config.SSE_MARKER_CHARS, variant=request.model_variant
+            )
+        else:
+            cumulative_encoder = CumulativeEncoder(
+                mode="single", variant=request.model_variant, model=model_label
+            )
+        chunks = _delta_stream(request, generator)
 
         try:
-            for chunk in generator:
-                final_reply = chunk.text
+            yield sse_event(
+                {
+                    "type": "start",
+                    "mode": "single",
+                    "model": model_label,
+                    "models": [
+                        {"variant": request.model_variant, "model": model_label}
+                    ],
+                    "generation_config": _generation_config_payload(),
+                    **_protocol_payload(request),
+                }
+            )
+
+            async for chunk in chunks:
+                last_chunk = chunk
                 if chunk.usage is not None:
                     last_usage = chunk.usage.model_dump()
                 if chunk.finish_reason:
                     last_finish_reason = chunk.finish_reason
+                if compact_encoder is not None:
+                    yield compact_encoder.encode(chunk, last_usage)
+                    continue
 
-                payload = {
-                    "type": "delta",
-                    "mode": "single",
-                    "variant": request.model_variant,
-                    "model": model_label,
-                    "text": chunk.text,
-                    "delta": chunk.delta,
-                    "finished": chunk.finished,
-                    "usage": last_usage,
-                    "thinking": chunk.thinking,
-                }
-                if chunk.think_text:
-                    payload["think_text"] = chunk.think_text
+                optional = {}
                 if chunk.finish_reason:
-                    payload["finish_reason"] = chunk.finish_reason
-                yield _sse_payload(payload)
+                    optional["finish_reason"] = chunk.finish_reason
+                yield cumulative_encoder.encode(chunk, last_usage, **optional)
 
-            record = save_conversation(
+            final_reply = last_chunk.text if last_chunk is not None else ""
+            record = await save_conversation_later(
                 request.conversation_id,
                 request.message,
                 final_reply,
                 history_dicts,
             )
 
-            yield _sse_payload(
+            yield sse_event(
                 {
                     "type": "final",
                     "mode": "single",
@@ -182,163 +347,166 @@ def _single_stream_generator(request: ChatRequest, history_dicts):
                     "finish_reason": last_finish_reason,
                 }
             )
+        except DeadlineExceeded as exc:
+            logger.info("Generation for %s hit its deadline.", request.model_variant)
+            yield sse_event({"type": "error", "message": str(exc)})
         except Exception as exc:  # noqa: BLE001
             logger.exception("Failed to stream response from vLLM.")
-            yield _sse_payload(
+            yield sse_event(
                 {
                     "type": "error",
                     "message": str(exc),
                 }
             )
         finally:
-            yield "data: [DONE]\n\n"
+            if chunks is not generator:
+                await chunks.aclose()
+            await generator.aclose()
+        yield SSE_DONE
 
     return event_stream()
 
 
-def _compare_stream_generator(request: ChatRequest, history_dicts):
-    def event_stream():
-        variant_pairs = []
-        try:
-            for variant in config.COMPARISON_VARIANTS:
-                model_label, generator = stream_reply_chunks(
-                    request.history, request.message, variant
-                )
-                variant_pairs.append((variant, model_label, generator))
-        except ValueError as exc:
-            yield _sse_payload({"type": "error", "message": str(exc)})
-            yield "data: [DONE]\n\n"
-            return
-
+def _compare_stream_generator(request: ChatRequest, history_dicts, variant_pairs):
+    async def event_stream():
         if not variant_pairs:
-            yield _sse_payload(
+            yield sse_event(
                 {"type": "error", "message": "비교할 모델이 설정되지 않았습니다."}
             )
-            yield "data: [DONE]\n\n"
+            yield SSE_DONE
             return
 
         models_payload = [
             {"variant": variant, "model": model_label}
             for variant, model_label, _ in variant_pairs
         ]
-
-        yield _sse_payload(
-            {
-                "type": "start",
-                "mode": "compare",
-                "models": models_payload,
-                "generation_config": _generation_config_payload(),
+        labels = {variant: model_label for variant, model_label, _ in variant_pairs}
+        generators = {variant: generator for variant, _, generator in variant_pairs}
+        streams = {
+            variant: _delta_stream(request, generator)
+            for variant, generator in generators.items()
+        }
+        if request.protocol_version == 2:
+            encoders = {
+                variant: CompactDeltaEncoder(config.SSE_MARKER_CHARS, variant=variant)
+                for variant in generators
             }
-        )
-
-        event_queue: Queue = Queue()
+        else:
+            encoders = {
+                variant: CumulativeEncoder(
+                    mode="compare", variant=variant, model=model_label
+                )
+                for variant, model_label in labels.items()
+            }
+        progress = {
+            variant: {"chunk": None, "usage": None, "finish_reason": None}
+            for variant in generators
+        }
         final_map: dict[str, dict] = {}
 
-        def _pump(variant, model_label, generator):
-            final_reply = ""
-            last_usage = None
-            last_finish_reason = None
-            try:
-                for chunk in generator:
-                    final_reply = chunk.text
-                    if chunk.usage is not None:
-                        last_usage = chunk.usage.model_dump()
-                    if chunk.finish_reason:
-                        last_finish_reason = chunk.finish_reason
-                    event_queue.put(
-                        (
-                            "delta",
+        async def close(variant):
+            stream, generator = streams.pop(variant), generators.pop(variant)
+            if stream is not generator:
+                await stream.aclose()
+            await generator.aclose()
+
+        try:
+            yield sse_event(
+                {
+                    "type": "start",
+                    "mode": "compare",
+                    "models": models_payload,
+                    "generation_config": _generation_config_payload(),
+                    **_protocol_payload(request),
+                }
+            )
+
+            async for variant, chunk, error in merge_streams(streams):
+                if error is not None:
+                    # Only this variant stops; the others keep streaming.
+                    if isinstance(error, DeadlineExceeded):
+                        logger.info("Generation for %s hit its deadline.", variant)
+                    else:
+                        logger.error(
+                            "Failed to stream response for variant %s",
                             variant,
-                            model_label,
-                            {
-                                "text": chunk.text,
-                                "delta": chunk.delta,
-                                "finished": chunk.finished,
-                                "usage": last_usage,
-                                "thinking": chunk.thinking,
-                                "finish_reason": chunk.finish_reason,
-                                "think_text": chunk.think_text,
-                            },
+                            exc_info=error,
                         )
+                    await close(variant)
+                    yield sse_event(
+                        {
+                            "type": "error",
+                            "mode": "compare",
+                            "variant": variant,
+                            "message": str(error),
+                        }
                     )
-            except Exception as exc:  # noqa: BLE001
-                logger.exception(
-                    "Failed to stream response for variant %s", variant
-                )
-                event_queue.put(("error", variant, str(exc)))
-                return
-
-            event_queue.put(
-                ("done", variant, model_label, final_reply, last_usage, last_finish_reason)
-            )
+                    continue
 
-        threads = [
-            Thread(target=_pump, args=pair, daemon=True) for pair in variant_pairs
-        ]
-        for thread in threads:
-            thread.start()
-
-        completed = 0
-        total = len(variant_pairs)
-        encountered_error = False
-
-        while completed < total:
-            item = event_queue.get()
-            kind = item[0]
-            if kind == "delta":
-                _, variant, model_label, payload = item
-                yield _sse_payload(
-                    {
-                        "type": "delta",
-                        "mode": "compare",
-                        "variant": variant,
-                        "model": model_label,
-                        **payload,
-                    }
-                )
-            elif kind == "error":
-                _, variant, message = item
-                encountered_error = True
-                yield _sse_payload(
-                    {
-                        "type": "error",
-                        "variant": variant,
-                        "message": message,
+                state = progress[variant]
+                if chunk is None:
+                    await close(variant)
+                    final_map[variant] = {
+                        "model": labels[variant],
+                        "reply": state["chunk"].text if state["chunk"] else "",
+                        "usage": state["usage"],
+                        "finish_reason": state["finish_reason"],
                     }
-                )
-                break
-            elif kind == "done":
-                _, variant, model_label, final_reply, last_usage, finish_reason = item
-                final_map[variant] = {
-                    "model": model_label,
-                    "reply": final_reply,
-                    "usage": last_usage,
-                    "finish_reason": finish_reason,
-                }
-                completed += 1
-
-        for thread in threads:
-            thread.join(timeout=0.1)
+                    yield sse_event(
+                        {
+                            "type": "variant_final",
+                            "mode": "compare",
+                            "variant": variant,
+                            **final_map[variant],
+                        }
+                    )
+                    continue
 
-        if not encountered_error and final_map:
-            reply_sections = []
-            for variant in config.COMPARISON_VARIANTS:
-                data = final_map.get(variant)
-                if not data:
+                state["chunk"] = chunk
+                if chunk.usage is not None:
+                    state["usage"] = chunk.usage.model_dump()
+                if chunk.finish_reason:
+                    state["finish_reason"] = chunk.finish_reason
+                if request.protocol_version == 2:
+                    yield encoders[variant].encode(chunk, state["usage"])
                     continue
-                reply_sections.append(
-                    f"[{data['model']}]\n{data['reply']}".strip()
+                yield encoders[variant].encode(
+                    chunk,
+                    state["usage"],
+                    finish_reason=chunk.finish_reason,
+                    think_text=None,
                 )
-            combined_reply = "\n\n".join(reply_sections).strip()
-
-            record = save_conversation(
+        finally:
+            for variant in list(streams):
+                await close(variant)
+
+        if final_map:
+            ordered = [
+                (variant, final_map[variant])
+                for variant in labels
+                if variant in final_map
+            ]
+            record = await save_conversation_later(
                 request.conversation_id,
                 request.message,
-                combined_reply,
+                [
+                    {
+                        "content": data["reply"],
+                        "variant": variant,
+                        "model": data["model"],
+                        "usage": data["usage"],
+                        "finish_reason": data["finish_reason"],
+                    }
+                    for variant, data in ordered
+                ],
                 history_dicts,
             )
+            combined_reply = "\n\n".join(
+                f"[{data['model']}]\n{data['reply']}".strip()
+                for _, data in ordered
+            ).strip()
 
-            yield _sse_payload(
+            yield sse_event(
                 {
                     "type": "final",
                     "mode": "compare",
@@ -347,41 +515,166 @@ def _compare_stream_generator(request: ChatRequest, history_dicts):
                     "reply": combined_reply,
                     "disclaimer": config.DISCLAIMER,
                     "models": models_payload,
-                    "variants": final_map,
+                    "variants": dict(ordered),
+                    "failed": [
+                        variant for variant in labels if variant not in final_map
+                    ],
                     "generation_config": _generation_config_payload(),
                 }
             )
 
-        yield "data: [DONE]\n\n"
+        yield SSE_DONE
 
     return event_stream()
 
 
 @app.post("/chat/stream")
-async def chat_stream_endpoint(request: ChatRequest):
+async def chat_stream_endpoint(request: ChatRequest, http_request: Request):
     history_dicts = [msg.dict() for msg in request.history]
-    if request.model_variant == "compare":
-        generator = _compare_stream_generator(request, history_dicts)
-    else:
-        generator = _single_stream_generator(request, history_dicts)
+    # Streams are opened before the response starts so an overloaded variant
+    # can still be answered with a plain 429/503 and Retry-After.
+    try:
+        if request.model_variant == "compare":
+            variant_pairs = stream_reply_group(
+                request.history,
+                request.message,
+                config.COMPARISON_VARIANTS,
+                request.conversation_id,
+                deadline=_compare_deadline(request),
+            )
+            generator = _compare_stream_generator(
+                request, history_dicts, variant_pairs
+            )
+        else:
+            model_label, stream = stream_reply_chunks(
+                request.history,
+                request.message,
+                request.model_variant,
+                request.conversation_id,
+                deadline=_deadline(request),
+            )
+            generator = _single_stream_generator(
+                request, history_dicts, model_label, stream
+            )
+    except AdmissionRejected as exc:
+        raise _admission_error(exc)
+    except ValueError as exc:
+        generator = _error_stream(str(exc))
+
+    generation = _generations().start(generator, resumable=request.resumable)
+    return _sse_response(http_request, generation, generation.frames())
+
+
+@app.get("/chat/stream/{generation_id}")
+async def resume_stream_endpoint(
+    generation_id: str,
+    http_request: Request,
+    last_event_id: int = Header(default=0, ge=0),
+):
+    """Replay a /chat/stream response after ``Last-Event-ID`` and follow it."""
+
+    generation = _generations().get(generation_id)
+    if generation is None:
+        raise HTTPException(status_code=404, detail="Stream not found.")
+    try:
+        frames = generation.frames(after=last_event_id)
+    except ResumeUnavailable as exc:
+        raise HTTPException(status_code=410, detail=str(exc))
+    return _sse_response(http_request, generation, frames)
+
+
+@app.post("/chat/batch")
+async def chat_batch_endpoint(
+    http_request: Request,
+    variant: list[str] = Query(default=[config.DEFAULT_MODEL_VARIANT]),
+    save: bool = False,
+):
+    """Run a JSONL body of questions; results stream back as NDJSON."""
+
+    body = (await http_request.body()).decode("utf-8")
+    try:
+        items = parse_items(body.splitlines())
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    unknown = [name for name in variant if name not in config.MODEL_VARIANTS]
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown model variant(s): {', '.join(unknown)}",
+        )
+
+    async def results():
+        async for result in run_batch(items, variant, save):
+            yield json.dumps(result, ensure_ascii=False) + "\n"
 
     return StreamingResponse(
-        iterate_in_threadpool(generator),
-        media_type="text/event-stream",
-        headers={
-            "Cache-Control": "no-cache",
-            "Connection": "keep-alive",
-        },
+        _stream_until_disconnect(http_request, results()),
+        media_type="application/x-ndjson",
     )
 
 
+CONVERSATION_FIELDS = ("id", "title", "updated_at", "created_at")
+
+
+def _encode_cursor(entry):
+    key = json.dumps([entry["updated_at"], entry["id"]])
+    return base64.urlsafe_b64encode(key.encode("utf-8")).decode("ascii")
+
+
+def _decode_cursor(cursor):
+    try:
+        updated_at, conversation_id = json.loads(base64.urlsafe_b64decode(cursor))
+    except (binascii.Error, ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor.")
+    return str(updated_at), str(conversation_id)
+
+
+# The conversation endpoints are plain ``def``s: storage calls block (reads
+# first flush queued writes), so FastAPI runs them in its threadpool.
 @app.get("/conversations")
-async def get_conversations():
-    return list_conversations()
+def get_conversations(
+    response: Response,
+    limit: int = Query(
+        default=config.CONVERSATION_PAGE_SIZE,
+        ge=1,
+        le=config.CONVERSATION_PAGE_MAX,
+    ),
+    cursor: str | None = None,
+    q: str | None = None,
+    fields: str | None = None,
+):
+    """One page of conversations, newest first.
+
+    ``cursor`` is the ``X-Next-Cursor`` header of the previous page, ``q``
+    a title prefix and ``fields`` a comma-separated subset of
+    ``CONVERSATION_FIELDS`` (``id`` is always included). ``X-Total-Count``
+    counts every conversation matching ``q``.
+    """
+
+    selected = CONVERSATION_FIELDS
+    if fields:
+        selected = [name.strip() for name in fields.split(",") if name.strip()]
+        unknown = [name for name in selected if name not in CONVERSATION_FIELDS]
+        if unknown:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Unknown field(s): {', '.join(unknown)}",
+            )
+        selected = ["id", *(name for name in selected if name != "id")]
+    before = _decode_cursor(cursor) if cursor else None
+    q = (q or "").strip() or None
+
+    # One extra entry tells whether there is a next page.
+    page = list_conversations(limit + 1, before, q)
+    if len(page) > limit:
+        page = page[:limit]
+        response.headers["X-Next-Cursor"] = _encode_cursor(page[-1])
+    response.headers["X-Total-Count"] = str(count_conversations(q))
+    return [{name: entry.get(name) for name in selected} for entry in page]
 
 
 @app.get("/conversations/{conversation_id}")
-async def get_conversation(conversation_id: str):
+def get_conversation(conversation_id: str):
     record = load_conversation(conversation_id)
     if record is None:
         raise HTTPException(status_code=404, detail="Conversation not found.")
@@ -389,7 +682,7 @@ async def get_conversation(conversation_id: str):
 
 
 @app.post("/conversations/{conversation_id}/title")
-async def rename_conversation(conversation_id: str, payload: dict):
+def rename_conversation(conversation_id: str, payload: dict):
     title = (payload or {}).get("title", "").strip()
     if not title:
         raise HTTPException(status_code=400, detail="Title must not be empty.")
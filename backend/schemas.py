@@ -32,6 +32,26 @@ class ChatRequest(BaseModel):
     model_variant: Literal["baseline", "finetuned", "compare"] = Field(
         default=config.DEFAULT_MODEL_VARIANT
     )
+    deadline_seconds: float | None = Field(
+        default=None,
+        gt=0,
+        description="Abort generation if it is not finished within this time.",
+    )
+    protocol_version: Literal[1, 2] = Field(
+        default=1,
+        description=(
+            "SSE format for /chat/stream: 1 sends the cumulative text with "
+            "every delta, 2 sends coalesced delta-only frames."
+        ),
+    )
+    resumable: bool = Field(
+        default=False,
+        description=(
+            "Keep generating for a short grace period after the client "
+            "disconnects so it can resume via GET /chat/stream/{id}; "
+            "otherwise a disconnect aborts the generation right away."
+        ),
+    )
 
 
 class UsageReport(BaseModel):
@@ -54,3 +74,11 @@ class ChatResponse(BaseModel):
     model: str
     generation_config: GenerationConfig
     usage: UsageReport | None = None
+
+
+class BatchItem(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+
+    id: str | None = None
+    message: constr(strip_whitespace=True, min_length=1)
+    history: list[ChatMessage] = Field(default_factory=list)
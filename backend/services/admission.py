@@ -0,0 +1,176 @@
+import asyncio
+import math
+import threading
+import time
+from collections import deque
+
+
+class AdmissionRejected(Exception):
+    """Raised when a generation request would exceed a variant's budget."""
+
+    def __init__(self, message, retry_after, status_code=503):
+        super().__init__(message)
+        self.retry_after = retry_after
+        self.status_code = status_code
+
+
+class DeadlineExceeded(Exception):
+    """Raised when a generation runs past its request deadline."""
+
+
+class _VariantLoad:
+    def __init__(self, token_budget, max_requests):
+        self.token_budget = token_budget
+        self.max_requests = max_requests
+        self.reserved_tokens = 0
+        self.requests = 0
+        self.admitted = 0
+        self.rejected = 0
+        # (release time, reserved tokens) used to estimate the drain rate.
+        self.released: deque[tuple[float, int]] = deque()
+
+
+class Reservation:
+    """Capacity held for one request on one variant until ``release()``."""
+
+    def __init__(self, controller, variant, tokens):
+        self.variant = variant
+        self.tokens = tokens
+        self._controller = controller
+        self._released = False
+
+    def release(self):
+        if not self._released:
+            self._released = True
+            self._controller._release(self)
+
+
+class AdmissionController:
+    """Per-variant load budget measured in reserved tokens.
+
+    Each admitted request reserves its prompt tokens plus ``max_new_tokens``
+    until it finishes. A request that would push a variant past its token
+    budget (or request cap) is rejected immediately with a ``Retry-After``
+    estimate derived from how fast reservations have recently been freed.
+    """
+
+    def __init__(
+        self,
+        budgets,
+        default_retry_after=5.0,
+        max_retry_after=120.0,
+        rate_window=30.0,
+    ):
+        self._loads = {
+            variant: _VariantLoad(token_budget, max_requests)
+            for variant, (token_budget, max_requests) in budgets.items()
+        }
+        self.default_retry_after = default_retry_after
+        self.max_retry_after = max_retry_after
+        self.rate_window = rate_window
+        self._lock = threading.Lock()
+
+    def reserve(self, demands):
+        """Atomically reserve ``{variant: tokens}``; all or nothing."""
+
+        with self._lock:
+            for variant, tokens in demands.items():
+                load = self._loads.get(variant)
+                if load is None:
+                    continue
+                if load.max_requests and load.requests >= load.max_requests:
+                    load.rejected += 1
+                    raise AdmissionRejected(
+                        f"'{variant}' 모델에 대기 중인 요청이 너무 많습니다.",
+                        self._retry_after(load, tokens),
+                        status_code=429,
+                    )
+                # A lone request larger than the budget is still admitted when
+                # the variant is idle; otherwise it could never run.
+                if (
+                    load.requests
+                    and load.reserved_tokens + tokens > load.token_budget
+                ):
+                    load.rejected += 1
+                    raise AdmissionRejected(
+                        f"'{variant}' 모델이 현재 과부하 상태입니다.",
+                        self._retry_after(load, tokens),
+                    )
+
+            reservations = []
+            for variant, tokens in demands.items():
+                load = self._loads.get(variant)
+                if load is not None:
+                    load.reserved_tokens += tokens
+                    load.requests += 1
+                    load.admitted += 1
+                reservations.append(Reservation(self, variant, tokens))
+            return reservations
+
+    def _release(self, reservation):
+        with self._lock:
+            load = self._loads.get(reservation.variant)
+            if load is None:
+                return
+            load.reserved_tokens -= reservation.tokens
+            load.requests -= 1
+            load.released.append((time.monotonic(), reservation.tokens))
+
+    def _drain_rate(self, load):
+        cutoff = time.monotonic() - self.rate_window
+        while load.released and load.released[0][0] < cutoff:
+            load.released.popleft()
+        freed = sum(tokens for _, tokens in load.released)
+        return freed / self.rate_window
+
+    def _retry_after(self, load, tokens):
+        excess = max(load.reserved_tokens + tokens - load.token_budget, tokens)
+        rate = self._drain_rate(load)
+        if rate <= 0:
+            return self.default_retry_after
+        return min(max(excess / rate, 1.0), self.max_retry_after)
+
+    def stats(self):
+        with self._lock:
+            return {
+                variant: {
+                    "reserved_tokens": load.reserved_tokens,
+                    "token_budget": load.token_budget,
+                    "requests": load.requests,
+                    "admitted": load.admitted,
+                    "rejected": load.rejected,
+                    "drain_tokens_per_second": self._drain_rate(load),
+                }
+                for variant, load in self._loads.items()
+            }
+
+
+def retry_after_header(seconds):
+    return str(max(1, math.ceil(seconds)))
+
+
+class DeadlineChunkStream:
+    """Wrap a chunk stream so it is aborted once ``deadline`` passes.
+
+    ``deadline`` is an event-loop time (``loop.time()``).
+    """
+
+    def __init__(self, stream, deadline):
+        self._stream = stream
+        self._deadline = deadline
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        remaining = self._deadline - asyncio.get_running_loop().time()
+        try:
+            if remaining <= 0:
+                raise asyncio.TimeoutError
+            return await asyncio.wait_for(self._stream.__anext__(), remaining)
+        except asyncio.TimeoutError:
+            await self._stream.aclose()
+            raise DeadlineExceeded("응답 시간 제한을 초과했습니다.") from None
+
+    async def aclose(self):
+        await self._stream.aclose()
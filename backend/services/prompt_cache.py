@@ -0,0 +1,133 @@
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+def _message_digest(role, content):
+    digest = hashlib.blake2b(digest_size=8)
+    digest.update(role.encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(content.encode("utf-8"))
+    return digest.digest()
+
+
+class ConversationPromptCache:
+    """Token ids of already templated conversation prefixes, by conversation id.
+
+    A prompt is ``system ids + prefix ids + new segment ids + generation
+    prompt ids``. Only the messages appended since the cached prefix are run
+    through the chat template and tokenized; every chat-template segment
+    starts with a special token, so tokenizing segments separately yields the
+    same ids as tokenizing the whole prompt. ``incremental`` turns itself off
+    when the template does not render segment by segment.
+    """
+
+    def __init__(self, tokenizer, system_prompt, max_conversations=1024):
+        self._tokenizer = tokenizer
+        self._system_message = {"role": "system", "content": system_prompt}
+        self._max_conversations = max_conversations
+        self._entries: OrderedDict[str, tuple[list[bytes], list[int]]] = (
+            OrderedDict()
+        )
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0}
+
+        self.system_text = self._render([self._system_message])
+        self.system_ids = self._encode(self.system_text)
+        probe = [self._system_message, {"role": "user", "content": "?"}]
+        self._generation_text = self._render(
+            probe, add_generation_prompt=True
+        )[len(self._render(probe)) :]
+        self._generation_ids = self._encode(self._generation_text)
+        self.incremental = self._template_is_incremental()
+
+    def _render(self, messages, add_generation_prompt=False):
+        return self._tokenizer.apply_chat_template(
+            messages,
+            tokenize=False,
+            add_generation_prompt=add_generation_prompt,
+        )
+
+    def _encode(self, text):
+        return self._tokenizer(text, add_special_tokens=False)["input_ids"]
+
+    def _template_is_incremental(self):
+        turns = [
+            {"role": "user", "content": "첫 질문"},
+            {"role": "assistant", "content": "첫 답변"},
+            {"role": "user", "content": "둘째 질문"},
+            {"role": "assistant", "content": "둘째 답변"},
+            {"role": "user", "content": "셋째 질문"},
+        ]
+        full = self._render([self._system_message, *turns], True)
+        pieces = (
+            self.system_text
+            + self._render(turns[:1])
+            + self._render(turns[1:3])
+            + self._render(turns[3:])
+            + self._generation_text
+        )
+        if full != pieces:
+            logger.warning(
+                "Chat template does not render incrementally; "
+                "prompts will be templated in full."
+            )
+            return False
+        return True
+
+    def build(self, conversation_id, history, user_message):
+        """Return prompt token ids for ``history`` plus the new user message.
+
+        ``history`` items need ``role`` and ``content`` attributes.
+        """
+
+        messages = [(msg.role, msg.content) for msg in history]
+        messages.append(("user", user_message))
+        if not self.incremental:
+            rendered = self._render(
+                [self._system_message]
+                + [{"role": role, "content": content} for role, content in messages],
+                add_generation_prompt=True,
+            )
+            return self._encode(rendered)
+
+        digests = [_message_digest(role, content) for role, content in messages]
+        prefix_digests: list[bytes] = []
+        prefix_ids = self.system_ids
+        if conversation_id is not None:
+            with self._lock:
+                entry = self._entries.get(conversation_id)
+                if entry is not None:
+                    self._entries.move_to_end(conversation_id)
+            if entry is not None and digests[: len(entry[0])] == entry[0]:
+                prefix_digests, prefix_ids = entry
+                self._stats["hits"] += 1
+            else:
+                self._stats["misses"] += 1
+
+        new_messages = messages[len(prefix_digests) :]
+        if new_messages:
+            segment = self._render(
+                [{"role": role, "content": content} for role, content in new_messages]
+            )
+            prefix_ids = prefix_ids + self._encode(segment)
+
+        if conversation_id is not None:
+            with self._lock:
+                self._entries[conversation_id] = (digests, prefix_ids)
+                self._entries.move_to_end(conversation_id)
+                while len(self._entries) > self._max_conversations:
+                    self._entries.popitem(last=False)
+        return prefix_ids + self._generation_ids
+
+    def stats(self):
+        with self._lock:
+            conversations = len(self._entries)
+        return {
+            **self._stats,
+            "conversations": conversations,
+            "incremental": self.incremental,
+        }
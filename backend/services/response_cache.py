@@ -0,0 +1,241 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+CACHEABLE_FINISH_REASONS = {"stop", "length"}
+
+
+def fingerprint(prompt, model, adapter, sampling):
+    """Stable key for a rendered prompt, model, LoRA adapter and sampling.
+
+    ``model`` identifies the weights (variant name and model path), so two
+    variants without adapters never share entries.
+    """
+
+    digest = hashlib.sha256()
+    digest.update(
+        json.dumps(
+            {"model": model, "adapter": adapter, "sampling": sampling},
+            sort_keys=True,
+            ensure_ascii=False,
+        ).encode("utf-8")
+    )
+    digest.update(b"\0")
+    if isinstance(prompt, str):
+        digest.update(prompt.encode("utf-8"))
+    else:
+        digest.update(",".join(map(str, prompt)).encode("ascii"))
+    return digest.hexdigest()
+
+
+class ResponseCache:
+    """Two-tier cache of finished deterministic generations.
+
+    Entries are plain dicts (``reply``, ``usage``, ``finish_reason``,
+    ``generation_seconds``). The memory tier is an LRU bounded by entry
+    count; the optional disk tier keeps one JSON file per key and evicts the
+    oldest files once ``disk_max_bytes`` is exceeded. Both tiers honour
+    ``ttl_seconds``.
+
+    Only the memory tier is touched on the caller's thread: disk reads
+    (``load``) and writes run on a single I/O thread, and the keys on disk
+    are tracked in memory so ``lookup`` can tell a miss without a stat.
+    """
+
+    def __init__(
+        self,
+        max_entries=512,
+        disk_dir=None,
+        disk_max_bytes=256 * 1024 * 1024,
+        ttl_seconds=None,
+    ):
+        self.max_entries = max_entries
+        self.disk_dir = Path(disk_dir) if disk_dir else None
+        self.disk_max_bytes = disk_max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._memory: OrderedDict[str, tuple[float, dict]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk_bytes = 0
+        self._disk_keys: set[str] = set()
+        self._io = None
+        self._stats = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "stores": 0,
+            "evictions": 0,
+            "saved_completion_tokens": 0,
+            "saved_generation_seconds": 0.0,
+        }
+        if self.disk_dir is not None:
+            self.disk_dir.mkdir(parents=True, exist_ok=True)
+            for path in self.disk_dir.glob("*.json"):
+                self._disk_bytes += path.stat().st_size
+                self._disk_keys.add(path.stem)
+            self._io = ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix="response-cache"
+            )
+
+    def _expired(self, stored_at):
+        return (
+            self.ttl_seconds is not None
+            and time.time() - stored_at > self.ttl_seconds
+        )
+
+    def lookup(self, key):
+        """Memory-tier lookup; never touches the disk.
+
+        Returns ``(entry, on_disk)``: the entry on a memory hit, otherwise
+        whether ``load`` may find it on disk. A miss in both is counted.
+        """
+
+        with self._lock:
+            item = self._memory.get(key)
+            if item is not None:
+                stored_at, entry = item
+                if not self._expired(stored_at):
+                    self._memory.move_to_end(key)
+                    self._record_hit("memory_hits", entry)
+                    return entry, False
+                del self._memory[key]
+            on_disk = key in self._disk_keys
+            if not on_disk:
+                self._stats["misses"] += 1
+        return None, on_disk
+
+    async def load(self, key):
+        """Read ``key`` from the disk tier on the I/O thread."""
+
+        loop = asyncio.get_running_loop()
+        entry = await loop.run_in_executor(self._io, self._disk_get, key)
+        with self._lock:
+            if entry is None:
+                self._stats["misses"] += 1
+                return None
+            self._memory_put(key, entry)
+            self._record_hit("disk_hits", entry)
+        return entry
+
+    async def get(self, key):
+        entry, on_disk = self.lookup(key)
+        if on_disk:
+            entry = await self.load(key)
+        return entry
+
+    def put(self, key, entry):
+        with self._lock:
+            self._memory_put(key, entry)
+            self._stats["stores"] += 1
+        if self._io is not None:
+            self._io.submit(self._disk_put, key, entry)
+
+    def close(self):
+        """Finish pending disk writes."""
+
+        if self._io is not None:
+            self._io.shutdown(wait=True)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["memory_entries"] = len(self._memory)
+            stats["disk_bytes"] = self._disk_bytes
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_rate"] = (
+            (stats["memory_hits"] + stats["disk_hits"]) / lookups if lookups else 0.0
+        )
+        return stats
+
+    def _record_hit(self, counter, entry):
+        self._stats[counter] += 1
+        usage = entry.get("usage") or {}
+        self._stats["saved_completion_tokens"] += usage.get("completion_tokens") or 0
+        self._stats["saved_generation_seconds"] += entry.get(
+            "generation_seconds", 0.0
+        )
+
+    def _memory_put(self, key, entry):
+        self._memory[key] = (time.time(), entry)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self._stats["evictions"] += 1
+
+    def _disk_path(self, key):
+        return self.disk_dir / f"{key}.json"
+
+    def _disk_get(self, key):
+        if self.disk_dir is None:
+            return None
+        path = self._disk_path(key)
+        try:
+            stat = path.stat()
+            if self._expired(stat.st_mtime):
+                self._disk_remove(path)
+                return None
+            with path.open("r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            with self._lock:
+                self._disk_keys.discard(key)
+            return None
+        except (OSError, json.JSONDecodeError):
+            logger.warning("Dropping unreadable response cache file %s", path)
+            self._disk_remove(path)
+            return None
+
+    def _disk_put(self, key, entry):
+        if self.disk_dir is None:
+            return
+        path = self._disk_path(key)
+        tmp_path = path.with_suffix(".tmp")
+        try:
+            with tmp_path.open("w", encoding="utf-8") as f:
+                json.dump(entry, f, ensure_ascii=False)
+            previous = path.stat().st_size if path.exists() else 0
+            os.replace(tmp_path, path)
+        except OSError:
+            logger.exception("Failed to write response cache file %s", path)
+            return
+        with self._lock:
+            self._disk_bytes += path.stat().st_size - previous
+            self._disk_keys.add(key)
+            over_budget = self._disk_bytes > self.disk_max_bytes
+        if over_budget:
+            self._disk_evict()
+
+    def _disk_remove(self, path):
+        try:
+            size = path.stat().st_size
+            path.unlink()
+        except OSError:
+            return
+        with self._lock:
+            self._disk_bytes -= size
+            self._disk_keys.discard(path.stem)
+
+    def _disk_evict(self):
+        files = []
+        for path in self.disk_dir.glob("*.json"):
+            try:
+                files.append((path.stat().st_mtime, path))
+            except OSError:
+                continue
+        files.sort()
+        for mtime, path in files:
+            with self._lock:
+                if self._disk_bytes <= self.disk_max_bytes and not self._expired(
+                    mtime
+                ):
+                    break
+                self._stats["evictions"] += 1
+            self._disk_remove(path)
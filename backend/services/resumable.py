@@ -0,0 +1,228 @@
+import asyncio
+import logging
+import time
+import uuid
+from collections import OrderedDict, deque
+
+from ..sse import SSE_DONE, sse_event
+
+logger = logging.getLogger(__name__)
+
+
+class ResumeUnavailable(Exception):
+    """The events after the requested id are no longer buffered."""
+
+
+class _Generation:
+    """One SSE stream, produced in the background and buffered for replay.
+
+    Frames are numbered from 1 and get their ``id:`` line when sent. A frame
+    is either a string or a callable that renders one (``CumulativeEncoder``
+    frames, which share one copy of the reply), so the buffer is capped by
+    count: it keeps the newest ``max_frames`` frames. When the last reader detaches before the stream is finished,
+    the producer keeps running for ``grace_seconds`` so a reconnecting
+    client can pick up where it left off; after that (or at once, when
+    ``grace_seconds`` is 0) it is cancelled, which aborts the engine
+    requests behind it.
+    """
+
+    def __init__(self, store, generation_id, events, max_frames, grace_seconds):
+        self.id = generation_id
+        self.done = False
+        self.abandoned = False
+        self.finished_at = None
+        self.readers = 0
+        self._store = store
+        self._events = events
+        self._grace_seconds = grace_seconds
+        self._frames: deque[str] = deque(maxlen=max_frames)
+        self._first_id = 1
+        self._abandon_handle = None
+        self._changed = asyncio.Event()
+        self._task = asyncio.get_running_loop().create_task(self._pump())
+        # Until the first reader attaches, the stream is as good as abandoned;
+        # the store's grace covers the gap before the response starts.
+        self._schedule_abandon(store.grace_seconds)
+
+    @property
+    def last_event_id(self):
+        return self._first_id + len(self._frames) - 1
+
+    async def _pump(self):
+        try:
+            async for frame in self._events:
+                self._append(frame)
+        except asyncio.CancelledError:
+            raise
+        except Exception:  # noqa: BLE001
+            logger.exception("Buffered stream %s failed.", self.id)
+        finally:
+            self.done = True
+            self.finished_at = time.monotonic()
+            self._cancel_abandon()
+            self._notify()
+            self._store._on_finished(self)
+            await self._events.aclose()
+
+    def _append(self, frame):
+        if len(self._frames) == self._frames.maxlen:
+            self._first_id += 1
+        self._frames.append(frame)
+        self._notify()
+
+    def _notify(self):
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    def frames(self, after=0):
+        """Frames with an id greater than ``after``, then new ones as they come.
+
+        Raises ``ResumeUnavailable`` right away if some of those frames have
+        already been dropped from the buffer.
+        """
+
+        if after + 1 < self._first_id:
+            raise ResumeUnavailable(
+                f"이벤트 {after} 이후의 스트림은 더 이상 보관되어 있지 않습니다."
+            )
+        return self._follow(after + 1)
+
+    async def _follow(self, next_id):
+        self._attach()
+        try:
+            while True:
+                while next_id <= self.last_event_id:
+                    if next_id < self._first_id:
+                        # Fell behind the buffer while the client was slow;
+                        # end the stream so the client does not take the
+                        # gap for a finished reply.
+                        logger.warning(
+                            "Reader of stream %s fell behind the buffer.", self.id
+                        )
+                        yield sse_event(
+                            {
+                                "type": "error",
+                                "message": "스트림을 따라가지 못해 일부 응답이 유실되었습니다.",
+                            }
+                        )
+                        yield SSE_DONE
+                        return
+                    frame = self._frames[next_id - self._first_id]
+                    if callable(frame):
+                        frame = frame()
+                    yield f"id: {next_id}\n{frame}"
+                    next_id += 1
+                if self.done:
+                    return
+                await self._changed.wait()
+        finally:
+            self._detach()
+
+    def _attach(self):
+        self.readers += 1
+        self._cancel_abandon()
+
+    def _detach(self):
+        self.readers -= 1
+        if self.readers > 0 or self.done:
+            return
+        if self._grace_seconds <= 0:
+            self._abandon()
+            return
+        logger.info(
+            "Stream %s lost its client; keeping it alive for %.0fs.",
+            self.id,
+            self._grace_seconds,
+        )
+        self._schedule_abandon(self._grace_seconds)
+
+    def _schedule_abandon(self, delay):
+        self._cancel_abandon()
+        self._abandon_handle = asyncio.get_running_loop().call_later(
+            delay, self._abandon
+        )
+
+    def _cancel_abandon(self):
+        if self._abandon_handle is not None:
+            self._abandon_handle.cancel()
+            self._abandon_handle = None
+
+    def _abandon(self):
+        self._abandon_handle = None
+        if self.readers == 0 and not self.done:
+            logger.info("No client resumed stream %s; cancelling generation.", self.id)
+            self.abandoned = True
+            self._task.cancel()
+
+
+class GenerationStore:
+    """Registry of resumable streams, keyed by generation id.
+
+    Finished streams stay available for ``ttl_seconds``; at most
+    ``max_finished`` of them are kept, oldest evicted first.
+    """
+
+    def __init__(self, ttl_seconds, grace_seconds, max_frames, max_finished):
+        self.ttl_seconds = ttl_seconds
+        self.grace_seconds = grace_seconds
+        self.max_frames = max_frames
+        self.max_finished = max_finished
+        self._active: dict[str, _Generation] = {}
+        self._finished: OrderedDict[str, _Generation] = OrderedDict()
+        self._stats = {"started": 0, "resumed": 0, "abandoned": 0, "expired": 0}
+
+    def start(self, events, resumable=True):
+        """Run the SSE frame iterator ``events`` in the background.
+
+        A generation that is not ``resumable`` is cancelled as soon as its
+        client disconnects instead of waiting out the grace period.
+        """
+
+        self._purge()
+        generation = _Generation(
+            self,
+            uuid.uuid4().hex,
+            events,
+            self.max_frames,
+            self.grace_seconds if resumable else 0.0,
+        )
+        self._active[generation.id] = generation
+        self._stats["started"] += 1
+        return generation
+
+    def get(self, generation_id):
+        self._purge()
+        generation = self._active.get(generation_id) or self._finished.get(
+            generation_id
+        )
+        if generation is not None:
+            self._stats["resumed"] += 1
+        return generation
+
+    def _on_finished(self, generation):
+        self._active.pop(generation.id, None)
+        if generation.abandoned:
+            # Cut short, so there is nothing worth resuming.
+            self._stats["abandoned"] += 1
+            return
+        self._finished[generation.id] = generation
+        self._purge()
+
+    def _purge(self):
+        cutoff = time.monotonic() - self.ttl_seconds
+        while self._finished:
+            generation = next(iter(self._finished.values()))
+            if (
+                len(self._finished) <= self.max_finished
+                and generation.finished_at > cutoff
+            ):
+                break
+            del self._finished[generation.id]
+            self._stats["expired"] += 1
+
+    def stats(self):
+        return {
+            **self._stats,
+            "active": len(self._active),
+            "buffered": len(self._finished),
+        }
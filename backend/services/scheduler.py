@@ -0,0 +1,133 @@
+import heapq
+import math
+from collections import deque
+
+PRIORITY_CLASSES = ("interactive", "compare", "batch")
+
+
+def _percentile(ordered, fraction):
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, max(0, math.ceil(fraction * len(ordered)) - 1))
+    return ordered[index]
+
+
+class _ClassStats:
+    def __init__(self, samples):
+        self.waiting = 0
+        self.admitted = 0
+        self.waits: deque[float] = deque(maxlen=samples)
+
+    def snapshot(self):
+        ordered = sorted(self.waits)
+        return {
+            "waiting": self.waiting,
+            "admitted": self.admitted,
+            "wait_mean_seconds": sum(ordered) / len(ordered) if ordered else 0.0,
+            "wait_p50_seconds": _percentile(ordered, 0.5),
+            "wait_p95_seconds": _percentile(ordered, 0.95),
+            "wait_max_seconds": ordered[-1] if ordered else 0.0,
+        }
+
+
+class RequestScheduler:
+    """Order requests waiting to be handed to the engine.
+
+    Each submission is ranked by ``submitted_at + class delay + length
+    penalty`` and the lowest rank is admitted first. The length penalty is
+    ``prompt_tokens * seconds_per_prompt_token`` capped at
+    ``max_length_penalty``. Because every waiting request ages at the same
+    rate, a request is never passed over by one submitted more than its
+    class delay plus length penalty later, so long conversations and batch
+    work are delayed, not starved.
+
+    At most ``max_running`` requests are inside the engine at once (``None``
+    means no limit); the rest wait here, where they can still be reordered.
+    Not thread-safe: the owning step loop serializes access.
+    """
+
+    def __init__(
+        self,
+        max_running=None,
+        class_delays=None,
+        seconds_per_prompt_token=0.0,
+        max_length_penalty=None,
+        wait_samples=1024,
+    ):
+        self.max_running = max_running
+        self.class_delays = dict(class_delays or {})
+        self.seconds_per_prompt_token = seconds_per_prompt_token
+        self.max_length_penalty = max_length_penalty
+        self._heap: list[tuple[float, int, object]] = []
+        self._waiting: dict[str, object] = {}
+        self._counter = 0
+        self._wait_samples = wait_samples
+        self._stats = {
+            name: _ClassStats(wait_samples)
+            for name in (*PRIORITY_CLASSES, *self.class_delays)
+        }
+
+    def __len__(self):
+        return len(self._waiting)
+
+    def _rank(self, submission):
+        penalty = submission.prompt_tokens * self.seconds_per_prompt_token
+        if self.max_length_penalty is not None:
+            penalty = min(penalty, self.max_length_penalty)
+        delay = self.class_delays.get(submission.priority_class, 0.0)
+        return submission.submitted_at + delay + penalty
+
+    def _class_stats(self, priority_class):
+        stats = self._stats.get(priority_class)
+        if stats is None:
+            stats = self._stats[priority_class] = _ClassStats(self._wait_samples)
+        return stats
+
+    def push(self, submission):
+        self._counter += 1
+        heapq.heappush(
+            self._heap, (self._rank(submission), self._counter, submission)
+        )
+        self._waiting[submission.request_id] = submission
+        self._class_stats(submission.priority_class).waiting += 1
+
+    def remove(self, request_id):
+        """Drop a waiting request; returns False if it is not waiting."""
+
+        submission = self._waiting.pop(request_id, None)
+        if submission is None:
+            return False
+        # The heap entry is skipped lazily in ``pop``.
+        self._class_stats(submission.priority_class).waiting -= 1
+        return True
+
+    def capacity(self, running):
+        if self.max_running is None:
+            return len(self._waiting)
+        return max(self.max_running - running, 0)
+
+    def pop(self, running, now):
+        """Return the submissions to admit given ``running`` in the engine."""
+
+        admitted = []
+        limit = self.capacity(running)
+        while self._heap and len(admitted) < limit:
+            _, _, submission = heapq.heappop(self._heap)
+            if self._waiting.get(submission.request_id) is not submission:
+                continue
+            del self._waiting[submission.request_id]
+            stats = self._class_stats(submission.priority_class)
+            stats.waiting -= 1
+            stats.admitted += 1
+            stats.waits.append(now - submission.submitted_at)
+            admitted.append(submission)
+        return admitted
+
+    def clear(self):
+        self._heap.clear()
+        self._waiting.clear()
+        for stats in self._stats.values():
+            stats.waiting = 0
+
+    def stats(self):
+        return {name: stats.snapshot() for name, stats in self._stats.items()}
@@ -0,0 +1,155 @@
+import asyncio
+import logging
+from dataclasses import replace
+
+from .text_log import TextLog
+
+logger = logging.getLogger(__name__)
+
+
+class _Flight:
+    """One running generation shared by every subscriber with the same key.
+
+    Chunks are stored without their cumulative ``text``/``think_text`` so a
+    long answer costs memory linear in its length; each subscriber rebuilds
+    the cumulative fields from the deltas it replays.
+    """
+
+    def __init__(self, group, key, source):
+        self.key = key
+        self.chunks = []
+        self.done = False
+        self.error: BaseException | None = None
+        self.subscribers = 0
+        self._group = group
+        self._source = source
+        self._changed = asyncio.Event()
+        self._task = asyncio.get_running_loop().create_task(self._pump())
+
+    async def _pump(self):
+        try:
+            async for chunk in self._source:
+                self.chunks.append(replace(chunk, text="", think_text=None))
+                self._notify()
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:  # noqa: BLE001
+            self.error = exc
+        finally:
+            self.done = True
+            self._group._discard(self)
+            self._notify()
+            await self._source.aclose()
+
+    def _notify(self):
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    async def wait(self):
+        await self._changed.wait()
+
+    def subscribe(self):
+        self.subscribers += 1
+        return _Subscription(self, prefix=len(self.chunks))
+
+    def unsubscribe(self):
+        self.subscribers -= 1
+        if self.subscribers <= 0 and not self.done:
+            # Nobody is listening anymore; stop the generation.
+            self._group._discard(self)
+            self._task.cancel()
+
+
+class _Subscription:
+    """Async iterator of ``StreamChunk``s for one subscriber of a flight."""
+
+    def __init__(self, flight, prefix):
+        self._flight = flight
+        self._index = 0
+        self._prefix = prefix
+        self._closed = False
+        self._text = TextLog()
+        self._think_text = TextLog()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        flight = self._flight
+        if self._closed:
+            raise StopAsyncIteration
+        while self._index >= len(flight.chunks):
+            if flight.error is not None:
+                await self.aclose()
+                raise flight.error
+            if flight.done:
+                await self.aclose()
+                raise StopAsyncIteration
+            await flight.wait()
+
+        if self._prefix > 1:
+            # Late joiner: fold everything generated so far into one chunk.
+            chunks = flight.chunks[: self._prefix]
+            chunk = replace(
+                chunks[-1],
+                delta="".join(item.delta for item in chunks),
+                reasoning_delta="".join(item.reasoning_delta for item in chunks),
+            )
+            self._index = self._prefix
+        else:
+            chunk = flight.chunks[self._index]
+            self._index += 1
+        self._prefix = 0
+
+        self._text.append(chunk.delta)
+        self._think_text.append(chunk.reasoning_delta)
+        if chunk.finished:
+            await self.aclose()
+        return replace(
+            chunk,
+            text=self._text.snapshot(),
+            think_text=(
+                self._think_text.snapshot()
+                if chunk.thinking and self._think_text.length
+                else None
+            ),
+        )
+
+    async def aclose(self):
+        if not self._closed:
+            self._closed = True
+            self._flight.unsubscribe()
+
+
+class SingleFlightGroup:
+    """Coalesce identical in-flight generations into one engine request."""
+
+    def __init__(self):
+        self._flights: dict[str, _Flight] = {}
+        self._stats = {"leaders": 0, "followers": 0}
+
+    def active(self, key):
+        return key in self._flights
+
+    def join(self, key, start):
+        """Subscribe to the flight for ``key``, starting it with ``start()``.
+
+        ``start`` must return an async chunk iterator with ``aclose()``; it is
+        only called when no generation for ``key`` is running.
+        """
+
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = _Flight(self, key, start())
+            self._flights[key] = flight
+            self._stats["leaders"] += 1
+        else:
+            self._stats["followers"] += 1
+        return flight.subscribe()
+
+    def _discard(self, flight):
+        if self._flights.get(flight.key) is flight:
+            del self._flights[flight.key]
+
+    def stats(self):
+        return {**self._stats, "in_flight": len(self._flights)}
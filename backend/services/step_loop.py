@@ -0,0 +1,324 @@
+import asyncio
+import logging
+import threading
+import time
+from collections.abc import AsyncIterator, Callable, Iterator
+from dataclasses import dataclass, field
+from queue import Queue
+from typing import Any
+
+from .scheduler import RequestScheduler
+
+logger = logging.getLogger(__name__)
+
+_ABORTED = object()
+
+
+@dataclass
+class _Submission:
+    request_id: str
+    prompt: Any
+    params: Any
+    sink: Callable[[Any], None]
+    kwargs: dict = field(default_factory=dict)
+    priority_class: str = "interactive"
+    prompt_tokens: int = 0
+    submitted_at: float = field(default_factory=time.monotonic)
+
+
+def _prompt_tokens(prompt):
+    if isinstance(prompt, dict):
+        return len(prompt.get("prompt_token_ids") or ())
+    return 0
+
+
+def _threadsafe_sink(loop, queue):
+    def sink(item):
+        try:
+            loop.call_soon_threadsafe(queue.put_nowait, item)
+        except RuntimeError:
+            # The consumer's event loop is gone; nobody is listening anymore.
+            pass
+
+    return sink
+
+
+class AsyncRequestStream:
+    """Outputs of one submitted request, consumed with ``async for``.
+
+    Outputs are handed from the driver thread to the event loop, so an open
+    stream costs a coroutine rather than a worker thread.
+    """
+
+    def __init__(self, step_loop, request_id, loop):
+        self.request_id = request_id
+        self.finished = False
+        self._step_loop = step_loop
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self.sink = _threadsafe_sink(loop, self._queue)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self.finished:
+            raise StopAsyncIteration
+        item = await self._queue.get()
+        if item is _ABORTED:
+            raise StopAsyncIteration
+        if isinstance(item, BaseException):
+            self.finished = True
+            raise item
+        self.finished = item.finished
+        return item
+
+    def abort(self):
+        if not self.finished:
+            self.finished = True
+            self._step_loop.abort(self.request_id)
+            # Wake a consumer that may be waiting for the next output.
+            self._queue.put_nowait(_ABORTED)
+
+
+class EngineStepLoop:
+    """Drive ``step()`` for one vLLM engine from a single dedicated thread.
+
+    Callers never touch the engine directly. They submit requests together
+    with a sink callable; the driver thread adds them to the engine between
+    steps and hands every ``RequestOutput`` to the sink registered for its
+    ``request_id``. Exceptions raised while adding or stepping are delivered
+    to the affected sinks instead of outputs.
+
+    Submissions wait in a ``RequestScheduler`` that decides which of them
+    enter the engine next and how many may run at once.
+    """
+
+    def __init__(self, engine, name="engine", scheduler=None):
+        self._engine = engine
+        self._name = name
+        self._cond = threading.Condition()
+        self._scheduler = RequestScheduler() if scheduler is None else scheduler
+        self._running: set[str] = set()
+        self._aborts: list[str] = []
+        self._sinks: dict[str, Callable[[Any], None]] = {}
+        self._busy = False
+        self._closed = False
+        self._thread: threading.Thread | None = None
+
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(
+                target=self._run,
+                name=f"vllm-step-loop-{self._name}",
+                daemon=True,
+            )
+            self._thread.start()
+
+    def submit(
+        self, request_id, prompt, params, sink, priority_class="interactive", **kwargs
+    ):
+        """Queue a request; its outputs will be passed to ``sink``."""
+
+        self.submit_many(
+            [
+                _Submission(
+                    request_id,
+                    prompt,
+                    params,
+                    sink,
+                    kwargs,
+                    priority_class=priority_class,
+                    prompt_tokens=_prompt_tokens(prompt),
+                )
+            ]
+        )
+
+    def submit_many(self, submissions):
+        """Queue several requests so they join the same engine step."""
+
+        with self._cond:
+            if self._closed:
+                raise RuntimeError(f"Step loop '{self._name}' is closed.")
+            for submission in submissions:
+                if submission.request_id in self._sinks:
+                    raise ValueError(
+                        f"Duplicate request id '{submission.request_id}'"
+                    )
+                self._sinks[submission.request_id] = submission.sink
+            for submission in submissions:
+                self._scheduler.push(submission)
+            self._ensure_thread()
+            self._cond.notify()
+
+    def abort(self, request_id):
+        with self._cond:
+            if self._sinks.pop(request_id, None) is None:
+                return
+            if self._scheduler.remove(request_id):
+                # Never reached the engine, nothing to free.
+                return
+            self._running.discard(request_id)
+            self._aborts.append(request_id)
+            self._cond.notify()
+
+    def stream(
+        self, request_id, prompt, params, priority_class="interactive", **kwargs
+    ) -> Iterator[Any]:
+        """Blocking iterator over the outputs of a single request."""
+
+        outputs: Queue = Queue()
+        self.submit(
+            request_id, prompt, params, outputs.put, priority_class, **kwargs
+        )
+        finished = False
+        try:
+            while not finished:
+                item = outputs.get()
+                if isinstance(item, BaseException):
+                    finished = True
+                    raise item
+                finished = item.finished
+                yield item
+        finally:
+            if not finished:
+                self.abort(request_id)
+
+    def open_streams(
+        self, requests, priority_class="interactive"
+    ) -> list["AsyncRequestStream"]:
+        """Submit ``(request_id, prompt, params, kwargs)`` tuples together.
+
+        The returned streams are live immediately and must be drained or
+        aborted by the caller. Requests opened in one call are queued at the
+        same time, so they normally join the same prefill batch.
+        """
+
+        loop = asyncio.get_running_loop()
+        streams = []
+        submissions = []
+        for request_id, prompt, params, kwargs in requests:
+            stream = AsyncRequestStream(self, request_id, loop)
+            streams.append(stream)
+            submissions.append(
+                _Submission(
+                    request_id,
+                    prompt,
+                    params,
+                    stream.sink,
+                    kwargs,
+                    priority_class=priority_class,
+                    prompt_tokens=_prompt_tokens(prompt),
+                )
+            )
+        self.submit_many(submissions)
+        return streams
+
+    async def astream(
+        self, request_id, prompt, params, priority_class="interactive", **kwargs
+    ) -> AsyncIterator[Any]:
+        """Async iterator over the outputs of a single request."""
+
+        [stream] = self.open_streams(
+            [(request_id, prompt, params, kwargs)], priority_class
+        )
+        try:
+            async for output in stream:
+                yield output
+        finally:
+            stream.abort()
+
+    @property
+    def active_requests(self):
+        with self._cond:
+            return len(self._sinks)
+
+    def scheduler_stats(self):
+        with self._cond:
+            return {
+                "running": len(self._running),
+                "waiting": len(self._scheduler),
+                "max_running": self._scheduler.max_running,
+                "classes": self._scheduler.stats(),
+            }
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def _run(self):
+        engine = self._engine
+        while True:
+            with self._cond:
+                while not (
+                    self._closed
+                    or self._aborts
+                    or self._busy
+                    or (len(self._scheduler) and self._has_capacity())
+                ):
+                    self._cond.wait()
+                if self._closed:
+                    return
+                pending = self._scheduler.pop(len(self._running), time.monotonic())
+                self._running.update(item.request_id for item in pending)
+                aborts, self._aborts = self._aborts, []
+
+            try:
+                if aborts:
+                    engine.abort_request(aborts)
+                for submission in pending:
+                    self._add(submission)
+                self._busy = engine.has_unfinished_requests()
+                if not self._busy:
+                    continue
+                outputs = engine.step()
+            except Exception as exc:  # noqa: BLE001
+                logger.exception("vLLM step loop '%s' failed.", self._name)
+                self._fail_all(exc)
+                self._busy = False
+                continue
+
+            for output in outputs:
+                self._dispatch(output)
+            self._busy = engine.has_unfinished_requests()
+
+    def _has_capacity(self):
+        return self._scheduler.capacity(len(self._running)) > 0
+
+    def _add(self, submission):
+        with self._cond:
+            if submission.request_id not in self._sinks:
+                return
+        try:
+            self._engine.add_request(
+                submission.request_id,
+                submission.prompt,
+                submission.params,
+                **submission.kwargs,
+            )
+        except Exception as exc:  # noqa: BLE001
+            with self._cond:
+                self._sinks.pop(submission.request_id, None)
+                self._running.discard(submission.request_id)
+            submission.sink(exc)
+
+    def _dispatch(self, output):
+        with self._cond:
+            if output.finished:
+                self._running.discard(output.request_id)
+                sink = self._sinks.pop(output.request_id, None)
+            else:
+                sink = self._sinks.get(output.request_id)
+        if sink is not None:
+            sink(output)
+
+    def _fail_all(self, exc):
+        with self._cond:
+            sinks = list(self._sinks.values())
+            self._sinks.clear()
+            self._running.clear()
+            self._scheduler.clear()
+        for sink in sinks:
+            sink(exc)
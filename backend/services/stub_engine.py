@@ -0,0 +1,166 @@
+import asyncio
+import hashlib
+import random
+
+from ..schemas import UsageReport
+from .text_log import TextLog
+from .think_parser import THINK_CLOSE, THINK_OPEN, ThinkStreamParser
+from .vllm_client import StreamChunk
+
+_THINK_WORDS = (
+    "사용자가", "임대차", "계약", "종료", "시점을", "묻고", "있다.", "보증금",
+    "반환", "요건을", "먼저", "정리하고", "예외를", "살펴보자.",
+)
+_ANSWER_WORDS = (
+    "임대차", "계약이", "종료되면", "임대인은", "보증금을", "반환할", "의무가",
+    "있습니다.", "다만", "임차인도", "목적물을", "원상회복하여", "인도해야",
+    "하며,", "두", "의무는", "동시이행", "관계에", "있습니다.", "분쟁이",
+    "생기면", "내용증명을", "보내는", "것이", "좋습니다.",
+)
+_DISCLAIMER = " 더 정확한 정보를 원하신다면 변호사와 상담하세요."
+
+
+def _rng(variant, history, user_message):
+    digest = hashlib.blake2b(digest_size=8)
+    digest.update(variant.encode("utf-8"))
+    for msg in history:
+        digest.update(msg.content.encode("utf-8"))
+    digest.update(user_message.encode("utf-8"))
+    return random.Random(int.from_bytes(digest.digest(), "big"))
+
+
+def _stub_tokens(rng, think_tokens, answer_tokens):
+    tokens = [THINK_OPEN]
+    tokens += [" " + rng.choice(_THINK_WORDS) for _ in range(think_tokens)]
+    tokens += [THINK_CLOSE, "\n\n"]
+    tokens += [
+        (" " if idx else "") + rng.choice(_ANSWER_WORDS)
+        for idx in range(answer_tokens)
+    ]
+    tokens.append(_DISCLAIMER)
+    return tokens
+
+
+class _StubChunkStream:
+    """Emit the stub tokens one per ``token_seconds`` after a prefill delay."""
+
+    def __init__(self, engine, tokens, prompt_tokens, prefill_seconds):
+        self._engine = engine
+        self._tokens = tokens
+        self._prompt_tokens = prompt_tokens
+        self._prefill_seconds = prefill_seconds
+        self._index = 0
+        self._finished = False
+        self._parser = ThinkStreamParser()
+        self._text = TextLog()
+        self._think_text = TextLog()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self._finished:
+            raise StopAsyncIteration
+        if self._index == 0:
+            await asyncio.sleep(self._prefill_seconds)
+        else:
+            await asyncio.sleep(self._engine.token_seconds)
+
+        delta, reasoning_delta = self._parser.feed(self._tokens[self._index])
+        self._index += 1
+        finished = self._index == len(self._tokens)
+        usage = None
+        if finished:
+            tail, reasoning_tail = self._parser.close()
+            delta += tail
+            reasoning_delta += reasoning_tail
+            usage = UsageReport(
+                prompt_tokens=self._prompt_tokens,
+                completion_tokens=len(self._tokens),
+                total_tokens=self._prompt_tokens + len(self._tokens),
+            )
+        self._text.append(delta)
+        self._think_text.append(reasoning_delta)
+        self._finished = finished
+        thinking = self._parser.thinking
+        return StreamChunk(
+            delta=delta,
+            text=self._text.snapshot(),
+            finished=finished,
+            usage=usage,
+            thinking=thinking,
+            think_text=(
+                self._think_text.snapshot()
+                if thinking and self._think_text.length
+                else None
+            ),
+            reasoning_delta=reasoning_delta,
+            finish_reason="stop" if finished else None,
+        )
+
+    async def aclose(self):
+        if not self._finished:
+            self._finished = True
+            self._engine.abort_stats["aborted_requests"] += 1
+            self._engine.abort_stats["discarded_tokens"] += self._index
+
+
+class StubEngine:
+    """Simulated engine with the ``LocalVLLMEngine`` interface.
+
+    Replies are deterministic Korean text (a think section, then an answer)
+    chosen from the variant, history and message. Time to first token is
+    ``prefill_seconds + prompt tokens * prefill_seconds_per_token``; every
+    further token takes ``token_seconds``. Prompt tokens are approximated
+    as one per two characters.
+    """
+
+    def __init__(self, variant_name, profile, stub_profile):
+        self.variant = variant_name
+        self.display_name = profile.get("display_name") or variant_name
+        self.prefill_seconds = float(stub_profile.get("prefill_seconds", 0.0))
+        self.prefill_seconds_per_token = float(
+            stub_profile.get("prefill_seconds_per_token", 0.0)
+        )
+        self.token_seconds = float(stub_profile.get("token_seconds", 0.0))
+        self.think_tokens = int(stub_profile.get("think_tokens", 0))
+        self.answer_tokens = int(stub_profile.get("answer_tokens", 1))
+        self.abort_stats = {"aborted_requests": 0, "discarded_tokens": 0}
+
+    def stream_generate(
+        self,
+        history,
+        user_message,
+        conversation_id=None,
+        priority_class="interactive",
+    ):
+        chars = sum(len(msg.content) for msg in history) + len(user_message)
+        prompt_tokens = chars // 2 + 1
+        tokens = _stub_tokens(
+            _rng(self.variant, history, user_message),
+            self.think_tokens,
+            self.answer_tokens,
+        )
+        return _StubChunkStream(
+            self,
+            tokens,
+            prompt_tokens,
+            self.prefill_seconds + prompt_tokens * self.prefill_seconds_per_token,
+        )
+
+    async def generate(
+        self,
+        history,
+        user_message,
+        conversation_id=None,
+        priority_class="interactive",
+    ):
+        last, usage = None, None
+        stream = self.stream_generate(history, user_message, conversation_id)
+        try:
+            async for chunk in stream:
+                last = chunk
+                usage = chunk.usage or usage
+        finally:
+            await stream.aclose()
+        return (last.text if last is not None else ""), usage
@@ -0,0 +1,54 @@
+from functools import partial
+
+
+class TextLog:
+    """Text built from streamed deltas, joined only when it is read.
+
+    ``append`` is O(1) per delta; ``snapshot()`` returns a callable for the
+    text so far, so a chunk can carry its cumulative text without building
+    it. Reading joins the pending deltas once and keeps the result.
+    """
+
+    def __init__(self):
+        self._parts: list[str] = []
+        self.length = 0
+
+    def append(self, delta):
+        if delta:
+            self._parts.append(delta)
+            self.length += len(delta)
+
+    def text(self, length=None):
+        if len(self._parts) > 1:
+            self._parts[:] = ["".join(self._parts)]
+        joined = self._parts[0] if self._parts else ""
+        if length is None or length == len(joined):
+            return joined
+        return joined[:length]
+
+    def snapshot(self):
+        return partial(self.text, self.length)
+
+
+class LazyText:
+    """Dataclass field holding a string or a ``TextLog.snapshot()``.
+
+    The snapshot is resolved, and replaced by its string, on first read.
+    """
+
+    def __init__(self, default=""):
+        self._default = default
+
+    def __set_name__(self, owner, name):
+        self._attr = f"_{name}"
+
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self._default
+        value = instance.__dict__.get(self._attr, self._default)
+        if callable(value):
+            value = instance.__dict__[self._attr] = value()
+        return value
+
+    def __set__(self, instance, value):
+        instance.__dict__[self._attr] = value
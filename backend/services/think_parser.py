@@ -0,0 +1,119 @@
+import re
+
+THINK_OPEN = "<think>"
+THINK_CLOSE = "</think>"
+_TAG_PATTERNS = {
+    THINK_OPEN: re.compile(re.escape(THINK_OPEN), re.IGNORECASE),
+    THINK_CLOSE: re.compile(re.escape(THINK_CLOSE), re.IGNORECASE),
+}
+
+
+def strip_think_tag(text):
+    lowered = text.lower()
+    result = []
+    idx = 0
+    while idx < len(text):
+        start = lowered.find(THINK_OPEN, idx)
+        if start == -1:
+            result.append(text[idx:])
+            break
+        result.append(text[idx:start])
+        end = lowered.find(THINK_CLOSE, start)
+        if end == -1:
+            # Drop everything after an opening tag with no closing tag yet.
+            break
+        idx = end + len(THINK_CLOSE)
+    cleaned = "".join(result)
+    return cleaned.strip()
+
+
+def _partial_tag_length(text, tag):
+    """Length of the longest suffix of ``text`` that starts ``tag``."""
+
+    for size in range(min(len(text), len(tag) - 1), 0, -1):
+        if tag.startswith(text[-size:].lower()):
+            return size
+    return 0
+
+
+class ThinkStreamParser:
+    """Split streamed model output into answer and reasoning deltas.
+
+    ``feed`` only looks at the new characters plus at most one tag's worth of
+    held-back input, so parsing a whole answer is linear in its length. The
+    answer side matches ``strip_think_tag``: text inside ``<think>`` blocks
+    (or after an unclosed one) is reasoning, and the concatenated answer is
+    stripped of leading and trailing whitespace. Trailing whitespace is held
+    back until more answer text arrives and dropped if none does.
+    """
+
+    def __init__(self):
+        self.thinking = False
+        self._pending = ""
+        self._answer_started = False
+        self._answer_space = ""
+        self._reasoning_started = False
+
+    def feed(self, text):
+        """Consume new output text and return ``(answer, reasoning)`` deltas."""
+
+        buffer = self._pending + text
+        self._pending = ""
+        answer_parts = []
+        reasoning_parts = []
+        pos = 0
+        while pos < len(buffer):
+            tag = THINK_CLOSE if self.thinking else THINK_OPEN
+            match = _TAG_PATTERNS[tag].search(buffer, pos)
+            found = match.start() if match else -1
+            if found == -1:
+                keep = _partial_tag_length(buffer[pos:], tag)
+                end = len(buffer) - keep
+                self._pending = buffer[end:]
+            else:
+                end = found
+            segment = buffer[pos:end]
+            if self.thinking:
+                reasoning_parts.append(self._reasoning(segment))
+            else:
+                answer_parts.append(self._answer(segment))
+            if found == -1:
+                break
+            self.thinking = not self.thinking
+            pos = found + len(tag)
+        return "".join(answer_parts), "".join(reasoning_parts)
+
+    def close(self):
+        """Flush held-back input at the end of the stream."""
+
+        pending, self._pending = self._pending, ""
+        if self.thinking:
+            self._answer_space = ""
+            return "", self._reasoning(pending)
+        answer = self._answer(pending)
+        self._answer_space = ""
+        return answer, ""
+
+    def _answer(self, segment):
+        if not segment:
+            return ""
+        if not self._answer_started:
+            segment = segment.lstrip()
+            if not segment:
+                return ""
+            self._answer_started = True
+        body = segment.rstrip()
+        if not body:
+            self._answer_space += segment
+            return ""
+        emitted = self._answer_space + body
+        self._answer_space = segment[len(body) :]
+        return emitted
+
+    def _reasoning(self, segment):
+        if not self._reasoning_started:
+            segment = segment.lstrip()
+            if not segment:
+                return ""
+            self._reasoning_started = True
+        return segment
@@ -1,53 +1,50 @@
 import asyncio
 import logging
 import os
-import re
-from collections.abc import Iterator
-from copy import deepcopy
+import time
+from contextlib import contextmanager
 from dataclasses import dataclass
 from pathlib import Path
 from typing import Any
 
-from transformers import AutoTokenizer
-from vllm import LLM, SamplingParams
-from vllm.entrypoints.utils import _validate_truncation_size
-from vllm.lora.request import LoRARequest
-from vllm.sampling_params import RequestOutputKind
-
 from .. import config
 from ..schemas import UsageReport
+from .admission import AdmissionController, DeadlineChunkStream, DeadlineExceeded
+from .prompt_cache import ConversationPromptCache
+from .response_cache import CACHEABLE_FINISH_REASONS, ResponseCache, fingerprint
+from .scheduler import RequestScheduler
+from .single_flight import SingleFlightGroup
+from .step_loop import EngineStepLoop
+from .text_log import LazyText, TextLog
+from .think_parser import ThinkStreamParser, strip_think_tag
+
+try:
+    from transformers import AutoTokenizer
+    from vllm import LLM, SamplingParams
+    from vllm.entrypoints.utils import _validate_truncation_size
+    from vllm.lora.request import LoRARequest
+    from vllm.sampling_params import RequestOutputKind
+except ImportError as exc:
+    # Only the stub engine (ENGINE_BACKEND = "stub") works without these.
+    _VLLM_IMPORT_ERROR = exc
+else:
+    _VLLM_IMPORT_ERROR = None
 
 logger = logging.getLogger(__name__)
 
-THINK_OPEN = "<think>"
-THINK_CLOSE = "</think>"
-
 
 @dataclass
 class StreamChunk:
+    # ``text``/``think_text`` are cumulative; streams pass
+    # ``TextLog.snapshot()``s so they are only joined if someone reads them.
     delta: str
-    text: str
     finished: bool
+    text: str = LazyText()
     usage: UsageReport | None = None
-
-
-def _strip_think_tag(text):
-    lowered = text.lower()
-    result = []
-    idx = 0
-    while idx < len(text):
-        start = lowered.find(THINK_OPEN, idx)
-        if start == -1:
-            result.append(text[idx:])
-            break
-        result.append(text[idx:start])
-        end = lowered.find(THINK_CLOSE, start)
-        if end == -1:
-            # Drop everything after an opening tag with no closing tag yet.
-            break
-        idx = end + len(THINK_CLOSE)
-    cleaned = "".join(result)
-    return cleaned.strip()
+    thinking: bool = False
+    think_text: str | None = LazyText(default=None)
+    reasoning_delta: str = ""
+    finish_reason: str | None = None
 
 
 def _maybe_resolve_local_path(path_like):
@@ -59,8 +56,268 @@ def _maybe_resolve_local_path(path_like):
     return str(path_like)
 
 
+def _is_lora_adapter(path_like):
+    if not path_like:
+        return False
+    return (Path(path_like).expanduser() / "adapter_config.json").exists()
+
+
+def _sampling_params(output_kind):
+    return SamplingParams(
+        temperature=config.TEMPERATURE,
+        top_p=config.TOP_P,
+        max_tokens=config.MAX_NEW_TOKENS,
+        output_kind=output_kind,
+    )
+
+
+def _max_num_seqs(llm):
+    engine = llm.llm_engine
+    scheduler_config = getattr(engine, "scheduler_config", None)
+    if scheduler_config is None:
+        scheduler_config = engine.vllm_config.scheduler_config
+    return scheduler_config.max_num_seqs
+
+
+def _request_scheduler(profile, llm):
+    max_running = profile.get("scheduler_max_running", config.SCHEDULER_MAX_RUNNING)
+    if max_running is None:
+        max_running = _max_num_seqs(llm)
+    return RequestScheduler(
+        max_running=int(max_running),
+        class_delays=config.SCHEDULER_CLASS_DELAY_SECONDS,
+        seconds_per_prompt_token=config.SCHEDULER_SECONDS_PER_PROMPT_TOKEN,
+        max_length_penalty=config.SCHEDULER_MAX_LENGTH_PENALTY_SECONDS,
+    )
+
+
+@contextmanager
+def _device_scope(device_ids):
+    previous_devices = os.environ.get("CUDA_VISIBLE_DEVICES")
+    try:
+        if device_ids:
+            os.environ["CUDA_VISIBLE_DEVICES"] = device_ids
+        yield
+    finally:
+        if device_ids:
+            if previous_devices is None:
+                os.environ.pop("CUDA_VISIBLE_DEVICES", None)
+            else:
+                os.environ["CUDA_VISIBLE_DEVICES"] = previous_devices
+
+
+class _EngineBackbone:
+    """One vLLM ``LLM`` instance, its tokenizer and the loop that steps it."""
+
+    def __init__(self, name, model, tokenizer_source, profile, enable_lora):
+        self.name = name
+        self.model = model
+        self.tokenizer = AutoTokenizer.from_pretrained(
+            tokenizer_source,
+            trust_remote_code=True,
+        )
+        if self.tokenizer.pad_token is None:
+            self.tokenizer.pad_token = self.tokenizer.eos_token
+
+        tensor_parallel = int(
+            profile.get("tensor_parallel_size", config.TENSOR_PARALLEL_SIZE)
+        )
+        gpu_utilization = float(
+            profile.get("gpu_memory_utilization", config.GPU_MEMORY_UTILIZATION)
+        )
+        lora_kwargs = {}
+        if enable_lora:
+            for key in ("max_lora_rank", "max_loras"):
+                if profile.get(key) is not None:
+                    lora_kwargs[key] = int(profile[key])
+
+        self.enable_prefix_caching = bool(
+            profile.get("enable_prefix_caching", config.ENABLE_PREFIX_CACHING)
+        )
+
+        self.llm = LLM(
+            model=model,
+            tokenizer=tokenizer_source,
+            tensor_parallel_size=tensor_parallel,
+            trust_remote_code=True,
+            gpu_memory_utilization=gpu_utilization,
+            enable_lora=enable_lora,
+            enable_prefix_caching=self.enable_prefix_caching,
+            **lora_kwargs,
+        )
+        self.step_loop = EngineStepLoop(
+            self.llm.llm_engine,
+            name=name,
+            scheduler=_request_scheduler(profile, self.llm),
+        )
+        self.prompt_cache = ConversationPromptCache(
+            self.tokenizer,
+            config.SYSTEM_PROMPT,
+            max_conversations=config.PROMPT_CACHE_MAX_CONVERSATIONS,
+        )
+
+
+class _ChunkStream:
+    """Async iterator of ``StreamChunk``s for an already submitted request.
+
+    The request must use ``RequestOutputKind.DELTA``: every output carries
+    only the text and token ids produced since the previous one. Call
+    ``aclose()`` when abandoning the stream early so the request is aborted
+    inside the engine.
+    """
+
+    def __init__(self, request_stream, engine, on_finish=None, reservation=None):
+        self._request = request_stream
+        self._engine = engine
+        self._reservation = reservation
+        self._on_finish = on_finish
+        self._finished = False
+        self._parser = ThinkStreamParser()
+        self._text = TextLog()
+        self._think_text = TextLog()
+        self._prompt_tokens = 0
+        self._completion_tokens = 0
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        output = await self._request.__anext__()
+        while not output.outputs:
+            output = await self._request.__anext__()
+
+        completion = output.outputs[0]
+        if output.prompt_token_ids and not self._prompt_tokens:
+            self._prompt_tokens = len(output.prompt_token_ids)
+            self._engine._record_prompt(output)
+        self._completion_tokens += len(completion.token_ids or ())
+        delta, reasoning_delta = self._parser.feed(completion.text or "")
+
+        usage = None
+        finished = output.finished and completion.finished()
+        if finished:
+            tail, reasoning_tail = self._parser.close()
+            delta += tail
+            reasoning_delta += reasoning_tail
+            usage = UsageReport(
+                prompt_tokens=self._prompt_tokens,
+                completion_tokens=self._completion_tokens,
+                total_tokens=self._prompt_tokens + self._completion_tokens,
+            )
+        self._text.append(delta)
+        self._think_text.append(reasoning_delta)
+        finish_reason = completion.finish_reason if finished else None
+        self._finished = finished
+        if finished:
+            self._release()
+            if self._on_finish is not None:
+                self._on_finish(self._text.text(), usage, finish_reason)
+
+        thinking = self._parser.thinking
+        return StreamChunk(
+            delta=delta,
+            text=self._text.snapshot(),
+            finished=finished,
+            usage=usage,
+            thinking=thinking,
+            think_text=(
+                self._think_text.snapshot()
+                if thinking and self._think_text.length
+                else None
+            ),
+            reasoning_delta=reasoning_delta,
+            finish_reason=finish_reason,
+        )
+
+    def _release(self):
+        if self._reservation is not None:
+            self._reservation.release()
+            self._reservation = None
+
+    async def aclose(self):
+        if not self._finished:
+            self._finished = True
+            self._request.abort()
+            self._engine._record_abort(self._completion_tokens)
+        self._release()
+
+
+class _ReplayChunkStream:
+    """Replay a cached reply as a quick sequence of ``StreamChunk``s."""
+
+    def __init__(self, entry, piece_chars):
+        reply = entry.get("reply") or ""
+        self._pieces = [
+            reply[idx : idx + piece_chars]
+            for idx in range(0, len(reply), piece_chars)
+        ] or [""]
+        self._usage = UsageReport(**entry["usage"]) if entry.get("usage") else None
+        self._finish_reason = entry.get("finish_reason")
+        self._index = 0
+        self._text = TextLog()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self._index >= len(self._pieces):
+            raise StopAsyncIteration
+        # Let other streams run between frames of a long cached reply.
+        await asyncio.sleep(0)
+        delta = self._pieces[self._index]
+        self._index += 1
+        self._text.append(delta)
+        finished = self._index == len(self._pieces)
+        return StreamChunk(
+            delta=delta,
+            text=self._text.snapshot(),
+            finished=finished,
+            usage=self._usage if finished else None,
+            finish_reason=self._finish_reason if finished else None,
+        )
+
+    async def aclose(self):
+        self._index = len(self._pieces)
+
+
+class _DiskReplayChunkStream:
+    """Replay of a response-cache entry that is only on disk.
+
+    The entry is read off the event loop on the first ``__anext__``; if it
+    has disappeared meanwhile, the stream from ``fallback()`` is used.
+    """
+
+    def __init__(self, cache, key, fallback):
+        self._cache = cache
+        self._key = key
+        self._fallback = fallback
+        self._stream = None
+        self._closed = False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self._stream is None:
+            if self._closed:
+                raise StopAsyncIteration
+            entry = await self._cache.load(self._key)
+            if entry is not None:
+                self._stream = _ReplayChunkStream(
+                    entry, config.RESPONSE_CACHE_REPLAY_CHARS
+                )
+            else:
+                self._stream = self._fallback()
+        return await self._stream.__anext__()
+
+    async def aclose(self):
+        self._closed = True
+        if self._stream is not None:
+            await self._stream.aclose()
+
+
 class LocalVLLMEngine:
-    def __init__(self, variant_name: str, profile: dict):
+    def __init__(self, variant_name: str, profile: dict, backbone=None):
         self.lora_request: LoRARequest | None = None
         self.variant = variant_name
         self.display_name = profile.get("display_name", variant_name)
@@ -72,70 +329,225 @@ class LocalVLLMEngine:
         adapter_path = _maybe_resolve_local_path(adapter_path)
         if adapter_path:
             adapter_path = Path(adapter_path).expanduser()
-            adapter_cfg = adapter_path / "adapter_config.json"
-            if adapter_cfg.exists():
+            if _is_lora_adapter(adapter_path):
                 adapter_name = adapter_path.name
                 adapter_root = str(adapter_path.resolve())
                 self.lora_request = LoRARequest(
-                    adapter_name, 1, adapter_root
+                    adapter_name, int(profile.get("lora_id", 1)), adapter_root
+                )
+            elif backbone is not None:
+                raise ValueError(
+                    f"Variant '{variant_name}' uses full weights and cannot "
+                    "share a base engine."
                 )
             else:
                 resolved = str(adapter_path.resolve())
                 base_model = resolved
                 tokenizer_source = resolved
 
-        self.tokenizer = AutoTokenizer.from_pretrained(
-            tokenizer_source,
-            trust_remote_code=True,
+        if backbone is None:
+            backbone = _EngineBackbone(
+                variant_name,
+                base_model,
+                tokenizer_source,
+                profile,
+                enable_lora=self.lora_request is not None,
+            )
+        self.backbone = backbone
+        self.llm = backbone.llm
+        self.tokenizer = backbone.tokenizer
+        self.step_loop = backbone.step_loop
+
+        self.prefix_stats = {"requests": 0, "prompt_tokens": 0, "cached_tokens": 0}
+        self.abort_stats = {
+            "aborted_requests": 0,
+            "discarded_tokens": 0,
+            "tokens_saved": 0,
+        }
+
+        self.sampling_params = _sampling_params(RequestOutputKind.FINAL_ONLY)
+        # Streams only receive newly produced text and token ids each step.
+        self.stream_sampling_params = _sampling_params(RequestOutputKind.DELTA)
+
+    def _prepare_prompt(self, history, user_message, conversation_id=None):
+        prompt_token_ids = self.backbone.prompt_cache.build(
+            conversation_id, history, user_message
+        )
+        return {"prompt_token_ids": prompt_token_ids}
+
+    def _record_prompt(self, output):
+        cached_tokens = getattr(output, "num_cached_tokens", None) or 0
+        self.prefix_stats["requests"] += 1
+        self.prefix_stats["prompt_tokens"] += len(output.prompt_token_ids or ())
+        self.prefix_stats["cached_tokens"] += cached_tokens
+
+    def _record_abort(self, completion_tokens):
+        self.abort_stats["aborted_requests"] += 1
+        self.abort_stats["discarded_tokens"] += completion_tokens
+        self.abort_stats["tokens_saved"] += max(
+            self.stream_sampling_params.max_tokens - completion_tokens, 0
         )
-        if self.tokenizer.pad_token is None:
-            self.tokenizer.pad_token = self.tokenizer.eos_token
 
-        tensor_parallel = int(
-            profile.get("tensor_parallel_size", config.TENSOR_PARALLEL_SIZE)
+    def warm_prefix_cache(self):
+        """Prefill the system-prompt prefix so the first request reuses it."""
+
+        if not self.backbone.enable_prefix_caching:
+            return
+        prefix = {"prompt_token_ids": self.backbone.prompt_cache.system_ids}
+        params = SamplingParams(
+            temperature=0,
+            max_tokens=1,
+            output_kind=RequestOutputKind.FINAL_ONLY,
         )
-        gpu_utilization = float(
-            profile.get("gpu_memory_utilization", config.GPU_MEMORY_UTILIZATION)
+        request_id = str(next(self.llm.request_counter))
+        for _ in self.step_loop.stream(
+            request_id, prefix, params, lora_request=self.lora_request
+        ):
+            pass
+
+    def _request_spec(
+        self, history, user_message, sampling_params, conversation_id=None
+    ):
+        prompt = self._prepare_prompt(history, user_message, conversation_id)
+        request_id = str(next(self.llm.request_counter))
+        model_config = self.llm.llm_engine.model_config
+        tokenization_kwargs: dict[str, Any] = {}
+        _validate_truncation_size(
+            model_config.max_model_len,
+            sampling_params.truncate_prompt_tokens,
+            tokenization_kwargs,
         )
-
-        self.llm = LLM(
-            model=base_model,
-            tokenizer=tokenizer_source,
-            tensor_parallel_size=tensor_parallel,
-            trust_remote_code=True,
-            gpu_memory_utilization=gpu_utilization,
-            enable_lora=self.lora_request is not None,
+        kwargs = {
+            "lora_request": self.lora_request,
+            "tokenization_kwargs": tokenization_kwargs,
+        }
+        return request_id, prompt, sampling_params, kwargs
+
+    def _stream_spec(self, history, user_message, conversation_id=None):
+        return self._request_spec(
+            history, user_message, self.stream_sampling_params, conversation_id
         )
 
-        self.sampling_params = SamplingParams(
-            temperature=config.TEMPERATURE,
-            top_p=config.TOP_P,
-            max_tokens=config.MAX_NEW_TOKENS,
+    def _cache_key(self, prompt):
+        adapter = self.lora_request.lora_name if self.lora_request else None
+        sampling = {
+            "temperature": config.TEMPERATURE,
+            "top_p": config.TOP_P,
+            "max_tokens": config.MAX_NEW_TOKENS,
+        }
+        return fingerprint(
+            prompt["prompt_token_ids"],
+            {"variant": self.variant, "path": self.backbone.model},
+            adapter,
+            sampling,
         )
 
-    def _prepare_prompt(self, history, user_message):
-        messages = [{"role": "system", "content": config.SYSTEM_PROMPT}]
-        messages.extend([msg.dict() for msg in history])
-        messages.append({"role": "user", "content": user_message})
-        return self.tokenizer.apply_chat_template(
-            messages,
-            tokenize=False,
-            add_generation_prompt=True,
+    def _cache_writer(self, cache, key):
+        started = time.perf_counter()
+
+        def write(reply, usage, finish_reason):
+            if finish_reason not in CACHEABLE_FINISH_REASONS:
+                return
+            cache.put(
+                key,
+                {
+                    "reply": reply,
+                    "usage": usage.model_dump() if usage else None,
+                    "finish_reason": finish_reason,
+                    "generation_seconds": time.perf_counter() - started,
+                },
+            )
+
+        return write
+
+    def _cached_stream(self, spec, fallback):
+        """A replay of the cached reply for ``spec``, or None on a miss.
+
+        Entries only on disk are read when the stream is first iterated;
+        ``fallback()`` supplies the stream if the file is gone by then.
+        """
+
+        cache = _response_cache()
+        if cache is None:
+            return None
+        key = self._cache_key(spec[1])
+        entry, on_disk = cache.lookup(key)
+        if entry is not None:
+            return _ReplayChunkStream(entry, config.RESPONSE_CACHE_REPLAY_CHARS)
+        if on_disk:
+            return _DiskReplayChunkStream(cache, key, fallback)
+        return None
+
+    def _chunk_stream(self, spec, request_stream, reservation=None):
+        cache = _response_cache()
+        on_finish = None
+        if cache is not None:
+            on_finish = self._cache_writer(cache, self._cache_key(spec[1]))
+        return _ChunkStream(
+            request_stream, self, on_finish=on_finish, reservation=reservation
         )
 
-    def _generate_sync(self, history, user_message):
-        prompt = self._prepare_prompt(history, user_message)
-        outputs = self.llm.generate(
-            [prompt],
-            sampling_params=self.sampling_params,
-            lora_request=self.lora_request,
+    def _demand(self, spec):
+        """Tokens a request may occupy: its prompt plus the output budget."""
+
+        return len(spec[1]["prompt_token_ids"]) + spec[2].max_tokens
+
+    def _coalesced(self, key, start):
+        flights = _single_flight()
+        if flights is None:
+            return start()
+        return flights.join(key, start)
+
+    async def generate(
+        self,
+        history,
+        user_message,
+        conversation_id=None,
+        priority_class="interactive",
+    ):
+        if _single_flight() is not None:
+            # Share the generation with identical concurrent requests.
+            last, usage = None, None
+            stream = self.stream_generate(
+                history, user_message, conversation_id, priority_class
+            )
+            try:
+                async for chunk in stream:
+                    last = chunk
+                    usage = chunk.usage or usage
+            finally:
+                await stream.aclose()
+            return (last.text if last is not None else ""), usage
+
+        request_id, prompt, params, kwargs = self._request_spec(
+            history, user_message, self.sampling_params, conversation_id
         )
-        if not outputs or not outputs[0].outputs:
+        cache = _response_cache()
+        if cache is not None:
+            key = self._cache_key(prompt)
+            entry = await cache.get(key)
+            if entry is not None:
+                usage = UsageReport(**entry["usage"]) if entry.get("usage") else None
+                return entry["reply"], usage
+            write_cache = self._cache_writer(cache, key)
+
+        demand = self._demand((request_id, prompt, params))
+        reservation = _reserve({self.variant: demand})[self.variant]
+        first = None
+        try:
+            async for output in self.step_loop.astream(
+                request_id, prompt, params, priority_class, **kwargs
+            ):
+                first = output
+        finally:
+            if reservation is not None:
+                reservation.release()
+        if first is None or not first.outputs:
             raise RuntimeError("vLLM returned an empty response.")
+        self._record_prompt(first)
 
-        first = outputs[0]
         ## <think> 부분은 굳이 안 보여줘도 될 듯
-        text = _strip_think_tag(first.outputs[0].text.strip())
+        text = strip_think_tag(first.outputs[0].text.strip())
         prompt_tokens = len(first.prompt_token_ids or [])
         completion_tokens = len(first.outputs[0].token_ids or [])
         usage = UsageReport(
@@ -143,72 +555,139 @@ class LocalVLLMEngine:
             completion_tokens=completion_tokens,
             total_tokens=prompt_tokens + completion_tokens,
         )
+        if cache is not None:
+            write_cache(text, usage, first.outputs[0].finish_reason)
         return text, usage
 
-    def stream_generate(self, history, user_message) -> Iterator[StreamChunk]:
-        prompt = self._prepare_prompt(history, user_message)
+    def stream_generate(
+        self,
+        history,
+        user_message,
+        conversation_id=None,
+        priority_class="interactive",
+    ):
+        spec = self._stream_spec(history, user_message, conversation_id)
+        cached = self._cached_stream(
+            spec, lambda: self._start_stream(spec, priority_class)
+        )
+        if cached is not None:
+            return cached
+        return self._start_stream(spec, priority_class)
+
+    def _start_stream(self, spec, priority_class):
+        def start():
+            reservation = _reserve({self.variant: self._demand(spec)})
+            try:
+                [request_stream] = self.step_loop.open_streams(
+                    [spec], priority_class
+                )
+            except BaseException:
+                _release(reservation)
+                raise
+            return self._chunk_stream(
+                spec, request_stream, reservation[self.variant]
+            )
 
-        sampling_params = deepcopy(self.sampling_params)
-        sampling_params.output_kind = RequestOutputKind.CUMULATIVE
+        return self._coalesced(self._cache_key(spec[1]), start)
 
-        request_id = str(next(self.llm.request_counter))
-        model_config = self.llm.llm_engine.model_config
-        tokenization_kwargs: dict[str, Any] = {}
-        _validate_truncation_size(
-            model_config.max_model_len,
-            sampling_params.truncate_prompt_tokens,
-            tokenization_kwargs,
-        )
 
-        self.llm.llm_engine.add_request(
-            request_id,
-            prompt,
-            sampling_params,
-            lora_request=self.lora_request,
-            tokenization_kwargs=tokenization_kwargs,
-        )
+_ENGINES: dict[str, LocalVLLMEngine] = {}
+_SHARED_BACKBONE: _EngineBackbone | None = None
+_RESPONSE_CACHE: ResponseCache | None = None
+_SINGLE_FLIGHT: SingleFlightGroup | None = None
+_ADMISSION: AdmissionController | None = None
 
-        last_clean_text = ""
-        finished = False
-        while self.llm.llm_engine.has_unfinished_requests() and not finished:
-            step_outputs = self.llm.llm_engine.step()
-            for output in step_outputs:
-                if output.request_id != request_id or not output.outputs:
-                    continue
-
-                raw_text = output.outputs[0].text or ""
-                clean_text = _strip_think_tag(raw_text)
-                if clean_text.startswith(last_clean_text):
-                    delta = clean_text[len(last_clean_text) :]
-                else:
-                    delta = clean_text
-                last_clean_text = clean_text
-
-                usage = None
-                finished = output.finished and output.outputs[0].finished()
-                if finished:
-                    prompt_tokens = len(output.prompt_token_ids or [])
-                    completion_tokens = len(output.outputs[0].token_ids or [])
-                    usage = UsageReport(
-                        prompt_tokens=prompt_tokens,
-                        completion_tokens=completion_tokens,
-                        total_tokens=prompt_tokens + completion_tokens,
-                    )
-
-                yield StreamChunk(
-                    delta=delta,
-                    text=clean_text,
-                    finished=finished,
-                    usage=usage,
+def _admission():
+    """Per-variant load budget, or None when admission control is off."""
+
+    global _ADMISSION
+    if not config.ADMISSION_CONTROL_ENABLED:
+        return None
+    if _ADMISSION is None:
+        _ADMISSION = AdmissionController(
+            {
+                variant: (
+                    profile.get(
+                        "admission_token_budget", config.ADMISSION_TOKEN_BUDGET
+                    ),
+                    profile.get(
+                        "admission_max_requests", config.ADMISSION_MAX_REQUESTS
+                    ),
                 )
+                for variant, profile in config.MODEL_VARIANTS.items()
+            },
+            default_retry_after=config.ADMISSION_DEFAULT_RETRY_AFTER_SECONDS,
+        )
+    return _ADMISSION
+
+def _reserve(demands):
+    """Reserve ``{variant: tokens}`` atomically; raises AdmissionRejected."""
+
+    controller = _admission()
+    if controller is None:
+        return {variant: None for variant in demands}
+    reservations = controller.reserve(demands)
+    return {reservation.variant: reservation for reservation in reservations}
+
+
+def _release(reservations):
+    """Give back reservations from ``_reserve`` that no stream took over."""
+
+    for reservation in reservations.values():
+        if reservation is not None:
+            reservation.release()
+
+def admission_stats():
+    controller = _admission()
+    if controller is None:
+        return {"enabled": False}
+    return {"enabled": True, "variants": controller.stats()}
 
-    async def generate(self, history, user_message):
-        loop = asyncio.get_running_loop()
-        return await loop.run_in_executor(
-            None, self._generate_sync, history, user_message
+def _response_cache():
+    """Shared cache of finished replies, or None when generation is sampled."""
+
+    global _RESPONSE_CACHE
+    if not config.RESPONSE_CACHE_ENABLED or config.TEMPERATURE != 0:
+        return None
+    if _RESPONSE_CACHE is None:
+        _RESPONSE_CACHE = ResponseCache(
+            max_entries=config.RESPONSE_CACHE_MAX_ENTRIES,
+            disk_dir=config.RESPONSE_CACHE_DIR,
+            disk_max_bytes=config.RESPONSE_CACHE_DISK_MAX_BYTES,
+            ttl_seconds=config.RESPONSE_CACHE_TTL_SECONDS,
         )
+    return _RESPONSE_CACHE
 
-_ENGINES: dict[str, LocalVLLMEngine] = {}
+def _single_flight():
+    """Coalescing group for identical greedy requests, or None if disabled."""
+
+    global _SINGLE_FLIGHT
+    if not config.SINGLE_FLIGHT_ENABLED or config.TEMPERATURE != 0:
+        return None
+    if _SINGLE_FLIGHT is None:
+        _SINGLE_FLIGHT = SingleFlightGroup()
+    return _SINGLE_FLIGHT
+
+def single_flight_stats():
+    flights = _single_flight()
+    if flights is None:
+        return {"enabled": False}
+    return {"enabled": True, **flights.stats()}
+
+def response_cache_stats():
+    cache = _response_cache()
+    if cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **cache.stats()}
+
+
+def close_response_cache():
+    """Finish the response cache's pending disk writes (shutdown)."""
+
+    global _RESPONSE_CACHE
+    if _RESPONSE_CACHE is not None:
+        _RESPONSE_CACHE.close()
+        _RESPONSE_CACHE = None
 
 def _get_variant_profile(variant: str) -> dict:
     try:
@@ -216,28 +695,58 @@ def _get_variant_profile(variant: str) -> dict:
     except KeyError as exc:
         raise ValueError(f"Unknown model variant '{variant}'") from exc
 
-def _ensure_local_engine(variant: str):
-    engine = _ENGINES.get(variant)
-    if engine is None:
-        profile = _get_variant_profile(variant)
+def _uses_shared_backbone(profile: dict) -> bool:
+    if not config.SHARE_BASE_ENGINE:
+        return False
+    shared_base = config.SHARED_ENGINE_PROFILE.get("base_model")
+    if profile.get("base_model") != shared_base:
+        return False
+    weights_path = _maybe_resolve_local_path(profile.get("weights_path"))
+    return weights_path is None or _is_lora_adapter(weights_path)
+
+def _ensure_shared_backbone():
+    global _SHARED_BACKBONE
+    if _SHARED_BACKBONE is None:
+        profile = config.SHARED_ENGINE_PROFILE
         device_scope = profile.get("device_ids")
+        base_model = _maybe_resolve_local_path(profile.get("base_model"))
         logger.info(
-            "Bootstrapping vLLM engine for variant '%s' with base model %s (devices=%s)",
-            variant,
-            profile.get("base_model"),
+            "Bootstrapping shared vLLM engine with base model %s (devices=%s)",
+            base_model,
             device_scope or "all",
         )
-        previous_devices = os.environ.get("CUDA_VISIBLE_DEVICES")
-        try:
-            if device_scope:
-                os.environ["CUDA_VISIBLE_DEVICES"] = device_scope
-            engine = LocalVLLMEngine(variant, profile)
-        finally:
-            if device_scope:
-                if previous_devices is None:
-                    os.environ.pop("CUDA_VISIBLE_DEVICES", None)
-                else:
-                    os.environ["CUDA_VISIBLE_DEVICES"] = previous_devices
+        with _device_scope(device_scope):
+            _SHARED_BACKBONE = _EngineBackbone(
+                "shared", base_model, base_model, profile, enable_lora=True
+            )
+    return _SHARED_BACKBONE
+
+def _ensure_local_engine(variant: str):
+    engine = _ENGINES.get(variant)
+    if engine is None:
+        profile = _get_variant_profile(variant)
+        if config.ENGINE_BACKEND == "stub":
+            from .stub_engine import StubEngine
+
+            engine = StubEngine(variant, profile, config.STUB_ENGINE_PROFILE)
+        elif _VLLM_IMPORT_ERROR is not None:
+            raise RuntimeError(
+                "vLLM is not installed; set LEXAI_ENGINE=stub to run without it."
+            ) from _VLLM_IMPORT_ERROR
+        elif _uses_shared_backbone(profile):
+            engine = LocalVLLMEngine(
+                variant, profile, backbone=_ensure_shared_backbone()
+            )
+        else:
+            device_scope = profile.get("device_ids")
+            logger.info(
+                "Bootstrapping vLLM engine for variant '%s' with base model %s (devices=%s)",
+                variant,
+                profile.get("base_model"),
+                device_scope or "all",
+            )
+            with _device_scope(device_scope):
+                engine = LocalVLLMEngine(variant, profile)
 
         _ENGINES[variant] = engine
     return engine
@@ -245,22 +754,183 @@ def _ensure_local_engine(variant: str):
 def warm_up_local_engine():
     """Eagerly initialize the local vLLM engine so chat requests don't block."""
 
+    # Opening the cache scans its disk tier; do it here, off the event loop.
+    _response_cache()
     for variant_key in config.MODEL_VARIANTS.keys():
         try:
-            _ensure_local_engine(variant_key)
+            engine = _ensure_local_engine(variant_key)
+            if config.PREFIX_CACHE_WARMUP and isinstance(engine, LocalVLLMEngine):
+                engine.warm_prefix_cache()
         except Exception:  # noqa: BLE001
             logger.exception("Failed to warm up variant: %s", variant_key)
 
 
-async def generate_reply(history, user_message, model_variant):
-    """Generate a reply via the locally hosted vLLM."""
+def abort_stats():
+    """Per-variant aborts; tokens_saved is the unused max_tokens budget."""
+
+    return {variant: dict(engine.abort_stats) for variant, engine in _ENGINES.items()}
+
+
+def prefix_cache_stats():
+    stats = {}
+    for variant, engine in _ENGINES.items():
+        if not isinstance(engine, LocalVLLMEngine):
+            continue
+        entry = dict(engine.prefix_stats)
+        entry["prompt_cache"] = engine.backbone.prompt_cache.stats()
+        prompt_tokens = entry["prompt_tokens"]
+        entry["enabled"] = engine.backbone.enable_prefix_caching
+        entry["hit_rate"] = (
+            entry["cached_tokens"] / prompt_tokens if prompt_tokens else 0.0
+        )
+        stats[variant] = entry
+    return stats
+
+
+def scheduler_stats():
+    """Queue depth and per-class queue wait, per engine instance."""
+
+    backbones = {
+        engine.backbone.name: engine.backbone
+        for engine in _ENGINES.values()
+        if isinstance(engine, LocalVLLMEngine)
+    }
+    return {
+        name: backbone.step_loop.scheduler_stats()
+        for name, backbone in backbones.items()
+    }
+
+
+async def generate_reply(
+    history,
+    user_message,
+    model_variant,
+    conversation_id=None,
+    deadline=None,
+    priority_class="interactive",
+):
+    """Generate a reply via the locally hosted vLLM.
+
+    ``deadline`` is an event-loop time after which generation is aborted and
+    ``DeadlineExceeded`` raised.
+    """
 
     engine = _ensure_local_engine(model_variant)
-    return await engine.generate(history, user_message), engine.display_name
+    generation = engine.generate(
+        history, user_message, conversation_id, priority_class
+    )
+    if deadline is None:
+        reply = await generation
+    else:
+        remaining = deadline - asyncio.get_running_loop().time()
+        try:
+            reply = await asyncio.wait_for(generation, max(remaining, 0))
+        except asyncio.TimeoutError:
+            raise DeadlineExceeded("응답 시간 제한을 초과했습니다.") from None
+    return reply, engine.display_name
 
 
-def stream_reply_chunks(history, user_message, model_variant):
-    """Return display name and streaming iterator."""
+def _with_deadline(stream, deadline):
+    if deadline is None:
+        return stream
+    return DeadlineChunkStream(stream, deadline)
+
+
+def stream_reply_chunks(
+    history, user_message, model_variant, conversation_id=None, deadline=None
+):
+    """Return display name and async streaming iterator.
+
+    Raises ``AdmissionRejected`` when the variant is over its load budget.
+    """
 
     engine = _ensure_local_engine(model_variant)
-    return engine.display_name, engine.stream_generate(history, user_message)
+    stream = engine.stream_generate(history, user_message, conversation_id)
+    return engine.display_name, _with_deadline(stream, deadline)
+
+
+def stream_reply_group(
+    history, user_message, variants, conversation_id=None, deadline=None
+):
+    """Start one stream per variant, batching variants that share an engine.
+
+    Capacity for every variant that needs a new generation is reserved
+    atomically, so either all streams start or ``AdmissionRejected`` is
+    raised. Returns ``(variant, display name, iterator)`` tuples in input
+    order.
+    """
+
+    engines = [(variant, _ensure_local_engine(variant)) for variant in variants]
+    if not all(isinstance(engine, LocalVLLMEngine) for _, engine in engines):
+        return [
+            (
+                variant,
+                engine.display_name,
+                _with_deadline(
+                    engine.stream_generate(
+                        history, user_message, conversation_id, "compare"
+                    ),
+                    deadline,
+                ),
+            )
+            for variant, engine in engines
+        ]
+
+    flights = _single_flight()
+    streams = {}
+    followers = {}
+    specs_by_loop: dict[EngineStepLoop, list] = {}
+    for variant, engine in engines:
+        spec = engine._stream_spec(history, user_message, conversation_id)
+        cached = engine._cached_stream(
+            spec,
+            lambda engine=engine, spec=spec: engine._start_stream(spec, "compare"),
+        )
+        if cached is not None:
+            streams[variant] = cached
+            continue
+        key = engine._cache_key(spec[1])
+        if flights is not None and flights.active(key):
+            followers[variant] = key
+            continue
+        specs_by_loop.setdefault(engine.step_loop, []).append(
+            (variant, engine, spec, key)
+        )
+
+    reservations = _reserve(
+        {
+            variant: engine._demand(spec)
+            for entries in specs_by_loop.values()
+            for variant, engine, spec, _ in entries
+        }
+    )
+    opened = []
+    try:
+        for step_loop, entries in specs_by_loop.items():
+            opened.extend(
+                zip(
+                    entries,
+                    step_loop.open_streams(
+                        [entry[2] for entry in entries], "compare"
+                    ),
+                )
+            )
+    except BaseException:
+        for _, request_stream in opened:
+            request_stream.abort()
+        _release(reservations)
+        raise
+    for (variant, engine, spec, key), request_stream in opened:
+        stream = engine._chunk_stream(spec, request_stream, reservations[variant])
+        streams[variant] = engine._coalesced(key, lambda stream=stream: stream)
+    # Join running flights only once every new stream is open, so a
+    # rejection or a failed submit leaves no subscription behind to keep
+    # those flights alive. Nothing awaits in between, so the flights are
+    # still running.
+    for variant, key in followers.items():
+        streams[variant] = flights.join(key, None)
+
+    return [
+        (variant, engine.display_name, _with_deadline(streams[variant], deadline))
+        for variant, engine in engines
+    ]
@@ -0,0 +1,211 @@
+import asyncio
+import copy
+import json
+import zlib
+from functools import partial
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+from .services.text_log import TextLog
+
+SSE_DONE = "data: [DONE]\n\n"
+
+
+if orjson is not None:
+
+    def dumps(data):
+        return orjson.dumps(data).decode("utf-8")
+
+else:
+
+    def dumps(data):
+        return json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+
+
+def sse_event(data):
+    return f"data: {dumps(data)}\n\n"
+
+
+class CompactDeltaEncoder:
+    """Protocol v2 delta frames: only the new text, never the cumulative one.
+
+    Each frame carries ``delta`` (answer text) and, when present,
+    ``reasoning`` (think text); ``thinking`` is only sent when it changes.
+    Once at least ``marker_chars`` of answer text have gone out since the
+    last marker, and on the finished frame, the frame also carries
+    ``offset`` (answer length in characters so far) and ``checksum`` (CRC32
+    of the UTF-8 answer so far, hex) so clients can check their
+    reassembled text. ``usage`` and ``finish_reason`` only appear on the
+    finished frame.
+    """
+
+    def __init__(self, marker_chars, **constant):
+        self._envelope = {"type": "delta", **constant}
+        self._marker_chars = marker_chars
+        self._thinking = None
+        self._offset = 0
+        self._crc = 0
+        self._since_marker = 0
+
+    def encode(self, chunk, usage=None):
+        fields = {"delta": chunk.delta}
+        if chunk.reasoning_delta:
+            fields["reasoning"] = chunk.reasoning_delta
+        if chunk.thinking != self._thinking:
+            self._thinking = fields["thinking"] = chunk.thinking
+        if chunk.delta:
+            self._offset += len(chunk.delta)
+            self._crc = zlib.crc32(chunk.delta.encode("utf-8"), self._crc)
+            self._since_marker += len(chunk.delta)
+        if chunk.finished or self._since_marker >= self._marker_chars:
+            fields["offset"] = self._offset
+            fields["checksum"] = f"{self._crc:08x}"
+            self._since_marker = 0
+        if chunk.finished:
+            fields["finished"] = True
+            fields["usage"] = usage
+            fields["finish_reason"] = chunk.finish_reason
+        return sse_event({**self._envelope, **fields})
+
+
+def _cumulative_event(fields, text, think_text):
+    event = {**fields, "text": text()}
+    if think_text is not None:
+        event["think_text"] = think_text()
+    return sse_event(event)
+
+
+class CumulativeEncoder:
+    """Protocol v1 delta frames, which repeat the cumulative text.
+
+    ``encode`` returns a callable that renders the frame. The cumulative
+    ``text``/``think_text`` are rebuilt from the deltas into a ``TextLog``
+    and read through snapshots, so frames kept for replay share one copy
+    of the reply instead of each holding its own. ``fields`` are added to
+    every frame as given; a ``think_text`` there is only the fallback for
+    frames without think text.
+    """
+
+    def __init__(self, **constant):
+        self._envelope = {"type": "delta", **constant}
+        self._text = TextLog()
+        self._think_text = TextLog()
+
+    def encode(self, chunk, usage=None, **fields):
+        self._text.append(chunk.delta)
+        self._think_text.append(chunk.reasoning_delta)
+        think_text = None
+        if chunk.thinking and self._think_text.length:
+            think_text = self._think_text.snapshot()
+        return partial(
+            _cumulative_event,
+            {
+                **self._envelope,
+                "delta": chunk.delta,
+                "finished": chunk.finished,
+                "usage": usage,
+                "thinking": chunk.thinking,
+                **fields,
+            },
+            self._text.snapshot(),
+            think_text,
+        )
+
+
+async def coalesce_chunks(stream, interval, max_chars):
+    """Merge ``StreamChunk``s from ``stream`` into fewer, larger chunks.
+
+    The first chunk with any text is passed through at once so time to
+    first token is unaffected. After that, chunks are merged until
+    ``interval`` seconds have passed since the first buffered one or
+    ``max_chars`` characters are buffered. The finished chunk always
+    flushes. Merged chunks keep the concatenated ``delta`` and
+    ``reasoning_delta`` and every other field of the newest chunk.
+    """
+
+    loop = asyncio.get_running_loop()
+    pending = None
+    flush_at = 0.0
+    started = False
+    next_chunk = None
+    try:
+        while True:
+            if next_chunk is None:
+                next_chunk = asyncio.ensure_future(stream.__anext__())
+            timeout = None if pending is None else max(flush_at - loop.time(), 0)
+            done, _ = await asyncio.wait({next_chunk}, timeout=timeout)
+            if not done:
+                yield pending
+                pending = None
+                continue
+            task, next_chunk = next_chunk, None
+            try:
+                chunk = task.result()
+            except StopAsyncIteration:
+                break
+
+            if pending is None:
+                pending = chunk
+                flush_at = loop.time() + interval
+            else:
+                # A shallow copy rather than ``replace`` so the newest chunk's
+                # lazy ``text``/``think_text`` are carried over unread.
+                merged = copy.copy(chunk)
+                merged.delta = pending.delta + chunk.delta
+                merged.reasoning_delta = pending.reasoning_delta + chunk.reasoning_delta
+                pending = merged
+            size = len(pending.delta) + len(pending.reasoning_delta)
+            if not started and size:
+                started = True
+            elif not (chunk.finished or size >= max_chars):
+                continue
+            yield pending
+            pending = None
+        if pending is not None:
+            yield pending
+    finally:
+        if next_chunk is not None:
+            next_chunk.cancel()
+
+
+async def merge_streams(streams):
+    """Interleave the async iterators in ``streams`` (``{key: iterator}``).
+
+    Yields ``(key, item, None)`` as soon as any iterator produces an item,
+    ``(key, None, None)`` when an iterator is exhausted and
+    ``(key, None, exc)`` when it raises; a failed iterator is dropped while
+    the others keep going. Each iterator is only advanced after its previous
+    item has been consumed. Closing the iterators is left to the caller.
+    """
+
+    pending = {}
+
+    def advance(key):
+        pending[asyncio.ensure_future(streams[key].__anext__())] = key
+
+    for key in streams:
+        advance(key)
+    try:
+        while pending:
+            done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                key = pending.pop(task)
+                try:
+                    item = task.result()
+                except StopAsyncIteration:
+                    yield key, None, None
+                    continue
+                except Exception as exc:  # noqa: BLE001
+                    yield key, None, exc
+                    continue
+                yield key, item, None
+                advance(key)
+    finally:
+        for task in pending:
+            if not task.done():
+                task.cancel()
+            elif not task.cancelled():
+                task.exception()  # Consumed here so it is not logged as lost.
@@ -0,0 +1,175 @@
+"""Conversation persistence.
+
+The module-level functions delegate to one process-wide store picked by
+``config.STORAGE_BACKEND``: ``"json"`` (one file per conversation) or
+``"sqlite"`` (a WAL-mode database with an indexed conversation list).
+Both store a conversation's turns append-only: ``save_conversation`` adds
+the new user/assistant messages (``history`` only seeds a new conversation)
+and returns the conversation's metadata, not its messages.
+
+``save_conversation_later`` (a coroutine) hands the turn to a background
+writer (``config.PERSIST_WRITE_BEHIND``) and returns the id and title right
+away. The other functions block: reads flush the writer first, so they
+always see every queued turn, and async callers run them in an executor.
+"""
+
+import asyncio
+import atexit
+import functools
+import queue
+import threading
+import uuid
+
+from .. import config
+from .json_store import JsonConversationStore
+from .records import conversation_title, reply_text
+from .sqlite_store import SqliteConversationStore
+from .write_behind import WriteBehindQueue
+
+STORAGE_BACKENDS = ("json", "sqlite")
+
+_STORE = None
+_WRITER = None
+# Writers are opened from executor threads; only one may be created.
+_WRITER_LOCK = threading.Lock()
+
+
+def open_store(backend=None, path=None):
+    """A new store for ``backend`` at ``path`` (defaults come from config)."""
+
+    backend = backend or config.STORAGE_BACKEND
+    if backend == "json":
+        return JsonConversationStore(path or config.CHAT_LOG_DIR)
+    if backend == "sqlite":
+        return SqliteConversationStore(path or config.SQLITE_DB_PATH)
+    raise ValueError(
+        f"Unknown storage backend {backend!r}; expected one of "
+        f"{', '.join(STORAGE_BACKENDS)}"
+    )
+
+
+def _store():
+    global _STORE
+    if _STORE is None:
+        _STORE = open_store()
+    return _STORE
+
+
+def use_store(store):
+    """Make ``store`` the process-wide store (benchmarks, tools).
+
+    ``None`` reopens the store from config on next use.
+    """
+
+    global _STORE
+    close()
+    _STORE = store
+
+
+def _writer():
+    global _WRITER
+    with _WRITER_LOCK:
+        if _WRITER is None:
+            _WRITER = WriteBehindQueue(
+                _store(),
+                max_pending=config.PERSIST_QUEUE_MAX,
+                max_batch=config.PERSIST_BATCH_MAX,
+            )
+        return _WRITER
+
+
+def flush():
+    """Wait until every queued turn has been written."""
+
+    if _WRITER is not None:
+        _WRITER.flush()
+
+
+def close():
+    """Flush queued turns and stop the writer; it restarts on next use."""
+
+    global _WRITER
+    if _WRITER is not None:
+        _WRITER.close()
+        _WRITER = None
+
+
+atexit.register(close)
+
+
+def persistence_stats():
+    if _WRITER is None:
+        return {"write_behind": config.PERSIST_WRITE_BEHIND, "started": False}
+    return {"write_behind": True, "started": True, **_WRITER.stats()}
+
+
+def list_conversations(limit=None, before=None, title_prefix=None):
+    flush()
+    return _store().list_conversations(limit, before, title_prefix)
+
+
+def count_conversations(title_prefix=None):
+    flush()
+    return _store().count_conversations(title_prefix)
+
+
+def load_conversation(conversation_id):
+    flush()
+    return _store().load_conversation(conversation_id)
+
+
+def save_conversation(conversation_id, user_message, assistant_message, history):
+    flush()
+    return _store().save_conversation(
+        conversation_id, user_message, assistant_message, history
+    )
+
+
+async def save_conversation_later(
+    conversation_id, user_message, assistant_message, history
+):
+    """Queue one turn for the background writer.
+
+    Returns ``{"id", "title"}`` without waiting for the write: new
+    conversations get their id here, and the title is the known one or,
+    for a new conversation, the one the store will derive. Safe to await on
+    the event loop: looking up a title the writer has not cached and waiting
+    for the writer (opening it, or a full queue) happen in the default
+    executor.
+    """
+
+    loop = asyncio.get_running_loop()
+    if not config.PERSIST_WRITE_BEHIND:
+        return await loop.run_in_executor(
+            None,
+            save_conversation,
+            conversation_id,
+            user_message,
+            assistant_message,
+            history,
+        )
+    writer = _WRITER or await loop.run_in_executor(None, _writer)
+    title = None
+    if conversation_id:
+        title = writer.title(conversation_id) or await loop.run_in_executor(
+            None, writer.lookup_title, conversation_id
+        )
+    conversation_id = conversation_id or uuid.uuid4().hex
+    if title is None:
+        title = conversation_title(reply_text(assistant_message), user_message)
+    turn = (conversation_id, user_message, assistant_message, history)
+    try:
+        writer.submit(*turn, title=title, block=False)
+    except queue.Full:
+        await loop.run_in_executor(
+            None, functools.partial(writer.submit, *turn, title=title)
+        )
+    return {"id": conversation_id, "title": title}
+
+
+def update_conversation_title(conversation_id, title):
+    flush()
+    record = _store().update_conversation_title(conversation_id, title)
+    if record is not None and _WRITER is not None:
+        _WRITER.remember(record)
+    return record
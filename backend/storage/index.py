@@ -0,0 +1,91 @@
+import bisect
+
+
+class ConversationIndex:
+    """Conversation metadata kept sorted by ``updated_at``.
+
+    Entries are ``{"id", "title", "updated_at", "created_at"}`` dicts. Keys
+    ``(updated_at, id)`` are held in an ascending list, so the newest ``k``
+    entries are its last ``k`` items and an upsert is a bisect plus one
+    list insertion. A second sorted list of ``(lowercased title, id)``
+    answers title-prefix queries with two bisects.
+    """
+
+    def __init__(self):
+        self._entries: dict[str, dict] = {}
+        self._keys: list[tuple[str, str]] = []
+        self._titles: list[tuple[str, str]] = []
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, conversation_id):
+        return conversation_id in self._entries
+
+    @staticmethod
+    def _key(entry):
+        return (entry.get("updated_at") or "", entry["id"])
+
+    @staticmethod
+    def _title_key(entry):
+        return ((entry.get("title") or "").lower(), entry["id"])
+
+    def upsert(self, entry):
+        self.remove(entry["id"])
+        self._entries[entry["id"]] = entry
+        bisect.insort(self._keys, self._key(entry))
+        bisect.insort(self._titles, self._title_key(entry))
+
+    def remove(self, conversation_id):
+        entry = self._entries.pop(conversation_id, None)
+        if entry is None:
+            return
+        del self._keys[bisect.bisect_left(self._keys, self._key(entry))]
+        del self._titles[bisect.bisect_left(self._titles, self._title_key(entry))]
+
+    def _title_range(self, prefix):
+        prefix = prefix.lower()
+        low = bisect.bisect_left(self._titles, (prefix,))
+        high = bisect.bisect_left(self._titles, (prefix + "\U0010ffff",))
+        return low, high
+
+    def count(self, title_prefix=None):
+        if not title_prefix:
+            return len(self._entries)
+        low, high = self._title_range(title_prefix)
+        return high - low
+
+    def newest(self, limit=None, before=None, title_prefix=None):
+        """Entries newest first; only the first ``limit`` are looked at.
+
+        ``before`` is an ``(updated_at, id)`` key: only entries older than
+        it are returned. ``title_prefix`` keeps titles starting with it
+        (case-insensitive).
+        """
+
+        keys = self._keys
+        if title_prefix:
+            low, high = self._title_range(title_prefix)
+            if limit is not None and (high - low) * 8 > len(keys):
+                # Common prefix: walking the newest keys finds a page sooner
+                # than sorting every match.
+                return self._scan(limit, before, title_prefix.lower())
+            keys = sorted(
+                self._key(self._entries[id_]) for _, id_ in self._titles[low:high]
+            )
+        end = len(keys) if before is None else bisect.bisect_left(keys, tuple(before))
+        start = 0 if limit is None else max(end - limit, 0)
+        return [dict(self._entries[key[1]]) for key in reversed(keys[start:end])]
+
+    def _scan(self, limit, before, prefix):
+        end = len(self._keys)
+        if before is not None:
+            end = bisect.bisect_left(self._keys, tuple(before))
+        page = []
+        for index in range(end - 1, -1, -1):
+            entry = self._entries[self._keys[index][1]]
+            if (entry.get("title") or "").lower().startswith(prefix):
+                page.append(dict(entry))
+                if len(page) == limit:
+                    break
+        return page
@@ -0,0 +1,370 @@
+import json
+import os
+import tempfile
+import threading
+import uuid
+from pathlib import Path
+
+from .index import ConversationIndex
+from .records import conversation_title, now_iso, reply_text, turn_messages
+
+# Each conversation is a JSONL log: a small header line (id, title,
+# timestamps) followed by one line per saved turn.
+_HEADER = "header"
+_TURN = "turn"
+
+
+def _line(record):
+    return json.dumps(record, ensure_ascii=False) + "\n"
+
+
+def _metadata(record):
+    return {
+        key: record.get(key) for key in ("id", "title", "updated_at", "created_at")
+    }
+
+
+class JsonConversationStore:
+    """One append-only JSONL log per conversation in ``log_dir``.
+
+    Saving a turn appends a single line, so its cost does not grow with the
+    conversation. Listing reads only the header and last line of each log.
+    Loading folds the log into a record. Once an append takes a log past
+    ``compact_records`` turn lines (counted for logs this store has loaded
+    or written), the writer rewrites it as a header plus one turn line, so
+    reads never write. Whole-file writes (new conversations, compaction, renames) go
+    through a temp file and ``os.replace``; a torn last line left by a crash
+    mid-append is ignored when reading. Pretty-printed ``{id}.json`` files
+    from older versions are still read and become logs on their next write.
+
+    Listing is served from a ``ConversationIndex`` built on first use and
+    updated by every write made through this store. Changes made by anyone
+    else are picked up when the directory's mtime moves: only files whose
+    size or mtime changed are read again.
+    """
+
+    def __init__(self, log_dir, compact_records=64):
+        self.log_dir = Path(log_dir)
+        self.log_dir.mkdir(parents=True, exist_ok=True)
+        self.compact_records = compact_records
+        self._lock = threading.Lock()
+        self._index: ConversationIndex | None = None
+        # Conversation id -> turn lines in its log, where known.
+        self._turn_lines: dict[str, int] = {}
+        # File name -> ((mtime_ns, size), conversation id) as last indexed.
+        self._files: dict[str, tuple[tuple[int, int], str]] = {}
+        self._dir_mtime = None
+
+    def _log_path(self, conversation_id):
+        return self.log_dir / f"{conversation_id}.jsonl"
+
+    def _legacy_path(self, conversation_id):
+        return self.log_dir / f"{conversation_id}.json"
+
+    def _replace(self, path, lines):
+        fd, tmp_name = tempfile.mkstemp(
+            dir=self.log_dir, prefix=f".{path.stem}.", suffix=".tmp"
+        )
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.writelines(lines)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_name, path)
+        except BaseException:
+            Path(tmp_name).unlink(missing_ok=True)
+            raise
+
+    def _write_snapshot(self, record):
+        header = {"type": _HEADER, **_metadata(record)}
+        turn = {
+            "type": _TURN,
+            "at": record["updated_at"],
+            "messages": record["messages"],
+        }
+        dir_mtime = self._dir_stat()
+        self._replace(self._log_path(record["id"]), [_line(header), _line(turn)])
+        self._legacy_path(record["id"]).unlink(missing_ok=True)
+        self._turn_lines[record["id"]] = 1
+        self._index_written(_metadata(record), dir_mtime)
+
+    def _dir_stat(self):
+        return os.stat(self.log_dir).st_mtime_ns
+
+    @staticmethod
+    def _signature(stat):
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def _index_written(self, metadata, dir_mtime):
+        """Write-through for a conversation this store just wrote.
+
+        ``dir_mtime`` is the directory's mtime from before the write; if
+        nothing else had changed the directory by then, the new mtime is
+        recorded so our own write does not trigger a rescan.
+        """
+
+        if self._index is None:
+            return
+        self._index.upsert(metadata)
+        path = self._log_path(metadata["id"])
+        self._files.pop(self._legacy_path(metadata["id"]).name, None)
+        self._files[path.name] = (self._signature(path.stat()), metadata["id"])
+        if dir_mtime == self._dir_mtime:
+            self._dir_mtime = self._dir_stat()
+
+    def _file_metadata(self, path):
+        if path.suffix == ".jsonl":
+            return self._summary(path)
+        with path.open("r", encoding="utf-8") as f:
+            return _metadata(json.load(f))
+
+    def _sync_index(self):
+        """Build the index, or catch up with changes made outside this store."""
+
+        dir_mtime = self._dir_stat()
+        if self._index is not None and dir_mtime == self._dir_mtime:
+            return
+        if self._index is None:
+            self._index, self._files = ConversationIndex(), {}
+
+        names = set(os.listdir(self.log_dir))
+        current = {}
+        changed = []
+        for name in names:
+            if name.startswith("."):
+                continue  # Temp files of in-progress rewrites.
+            if not name.endswith(".jsonl"):
+                if not name.endswith(".json") or f"{name}l" in names:
+                    continue
+            try:
+                signature = self._signature(os.stat(self.log_dir / name))
+            except FileNotFoundError:
+                continue
+            known = self._files.get(name)
+            if known is not None and known[0] == signature:
+                current[name] = known
+            else:
+                changed.append((name, signature))
+
+        for name, (_, conversation_id) in self._files.items():
+            if name not in current:
+                self._index.remove(conversation_id)
+        for name, signature in changed:
+            try:
+                metadata = self._file_metadata(self.log_dir / name)
+            except (json.JSONDecodeError, OSError, UnicodeDecodeError):
+                continue
+            if not metadata.get("id"):
+                continue
+            self._index.upsert(metadata)
+            current[name] = (signature, metadata["id"])
+        self._files = current
+        self._dir_mtime = dir_mtime
+
+    @staticmethod
+    def _read_log(path):
+        entries = []
+        with path.open("r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entries.append(json.loads(line))
+                except json.JSONDecodeError:
+                    # A line torn by a crash mid-append; later turns follow it.
+                    continue
+        return entries
+
+    @staticmethod
+    def _fold(entries):
+        record = {key: entries[0].get(key) for key in ("id", "title", "created_at")}
+        record["updated_at"] = entries[0].get("updated_at")
+        record["messages"] = []
+        for entry in entries[1:]:
+            record["messages"].extend(entry["messages"])
+            record["updated_at"] = entry["at"]
+        return record
+
+    @staticmethod
+    def _last_line(f):
+        pos = f.seek(0, os.SEEK_END)
+        tail = b""
+        while pos > 0:
+            step = min(8192, pos)
+            pos -= step
+            f.seek(pos)
+            tail = f.read(step) + tail
+            newline = tail.rfind(b"\n", 0, len(tail) - 1)
+            if newline != -1:
+                return tail[newline + 1 :]
+        return tail
+
+    def _summary(self, path):
+        """Metadata of one log from its header and last line."""
+
+        with path.open("rb") as f:
+            summary = _metadata(json.loads(f.readline()))
+            if f.tell() == f.seek(0, os.SEEK_END):
+                return summary
+            last = self._last_line(f)
+        if not last.endswith(b"\n"):
+            # Torn tail: fall back to reading the whole log.
+            return _metadata(self._fold(self._read_log(path)))
+        # Only the leading {"type": "turn", "at": ...} part is needed; logs
+        # written some other way are parsed in full.
+        cut = last.find(b', "messages"')
+        try:
+            summary["updated_at"] = json.loads(last[:cut] + b"}")["at"]
+        except (json.JSONDecodeError, KeyError):
+            summary["updated_at"] = json.loads(last)["at"]
+        return summary
+
+    def list_conversations(self, limit=None, before=None, title_prefix=None):
+        """Metadata of the newest ``limit`` conversations (all if None).
+
+        ``before`` is an ``(updated_at, id)`` cursor; ``title_prefix``
+        filters titles case-insensitively.
+        """
+
+        with self._lock:
+            self._sync_index()
+            return self._index.newest(limit, before, title_prefix)
+
+    def count_conversations(self, title_prefix=None):
+        with self._lock:
+            self._sync_index()
+            return self._index.count(title_prefix)
+
+    def _load(self, conversation_id):
+        path = self._log_path(conversation_id)
+        if path.exists():
+            records = self._read_log(path)
+            if not records:
+                return None
+            self._turn_lines[conversation_id] = len(records) - 1
+            return self._fold(records)
+        legacy = self._legacy_path(conversation_id)
+        if not legacy.exists():
+            return None
+        with legacy.open("r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def load_title(self, conversation_id):
+        """The title from the log's header line, without reading the turns."""
+
+        with self._lock:
+            path = self._log_path(conversation_id)
+            if not path.exists():
+                path = self._legacy_path(conversation_id)
+                if not path.exists():
+                    return None
+                with path.open("r", encoding="utf-8") as f:
+                    return json.load(f).get("title")
+            with path.open("rb") as f:
+                return json.loads(f.readline()).get("title")
+
+    def load_conversation(self, conversation_id):
+        with self._lock:
+            return self._load(conversation_id)
+
+    def _save_turns(self, conversation_id, turns, sync):
+        """Append ``(user_message, assistant_message, history)`` turns.
+
+        The log is opened once for all of them and, with ``sync``, fsynced
+        once. ``history`` only seeds a new conversation.
+        """
+
+        now = now_iso()
+        path = self._log_path(conversation_id)
+        if not path.exists():
+            # New conversation, or a legacy .json file becoming a log.
+            user_message, assistant_message, history = turns[0]
+            title_text = reply_text(assistant_message)
+            record = self._load(conversation_id) or {
+                "id": conversation_id,
+                "title": conversation_title(title_text, user_message),
+                "created_at": now,
+                "messages": history,
+            }
+            if not record.get("title"):
+                record["title"] = conversation_title(title_text, user_message)
+            record["messages"] = record.get("messages", history) + turn_messages(
+                user_message, assistant_message
+            )
+            record["updated_at"] = now
+            self._write_snapshot(record)
+            turns = turns[1:]
+            if not turns:
+                return _metadata(record)
+
+        data = "".join(
+            _line(
+                {
+                    "type": _TURN,
+                    "at": now,
+                    "messages": turn_messages(user_message, assistant_message),
+                }
+            )
+            for user_message, assistant_message, _ in turns
+        )
+        with path.open("rb+") as f:
+            header = json.loads(f.readline())
+            end = f.seek(0, os.SEEK_END)
+            f.seek(end - 1)
+            if f.read(1) != b"\n":
+                # Close off a torn line so these turns start fresh.
+                data = "\n" + data
+            f.write(data.encode("utf-8"))
+            if sync:
+                f.flush()
+                os.fsync(f.fileno())
+        metadata = {**_metadata(header), "updated_at": now}
+        self._index_written(metadata, None)
+        lines = self._turn_lines.get(conversation_id)
+        if lines is not None:
+            self._turn_lines[conversation_id] = lines + len(turns)
+            if lines + len(turns) > self.compact_records:
+                self._write_snapshot(self._load(conversation_id))
+        return metadata
+
+    def save_conversation(
+        self, conversation_id, user_message, assistant_message, history
+    ):
+        """Append one turn; ``history`` only seeds a new conversation.
+
+        Returns the conversation's metadata (no messages).
+        """
+
+        with self._lock:
+            return self._save_turns(
+                conversation_id or uuid.uuid4().hex,
+                [(user_message, assistant_message, history)],
+                sync=False,
+            )
+
+    def save_turns(self, turns):
+        """Durably save a batch of turns, in order.
+
+        Each turn is ``(conversation_id, user_message, assistant_message,
+        history)``. Turns for the same conversation are written with one
+        append and one fsync per log.
+        """
+
+        grouped: dict[str, list] = {}
+        for conversation_id, *turn in turns:
+            grouped.setdefault(conversation_id, []).append(turn)
+        with self._lock:
+            for conversation_id, group in grouped.items():
+                self._save_turns(conversation_id, group, sync=True)
+
+    def update_conversation_title(self, conversation_id, title):
+        """Rename; rewrites the log, which renames are rare enough to afford."""
+
+        if not title:
+            raise ValueError("title must not be empty")
+        with self._lock:
+            record = self._load(conversation_id)
+            if record is None:
+                return None
+            record["title"] = title
+            record["updated_at"] = now_iso()
+            self._write_snapshot(record)
+        return _metadata(record)
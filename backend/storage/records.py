@@ -0,0 +1,46 @@
+from datetime import datetime, timezone
+
+
+def now_iso():
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _first_word(text):
+    if not text:
+        return ""
+    snippet = text.strip().split()[0]
+    return snippet[:40]
+
+
+def conversation_title(assistant_message, user_message=None):
+    for source in (assistant_message, user_message):
+        if not source:
+            continue
+        snippet = _first_word(source)
+        if snippet:
+            return snippet
+    return "New chat"
+
+
+def turn_messages(user_message, assistant_message):
+    """The user message plus one assistant message per reply.
+
+    ``assistant_message`` is either the reply text or, for compare mode, a
+    list of per-variant dicts (``content``, ``variant``, ``model``, ...).
+    """
+
+    if isinstance(assistant_message, str):
+        replies = [{"role": "assistant", "content": assistant_message}]
+    else:
+        replies = [{"role": "assistant", **reply} for reply in assistant_message]
+    return [{"role": "user", "content": user_message}, *replies]
+
+
+def reply_text(assistant_message):
+    """The text used for titles: the reply, or the first non-empty variant."""
+
+    if isinstance(assistant_message, str):
+        return assistant_message
+    return next(
+        (reply["content"] for reply in assistant_message if reply["content"]), ""
+    )
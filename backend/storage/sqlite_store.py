@@ -0,0 +1,319 @@
+import json
+import sqlite3
+import threading
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+
+from .records import conversation_title, now_iso, reply_text, turn_messages
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS conversations (
+    id TEXT PRIMARY KEY,
+    title TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL,
+    -- title.lower() from Python, which folds more than ASCII (NOCASE).
+    title_key TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS conversations_updated_at
+    ON conversations (updated_at DESC, id DESC);
+CREATE TABLE IF NOT EXISTS messages (
+    conversation_id TEXT NOT NULL
+        REFERENCES conversations (id) ON DELETE CASCADE,
+    seq INTEGER NOT NULL,
+    role TEXT NOT NULL,
+    content TEXT NOT NULL,
+    extra TEXT,
+    PRIMARY KEY (conversation_id, seq)
+) WITHOUT ROWID;
+"""
+
+# Created after _migrate, which adds title_key to older databases.
+_TITLE_INDEX = """
+DROP INDEX IF EXISTS conversations_title;
+CREATE INDEX IF NOT EXISTS conversations_title_key
+    ON conversations (title_key);
+"""
+
+
+def _message_row(conversation_id, seq, message):
+    # Anything beyond role/content (compare variant, model, usage, ...) is
+    # kept as a JSON object so records round-trip unchanged.
+    extra = {
+        key: value
+        for key, value in message.items()
+        if key not in ("role", "content")
+    }
+    return (
+        conversation_id,
+        seq,
+        message["role"],
+        message["content"],
+        json.dumps(extra, ensure_ascii=False) if extra else None,
+    )
+
+
+def _message(row):
+    role, content, extra = row
+    message = {"role": role, "content": content}
+    if extra:
+        message.update(json.loads(extra))
+    return message
+
+
+class SqliteConversationStore:
+    """Conversations in one SQLite database in WAL mode.
+
+    Listing reads only the ``conversations`` table through its
+    ``updated_at`` index; messages live in their own table keyed by
+    ``(conversation_id, seq)``. One connection is shared behind a lock.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(
+            self.path, check_same_thread=False, isolation_level=None
+        )
+        self._db.execute("PRAGMA journal_mode=WAL")
+        # FULL so every committed batch is on disk; NORMAL skips the WAL
+        # fsync on commit.
+        self._db.execute("PRAGMA synchronous=FULL")
+        self._db.execute("PRAGMA foreign_keys=ON")
+        self._db.executescript(_SCHEMA)
+        self._migrate()
+        self._db.executescript(_TITLE_INDEX)
+
+    def _migrate(self):
+        columns = {
+            row[1] for row in self._db.execute("PRAGMA table_info(conversations)")
+        }
+        if "title_key" in columns:
+            return
+        with self._transaction():
+            self._db.execute(
+                "ALTER TABLE conversations "
+                "ADD COLUMN title_key TEXT NOT NULL DEFAULT ''"
+            )
+            self._db.executemany(
+                "UPDATE conversations SET title_key = ? WHERE id = ?",
+                [
+                    (title.lower(), id_)
+                    for id_, title in self._db.execute(
+                        "SELECT id, title FROM conversations"
+                    ).fetchall()
+                ],
+            )
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    @staticmethod
+    def _where(before, title_prefix):
+        clauses, params = [], []
+        if before is not None:
+            clauses.append("(updated_at, id) < (?, ?)")
+            params.extend(before)
+        if title_prefix:
+            # A range over the title_key index rather than LIKE, folded the
+            # same way as ConversationIndex so both backends match.
+            prefix = title_prefix.lower()
+            clauses.append("title_key >= ? AND title_key < ?")
+            params.extend((prefix, prefix + "\U0010ffff"))
+        where = f"WHERE {' AND '.join(clauses)} " if clauses else ""
+        return where, params
+
+    def list_conversations(self, limit=None, before=None, title_prefix=None):
+        """Metadata of the newest ``limit`` conversations (all if None).
+
+        ``before`` is an ``(updated_at, id)`` cursor; ``title_prefix``
+        filters titles case-insensitively.
+        """
+
+        where, params = self._where(before, title_prefix)
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT id, title, updated_at, created_at FROM conversations "
+                f"{where}ORDER BY updated_at DESC, id DESC LIMIT ?",
+                (*params, -1 if limit is None else limit),
+            ).fetchall()
+        return [
+            {"id": id_, "title": title, "updated_at": updated, "created_at": created}
+            for id_, title, updated, created in rows
+        ]
+
+    def count_conversations(self, title_prefix=None):
+        where, params = self._where(None, title_prefix)
+        with self._lock:
+            (count,) = self._db.execute(
+                f"SELECT COUNT(*) FROM conversations {where}", params
+            ).fetchone()
+        return count
+
+    def _header(self, conversation_id):
+        row = self._db.execute(
+            "SELECT id, title, created_at, updated_at FROM conversations "
+            "WHERE id = ?",
+            (conversation_id,),
+        ).fetchone()
+        if row is None:
+            return None
+        id_, title, created, updated = row
+        return {"id": id_, "title": title, "created_at": created, "updated_at": updated}
+
+    def load_title(self, conversation_id):
+        with self._lock:
+            row = self._db.execute(
+                "SELECT title FROM conversations WHERE id = ?", (conversation_id,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def load_conversation(self, conversation_id):
+        with self._lock:
+            record = self._header(conversation_id)
+            if record is None:
+                return None
+            rows = self._db.execute(
+                "SELECT role, content, extra FROM messages "
+                "WHERE conversation_id = ? ORDER BY seq",
+                (conversation_id,),
+            ).fetchall()
+        record["messages"] = [_message(row) for row in rows]
+        return record
+
+    @contextmanager
+    def _transaction(self):
+        self._db.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            self._db.execute("ROLLBACK")
+            raise
+        self._db.execute("COMMIT")
+
+    def _replace(self, record):
+        """Write ``record`` (header and all messages); call in a transaction."""
+
+        self._db.execute(
+            "INSERT INTO conversations "
+            "(id, title, created_at, updated_at, title_key) "
+            "VALUES (?, ?, ?, ?, ?) ON CONFLICT (id) DO UPDATE SET "
+            "title = excluded.title, updated_at = excluded.updated_at, "
+            "title_key = excluded.title_key",
+            (
+                record["id"],
+                record["title"],
+                record["created_at"],
+                record["updated_at"],
+                record["title"].lower(),
+            ),
+        )
+        self._db.execute(
+            "DELETE FROM messages WHERE conversation_id = ?", (record["id"],)
+        )
+        self._db.executemany(
+            "INSERT INTO messages VALUES (?, ?, ?, ?, ?)",
+            [
+                _message_row(record["id"], seq, message)
+                for seq, message in enumerate(record["messages"])
+            ],
+        )
+
+    def _save_turn(
+        self, conversation_id, user_message, assistant_message, history
+    ):
+        """Append one turn; call in a transaction. Returns the metadata."""
+
+        turn = turn_messages(user_message, assistant_message)
+        now = now_iso()
+        record = self._header(conversation_id)
+        if record is None:
+            record = {
+                "id": conversation_id,
+                "title": conversation_title(
+                    reply_text(assistant_message), user_message
+                ),
+                "created_at": now,
+                "updated_at": now,
+                "messages": history + turn,
+            }
+            self._replace(record)
+            del record["messages"]
+            return record
+
+        record["updated_at"] = now
+        self._db.execute(
+            "UPDATE conversations SET updated_at = ? WHERE id = ?",
+            (now, conversation_id),
+        )
+        (next_seq,) = self._db.execute(
+            "SELECT COALESCE(MAX(seq) + 1, 0) FROM messages "
+            "WHERE conversation_id = ?",
+            (conversation_id,),
+        ).fetchone()
+        self._db.executemany(
+            "INSERT INTO messages VALUES (?, ?, ?, ?, ?)",
+            [
+                _message_row(conversation_id, next_seq + offset, message)
+                for offset, message in enumerate(turn)
+            ],
+        )
+        return record
+
+    def save_conversation(
+        self, conversation_id, user_message, assistant_message, history
+    ):
+        """Append one turn; ``history`` only seeds a new conversation.
+
+        Returns the conversation's metadata (no messages).
+        """
+
+        with self._lock, self._transaction():
+            return self._save_turn(
+                conversation_id or uuid.uuid4().hex,
+                user_message,
+                assistant_message,
+                history,
+            )
+
+    def save_turns(self, turns):
+        """Save a batch of turns, in order, in a single transaction.
+
+        Each turn is ``(conversation_id, user_message, assistant_message,
+        history)``.
+        """
+
+        with self._lock, self._transaction():
+            for turn in turns:
+                self._save_turn(*turn)
+
+    def import_record(self, record):
+        """Store a record from another backend as-is, timestamps included."""
+
+        created = record.get("created_at") or now_iso()
+        with self._lock, self._transaction():
+            self._replace(
+                {
+                    "id": record["id"],
+                    "title": record.get("title") or "New chat",
+                    "created_at": created,
+                    "updated_at": record.get("updated_at") or created,
+                    "messages": record.get("messages") or [],
+                }
+            )
+
+    def update_conversation_title(self, conversation_id, title):
+        if not title:
+            raise ValueError("title must not be empty")
+        with self._lock:
+            updated = self._db.execute(
+                "UPDATE conversations SET title = ?, title_key = ?, updated_at = ? "
+                "WHERE id = ?",
+                (title, title.lower(), now_iso(), conversation_id),
+            ).rowcount
+            if not updated:
+                return None
+            return self._header(conversation_id)
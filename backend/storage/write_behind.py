@@ -0,0 +1,214 @@
+import logging
+import math
+import queue
+import threading
+import time
+from collections import OrderedDict, deque
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+def _percentile(ordered, fraction):
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, max(0, math.ceil(fraction * len(ordered)) - 1))
+    return ordered[index]
+
+
+def _summary(samples):
+    ordered = sorted(samples)
+    return {
+        "mean": sum(ordered) / len(ordered) if ordered else 0.0,
+        "p50": _percentile(ordered, 0.5),
+        "p95": _percentile(ordered, 0.95),
+        "max": ordered[-1] if ordered else 0.0,
+    }
+
+
+class WriteBehindQueue:
+    """Save conversation turns on a background thread.
+
+    ``submit`` only enqueues; a writer thread drains whatever is queued (up
+    to ``max_batch`` turns) and hands it to ``store.save_turns`` in one
+    call, so turns for the same conversation share one append and one
+    fsync. Turns are written in submission order. The queue holds at most
+    ``max_pending`` turns; past that ``submit`` waits for the writer (or,
+    with ``block=False``, raises ``queue.Full``). ``flush`` blocks until
+    everything submitted so far is written, and ``close`` flushes and stops
+    the thread.
+
+    The queue also keeps the titles of the ``max_titles`` most recently
+    used conversations, filled on submit, ``remember`` and ``lookup_title``,
+    so callers on the event loop can usually answer with a title without
+    touching the store.
+    """
+
+    def __init__(
+        self, store, max_pending=1024, max_batch=64, samples=1024, max_titles=4096
+    ):
+        self._store = store
+        self._max_batch = max_batch
+        self._queue: queue.Queue = queue.Queue(max_pending)
+        self._submit_lock = threading.Lock()
+        self._done = threading.Condition()
+        self._submitted = 0
+        self._written = 0
+        self._closed = False
+        self._stats = {
+            "batches": 0,
+            "coalesced": 0,
+            "errors": 0,
+            "full_waits": 0,
+        }
+        self._batch_seconds: deque[float] = deque(maxlen=samples)
+        self._latency_seconds: deque[float] = deque(maxlen=samples)
+        self._max_titles = max_titles
+        self._titles: OrderedDict[str, str] = OrderedDict()
+        self._titles_lock = threading.Lock()
+        self._thread = threading.Thread(
+            target=self._run, name="conversation-writer", daemon=True
+        )
+        self._thread.start()
+
+    def title(self, conversation_id):
+        """The conversation's cached title, or None; never blocks."""
+
+        with self._titles_lock:
+            title = self._titles.get(conversation_id)
+            if title is not None:
+                self._titles.move_to_end(conversation_id)
+            return title
+
+    def lookup_title(self, conversation_id):
+        """The conversation's title from the cache or the store, or None.
+
+        Blocks on the store; turns still queued are written first if the
+        store does not know the conversation yet.
+        """
+
+        title = self.title(conversation_id)
+        if title is None:
+            title = self._store.load_title(conversation_id)
+        if title is None and self._written < self._submitted:
+            self.flush()
+            title = self._store.load_title(conversation_id)
+        if title is not None:
+            self._cache_title(conversation_id, title)
+        return title
+
+    def remember(self, metadata):
+        self._cache_title(metadata["id"], metadata.get("title"), replace=True)
+
+    def _cache_title(self, conversation_id, title, replace=False):
+        if title is None:
+            return
+        with self._titles_lock:
+            if replace or conversation_id not in self._titles:
+                self._titles[conversation_id] = title
+            self._titles.move_to_end(conversation_id)
+            while len(self._titles) > self._max_titles:
+                self._titles.popitem(last=False)
+
+    def submit(
+        self,
+        conversation_id,
+        user_message,
+        assistant_message,
+        history,
+        title=None,
+        block=True,
+    ):
+        turn = (conversation_id, user_message, assistant_message, history)
+        waited = False
+        while True:
+            # The lock is never held while waiting, so a full queue cannot
+            # stall a non-blocking submitter behind a blocking one.
+            with self._submit_lock:
+                if self._closed:
+                    raise RuntimeError("write-behind queue is closed")
+                try:
+                    self._queue.put_nowait(
+                        (self._submitted + 1, time.perf_counter(), turn)
+                    )
+                except queue.Full:
+                    if not block:
+                        raise
+                    if not waited:
+                        waited = True
+                        self._stats["full_waits"] += 1
+                else:
+                    self._submitted += 1
+                    self._cache_title(conversation_id, title)
+                    return
+            self._wait_for_space()
+
+    def _wait_for_space(self, timeout=None):
+        with self._done:
+            return self._done.wait_for(lambda: not self._queue.full(), timeout)
+
+    def flush(self, timeout=None):
+        """Wait until every turn submitted before this call is written."""
+
+        target = self._submitted
+        with self._done:
+            return self._done.wait_for(lambda: self._written >= target, timeout)
+
+    def close(self):
+        with self._submit_lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put(_STOP)
+        self._thread.join()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                return
+            batch = [item]
+            stop = False
+            while len(batch) < self._max_batch:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stop = True
+                    break
+                batch.append(item)
+            self._write(batch)
+            if stop:
+                return
+
+    def _write(self, batch):
+        turns = [turn for _, _, turn in batch]
+        started = time.perf_counter()
+        try:
+            self._store.save_turns(turns)
+        except Exception:  # noqa: BLE001
+            logger.exception("Failed to save %d conversation turn(s).", len(turns))
+            self._stats["errors"] += len(turns)
+        finished = time.perf_counter()
+        with self._done:
+            self._stats["batches"] += 1
+            self._stats["coalesced"] += len(turns) - len({t[0] for t in turns})
+            self._batch_seconds.append(finished - started)
+            self._latency_seconds.extend(
+                finished - submitted_at for _, submitted_at, _ in batch
+            )
+            self._written = batch[-1][0]
+            self._done.notify_all()
+
+    def stats(self):
+        with self._done:
+            return {
+                "queue_depth": self._queue.qsize(),
+                "submitted": self._submitted,
+                "written": self._written,
+                **self._stats,
+                "batch_write_seconds": _summary(self._batch_seconds),
+                "durable_latency_seconds": _summary(self._latency_seconds),
+            }
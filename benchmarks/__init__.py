@@ -0,0 +1 @@
+"""Benchmarks and stress drivers for the Lexi backend."""
@@ -0,0 +1,217 @@
+"""End-to-end SSE latency of ``backend.main:app`` on the stub engine.
+
+Usage: ``python -m benchmarks.bench_e2e [--mode single|compare|both]
+[--levels 1,2,4,8,16,32,64] [--url http://host:port] [--json report.json]``
+
+Without ``--url`` the app is started in-process with ``ENGINE_BACKEND =
+"stub"`` and conversations are written to a temporary directory; with
+``--url`` point it at a server started as ``LEXAI_ENGINE=stub uvicorn
+backend.main:app``. For each concurrency level the report gives time to
+first token, inter-token latency, SSE bytes per generated token and
+throughput. The highest level whose p95 TTFT stays under ``--ttft-slo``
+without errors is reported as the max sustainable concurrency.
+"""
+
+import argparse
+import asyncio
+import json
+import socket
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import httpx
+
+
+def _percentile(values, fraction):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def _start_server(args):
+    import uvicorn
+
+    from backend import config, storage
+
+    config.ENGINE_BACKEND = "stub"
+    config.STUB_ENGINE_PROFILE.update(
+        prefill_seconds=args.prefill_seconds,
+        token_seconds=args.token_seconds,
+        think_tokens=args.think_tokens,
+        answer_tokens=args.answer_tokens,
+    )
+    log_dir = Path(tempfile.mkdtemp(prefix="lexai-bench-"))
+    config.CHAT_LOG_DIR = log_dir
+    config.SQLITE_DB_PATH = log_dir / "conversations.sqlite3"
+    storage.use_store(None)
+
+    from backend.main import app
+
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    server = uvicorn.Server(
+        uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning")
+    )
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return f"http://127.0.0.1:{port}", server
+
+
+async def _one_request(client, url, mode, index):
+    payload = {
+        "message": f"전세 보증금 반환 절차가 궁금합니다. ({index})",
+        "model_variant": "compare" if mode == "compare" else "finetuned",
+    }
+    started = time.perf_counter()
+    token_times = []
+    total_bytes = 0
+    completion_tokens = 0
+    buffer = b""
+    async with client.stream("POST", url + "/chat/stream", json=payload) as response:
+        response.raise_for_status()
+        async for raw in response.aiter_raw():
+            now = time.perf_counter()
+            total_bytes += len(raw)
+            buffer += raw
+            *frames, buffer = buffer.split(b"\n\n")
+            for frame in frames:
+                # Frames carry an ``id:`` line before their ``data:`` line.
+                data = None
+                for line in frame.decode("utf-8").splitlines():
+                    if line.startswith("data:"):
+                        data = line[5:].strip()
+                if data is None or data == "[DONE]":
+                    continue
+                event = json.loads(data)
+                if event["type"] == "delta":
+                    token_times.append(now)
+                elif event["type"] == "error":
+                    raise RuntimeError(event.get("message"))
+                elif event["type"] == "final":
+                    if mode == "compare":
+                        usages = [v.get("usage") for v in event["variants"].values()]
+                    else:
+                        usages = [event.get("usage")]
+                    completion_tokens = sum(
+                        (usage or {}).get("completion_tokens") or 0 for usage in usages
+                    )
+    return {
+        "ttft": token_times[0] - started if token_times else None,
+        "itl": [b - a for a, b in zip(token_times, token_times[1:])],
+        "bytes": total_bytes,
+        "tokens": completion_tokens,
+        "elapsed": time.perf_counter() - started,
+    }
+
+
+async def _run_level(url, mode, concurrency, requests):
+    semaphore = asyncio.Semaphore(concurrency)
+    errors = []
+
+    async def worker(client, index):
+        async with semaphore:
+            try:
+                return await _one_request(client, url, mode, index)
+            except Exception as exc:  # noqa: BLE001
+                errors.append(repr(exc))
+                return None
+
+    limits = httpx.Limits(max_connections=concurrency)
+    timeout = httpx.Timeout(120.0)
+    started = time.perf_counter()
+    async with httpx.AsyncClient(limits=limits, timeout=timeout) as client:
+        results = await asyncio.gather(
+            *(worker(client, index) for index in range(requests))
+        )
+    wall = time.perf_counter() - started
+    results = [result for result in results if result is not None]
+
+    ttft = [result["ttft"] for result in results if result["ttft"] is not None]
+    itl = [gap for result in results for gap in result["itl"]]
+    tokens = sum(result["tokens"] for result in results)
+    sse_bytes = sum(result["bytes"] for result in results)
+    return {
+        "mode": mode,
+        "concurrency": concurrency,
+        "requests": requests,
+        "errors": len(errors),
+        "ttft_p50": _percentile(ttft, 0.5),
+        "ttft_p95": _percentile(ttft, 0.95),
+        "itl_p50": _percentile(itl, 0.5),
+        "itl_p95": _percentile(itl, 0.95),
+        "sse_bytes_per_token": sse_bytes / tokens if tokens else None,
+        "requests_per_second": len(results) / wall,
+        "first_error": errors[0] if errors else None,
+    }
+
+
+def _fmt(value, unit="s"):
+    if value is None:
+        return "-"
+    return f"{value * 1000:.1f}ms" if unit == "s" else f"{value:.1f}"
+
+
+def run(url, mode, levels, requests_per_level, ttft_slo):
+    rows = []
+    sustainable = 0
+    for concurrency in levels:
+        requests = max(requests_per_level, concurrency * 2)
+        row = asyncio.run(_run_level(url, mode, concurrency, requests))
+        rows.append(row)
+        print(
+            f"{mode:<8} c={concurrency:<4} ttft p50 {_fmt(row['ttft_p50']):>9} "
+            f"p95 {_fmt(row['ttft_p95']):>9} | itl p50 {_fmt(row['itl_p50']):>8} "
+            f"p95 {_fmt(row['itl_p95']):>8} | "
+            f"{_fmt(row['sse_bytes_per_token'], 'b'):>6} B/token | "
+            f"{row['requests_per_second']:.1f} req/s | errors {row['errors']}"
+        )
+        if row["errors"] or row["ttft_p95"] is None or row["ttft_p95"] > ttft_slo:
+            break
+        sustainable = concurrency
+    print(f"{mode:<8} max sustainable concurrency: {sustainable}")
+    return {"mode": mode, "levels": rows, "max_sustainable_concurrency": sustainable}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", help="Benchmark a running server instead")
+    parser.add_argument(
+        "--mode", choices=("single", "compare", "both"), default="both"
+    )
+    parser.add_argument("--levels", default="1,2,4,8,16,32,64")
+    parser.add_argument("--requests-per-level", type=int, default=16)
+    parser.add_argument("--ttft-slo", type=float, default=0.5)
+    parser.add_argument("--prefill-seconds", type=float, default=0.02)
+    parser.add_argument("--token-seconds", type=float, default=0.01)
+    parser.add_argument("--think-tokens", type=int, default=24)
+    parser.add_argument("--answer-tokens", type=int, default=160)
+    parser.add_argument("--json", help="Write the full report to this file")
+    args = parser.parse_args()
+
+    url = args.url.rstrip("/") if args.url else _start_server(args)[0]
+    levels = [int(level) for level in args.levels.split(",")]
+    modes = ("single", "compare") if args.mode == "both" else (args.mode,)
+    report = {
+        "url": url,
+        "stub": {
+            "prefill_seconds": args.prefill_seconds,
+            "token_seconds": args.token_seconds,
+            "think_tokens": args.think_tokens,
+            "answer_tokens": args.answer_tokens,
+        },
+        "results": [
+            run(url, mode, levels, args.requests_per_level, args.ttft_slo)
+            for mode in modes
+        ],
+    }
+    if args.json:
+        Path(args.json).write_text(json.dumps(report, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""Per-turn prompt-build time as a conversation grows.
+
+Usage: ``python -m benchmarks.bench_prompt_build [--turns 100]``
+
+Needs ``transformers`` and the tokenizer files in ``local_model/``. Each
+turn builds the prompt token ids twice: once by templating and tokenizing
+the whole history (the old ``_prepare_prompt`` plus vLLM tokenization) and
+once through ``ConversationPromptCache``. The cached column should stay
+flat from 2 to 100 turns.
+"""
+
+import argparse
+import time
+from types import SimpleNamespace
+
+from transformers import AutoTokenizer
+
+from backend import config
+from backend.services.prompt_cache import ConversationPromptCache
+
+QUESTION = "전세 계약이 끝났는데 집주인이 보증금을 돌려주지 않으면 어떻게 해야 하나요? "
+ANSWER = (
+    "임대차 계약이 종료되면 임대인은 보증금을 반환할 의무가 있습니다. "
+    "먼저 내용증명을 보내고, 임차권등기명령을 신청하는 방법을 고려해 보세요. "
+) * 8
+
+
+def _full_build(tokenizer, history, user_message):
+    messages = [{"role": "system", "content": config.SYSTEM_PROMPT}]
+    messages.extend({"role": msg.role, "content": msg.content} for msg in history)
+    messages.append({"role": "user", "content": user_message})
+    prompt = tokenizer.apply_chat_template(
+        messages, tokenize=False, add_generation_prompt=True
+    )
+    return tokenizer(prompt, add_special_tokens=False)["input_ids"]
+
+
+def _timed(fn, repeats):
+    best = float("inf")
+    for _ in range(repeats):
+        started = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--turns", type=int, default=100)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--tokenizer", default=str(config.FINETUNED_WEIGHTS_PATH))
+    args = parser.parse_args()
+
+    tokenizer = AutoTokenizer.from_pretrained(args.tokenizer)
+    cache = ConversationPromptCache(tokenizer, config.SYSTEM_PROMPT)
+    history = []
+    report_at = {2, 5, 10, 20, 50, args.turns}
+
+    print(f"{'turn':>5} {'prompt tokens':>14} {'full ms':>10} {'cached ms':>10}")
+    for turn in range(1, args.turns + 1):
+        question = f"{turn}. {QUESTION}"
+        full_time, full_ids = _timed(
+            lambda: _full_build(tokenizer, history, question), args.repeats
+        )
+        # Only the first build per turn sees new messages; repeats hit the
+        # already-extended entry, so time the real incremental build once.
+        started = time.perf_counter()
+        cached_ids = cache.build("bench", history, question)
+        cached_time = time.perf_counter() - started
+        assert cached_ids == full_ids, f"token mismatch at turn {turn}"
+        if turn in report_at:
+            print(
+                f"{turn:>5} {len(full_ids):>14} "
+                f"{full_time * 1e3:>10.2f} {cached_time * 1e3:>10.2f}"
+            )
+        history.append(SimpleNamespace(role="user", content=question))
+        history.append(SimpleNamespace(role="assistant", content=ANSWER))
+
+
+if __name__ == "__main__":
+    main()
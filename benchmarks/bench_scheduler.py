@@ -0,0 +1,115 @@
+"""Compare FCFS and priority scheduling on a mixed short/long workload.
+
+Usage: ``python -m benchmarks.bench_scheduler [--long 20] [--short 40]
+[--max-running 8]``
+
+A stub engine charges every step for the prompt tokens it prefills, so long
+conversations are expensive to admit. Long requests arrive first, short first
+questions trickle in behind them; the report shows time to first token per
+request kind for both policies.
+"""
+
+import argparse
+import asyncio
+import time
+from types import SimpleNamespace
+
+from backend.services.scheduler import RequestScheduler
+from backend.services.step_loop import EngineStepLoop
+
+from .bench_step_loop import StubLLMEngine
+
+
+class PrefillStubEngine(StubLLMEngine):
+    def __init__(self, tokens_per_request, step_delay, prefill_seconds_per_token):
+        super().__init__(tokens_per_request, step_delay=step_delay)
+        self.prefill_seconds_per_token = prefill_seconds_per_token
+        self._prefill_tokens = 0
+
+    def add_request(self, request_id, prompt, params, **kwargs):
+        super().add_request(request_id, prompt, params, **kwargs)
+        self._prefill_tokens += len(prompt["prompt_token_ids"])
+
+    def step(self):
+        if self._prefill_tokens:
+            time.sleep(self._prefill_tokens * self.prefill_seconds_per_token)
+            self._prefill_tokens = 0
+        return super().step()
+
+
+def _percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+async def _workload(loop, long_requests, short_requests, long_tokens, short_gap):
+    ttft: dict[str, list[float]] = {"long": [], "short": []}
+
+    async def consume(kind, request_id, prompt_tokens):
+        started = time.perf_counter()
+        first = None
+        prompt = {"prompt_token_ids": [0] * prompt_tokens}
+        async for _ in loop.astream(request_id, prompt, None):
+            if first is None:
+                first = time.perf_counter() - started
+        ttft[kind].append(first)
+
+    tasks = [
+        asyncio.create_task(consume("long", f"long-{idx}", long_tokens))
+        for idx in range(long_requests)
+    ]
+    for idx in range(short_requests):
+        await asyncio.sleep(short_gap)
+        tasks.append(asyncio.create_task(consume("short", f"short-{idx}", 200)))
+    await asyncio.gather(*tasks)
+    return ttft
+
+
+def run(policy, args):
+    if policy == "fcfs":
+        scheduler = RequestScheduler(max_running=args.max_running)
+    else:
+        scheduler = RequestScheduler(
+            max_running=args.max_running,
+            seconds_per_prompt_token=0.0005,
+            max_length_penalty=10.0,
+        )
+    engine = PrefillStubEngine(
+        args.tokens, args.step_delay, args.prefill_seconds_per_token
+    )
+    loop = EngineStepLoop(engine, name=policy, scheduler=scheduler)
+    ttft = asyncio.run(
+        _workload(loop, args.long, args.short, args.long_tokens, args.short_gap)
+    )
+    loop.close()
+    report = SimpleNamespace(
+        **{
+            f"{kind}_{name}": _percentile(values, fraction)
+            for kind, values in ttft.items()
+            for name, fraction in (("p50", 0.5), ("p95", 0.95))
+        }
+    )
+    print(
+        f"{policy:<9} short ttft p50 {report.short_p50:6.3f}s "
+        f"p95 {report.short_p95:6.3f}s | long ttft p50 {report.long_p50:6.3f}s "
+        f"p95 {report.long_p95:6.3f}s"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--long", type=int, default=20)
+    parser.add_argument("--short", type=int, default=40)
+    parser.add_argument("--long-tokens", type=int, default=16000)
+    parser.add_argument("--tokens", type=int, default=50)
+    parser.add_argument("--max-running", type=int, default=8)
+    parser.add_argument("--step-delay", type=float, default=0.002)
+    parser.add_argument("--prefill-seconds-per-token", type=float, default=2e-6)
+    parser.add_argument("--short-gap", type=float, default=0.005)
+    args = parser.parse_args()
+    for policy in ("fcfs", "priority"):
+        run(policy, args)
+
+
+if __name__ == "__main__":
+    main()
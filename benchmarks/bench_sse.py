@@ -0,0 +1,111 @@
+"""Per-token cost of encoding SSE delta events.
+
+Usage: ``python -m benchmarks.bench_sse [--tokens 2000]``
+
+Encodes the delta events of one streamed answer two ways: the old
+``json.dumps`` of a freshly built dict per token and ``sse_event`` (the
+fast JSON backend on the same dict). Both must produce the same JSON
+objects. Costs are reported per token for the whole answer.
+"""
+
+import argparse
+import json
+import time
+
+from backend import config
+from backend.sse import orjson, sse_event
+
+TOKENS = [
+    "임대", "차", " 계약", "이 ", "종료", "되면", " 보증금",
+    "을 ", "반환", "받을 ", "수", " 있습니다", ".\n",
+]
+
+
+def _deltas(tokens):
+    text = ""
+    for idx in range(tokens):
+        delta = TOKENS[idx % len(TOKENS)]
+        text += delta
+        yield text, delta, idx == tokens - 1
+
+
+def _old(events):
+    frames = []
+    for text, delta, finished in events:
+        payload = {
+            "type": "delta",
+            "mode": "single",
+            "variant": "finetuned",
+            "model": config.MODEL_DISPLAY_NAME,
+            "text": text,
+            "delta": delta,
+            "finished": finished,
+            "usage": None,
+            "thinking": False,
+        }
+        frames.append(f"data: {json.dumps(payload, ensure_ascii=False)}\n\n")
+    return frames
+
+
+def _fast_dict(events):
+    frames = []
+    for text, delta, finished in events:
+        frames.append(
+            sse_event(
+                {
+                    "type": "delta",
+                    "mode": "single",
+                    "variant": "finetuned",
+                    "model": config.MODEL_DISPLAY_NAME,
+                    "text": text,
+                    "delta": delta,
+                    "finished": finished,
+                    "usage": None,
+                    "thinking": False,
+                }
+            )
+        )
+    return frames
+
+
+def _timed(fn, events, repeats):
+    best = float("inf")
+    for _ in range(repeats):
+        started = time.perf_counter()
+        frames = fn(events)
+        best = min(best, time.perf_counter() - started)
+    return best, frames
+
+
+def _decoded(frames):
+    return [json.loads(frame[len("data: ") :]) for frame in frames]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tokens", type=int, default=2000)
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    events = list(_deltas(args.tokens))
+    print(f"JSON backend: {'orjson' if orjson is not None else 'json'}")
+    reference = None
+    for name, fn in (
+        ("json.dumps per event", _old),
+        ("sse_event per event", _fast_dict),
+    ):
+        elapsed, frames = _timed(fn, events, args.repeats)
+        decoded = _decoded(frames)
+        if reference is None:
+            reference = decoded
+        assert decoded == reference, f"{name} produced different events"
+        per_token = elapsed / args.tokens * 1e6
+        total_bytes = sum(len(frame.encode("utf-8")) for frame in frames)
+        print(
+            f"{name:<22} {per_token:8.2f} us/token  "
+            f"{total_bytes / args.tokens:8.1f} bytes/token"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+"""Drive ``EngineStepLoop`` with many concurrent streams against a stub engine.
+
+Usage: ``python -m benchmarks.bench_step_loop [--streams 50] [--tokens 200]
+[--mode thread|async]``
+
+The stub mimics the parts of vLLM's ``LLMEngine`` the loop relies on and
+fails loudly if it is touched from more than one thread. Every stream must
+receive all of its tokens, in order, for the run to pass.
+"""
+
+import argparse
+import asyncio
+import threading
+import time
+from types import SimpleNamespace
+
+from backend.services.step_loop import EngineStepLoop
+
+
+class StubLLMEngine:
+    def __init__(self, tokens_per_request, max_num_seqs=256, step_delay=0.0):
+        self.tokens_per_request = tokens_per_request
+        self.max_num_seqs = max_num_seqs
+        self.step_delay = step_delay
+        self.requests: dict[str, list[int]] = {}
+        self.steps = 0
+        self.batch_sizes: list[int] = []
+        self._owner = None
+
+    def _check_thread(self):
+        current = threading.get_ident()
+        if self._owner is None:
+            self._owner = current
+        assert self._owner == current, "engine used from several threads"
+
+    def add_request(self, request_id, prompt, params, **kwargs):
+        self._check_thread()
+        self.requests[request_id] = []
+
+    def abort_request(self, request_ids):
+        self._check_thread()
+        for request_id in request_ids:
+            self.requests.pop(request_id, None)
+
+    def has_unfinished_requests(self):
+        self._check_thread()
+        return bool(self.requests)
+
+    def step(self):
+        self._check_thread()
+        if self.step_delay:
+            time.sleep(self.step_delay)
+        self.steps += 1
+        running = list(self.requests.items())[: self.max_num_seqs]
+        self.batch_sizes.append(len(running))
+        outputs = []
+        for request_id, token_ids in running:
+            token_ids.append(len(token_ids))
+            finished = len(token_ids) >= self.tokens_per_request
+            completion = SimpleNamespace(
+                text="".join(f"t{tok} " for tok in token_ids),
+                token_ids=list(token_ids),
+                finished=lambda done=finished: done,
+            )
+            outputs.append(
+                SimpleNamespace(
+                    request_id=request_id,
+                    outputs=[completion],
+                    prompt_token_ids=[0],
+                    finished=finished,
+                )
+            )
+            if finished:
+                del self.requests[request_id]
+        return outputs
+
+
+def _run_threads(loop, streams):
+    results: dict[str, list[int]] = {}
+    errors: list[BaseException] = []
+    barrier = threading.Barrier(streams)
+
+    def consume(idx):
+        request_id = f"req-{idx}"
+        received = []
+        try:
+            barrier.wait()
+            for output in loop.stream(request_id, "prompt", None):
+                received = output.outputs[0].token_ids
+        except BaseException as exc:  # noqa: BLE001
+            errors.append(exc)
+        results[request_id] = received
+
+    threads = [
+        threading.Thread(target=consume, args=(idx,)) for idx in range(streams)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, errors
+
+
+def _run_async(loop, streams):
+    results: dict[str, list[int]] = {}
+    errors: list[BaseException] = []
+
+    async def consume(idx):
+        request_id = f"req-{idx}"
+        received = []
+        try:
+            async for output in loop.astream(request_id, "prompt", None):
+                received = output.outputs[0].token_ids
+        except BaseException as exc:  # noqa: BLE001
+            errors.append(exc)
+        results[request_id] = received
+
+    async def consume_all():
+        await asyncio.gather(*(consume(idx) for idx in range(streams)))
+
+    asyncio.run(consume_all())
+    return results, errors
+
+
+def run(streams, tokens, step_delay, mode="thread"):
+    engine = StubLLMEngine(tokens, step_delay=step_delay)
+    loop = EngineStepLoop(engine, name="bench")
+    started = time.perf_counter()
+    if mode == "async":
+        results, errors = _run_async(loop, streams)
+    else:
+        results, errors = _run_threads(loop, streams)
+    elapsed = time.perf_counter() - started
+    loop.close()
+
+    expected = list(range(tokens))
+    incomplete = [rid for rid, ids in results.items() if ids != expected]
+    assert not errors, errors
+    assert len(results) == streams, "some streams never returned"
+    assert not incomplete, f"{len(incomplete)} streams lost tokens"
+
+    peak_batch = max(engine.batch_sizes, default=0)
+    print(f"mode:             {mode}")
+    print(f"streams:          {streams}")
+    print(f"tokens/stream:    {tokens}")
+    print(f"engine steps:     {engine.steps}")
+    print(f"peak batch size:  {peak_batch}")
+    print(f"elapsed:          {elapsed:.3f}s")
+    print(f"aggregate tok/s:  {streams * tokens / elapsed:,.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--streams", type=int, default=50)
+    parser.add_argument("--tokens", type=int, default=200)
+    parser.add_argument("--step-delay", type=float, default=0.001)
+    parser.add_argument("--mode", choices=("thread", "async"), default="thread")
+    args = parser.parse_args()
+    run(args.streams, args.tokens, args.step_delay, args.mode)
+
+
+if __name__ == "__main__":
+    main()
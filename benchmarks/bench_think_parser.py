@@ -0,0 +1,84 @@
+"""Per-token cost of think-tag handling as a streamed answer grows.
+
+Usage: ``python -m benchmarks.bench_think_parser [--tokens 8192]``
+
+Compares the old approach (``strip_think_tag`` over the cumulative output
+and a prefix diff on every step) with ``ThinkStreamParser`` fed one token
+at a time. Costs are reported per 1k-token window; the parser's column
+should stay flat while the rescan column grows with the answer.
+"""
+
+import argparse
+import time
+
+from backend.services.think_parser import ThinkStreamParser, strip_think_tag
+
+TOKENS = [
+    "임대", "차", " 계약", "이 ", "종료", "되면", " 보증금",
+    "을 ", "반환", "받을 ", "수", " 있습니다", ".\n",
+]
+
+
+def _token_stream(total, think_tokens):
+    yield "<think>\n"
+    for idx in range(think_tokens):
+        yield TOKENS[idx % len(TOKENS)]
+    yield "\n</think>\n\n"
+    for idx in range(total - think_tokens - 2):
+        yield TOKENS[idx % len(TOKENS)]
+
+
+def _rescan(tokens, window):
+    timings = []
+    raw_text = ""
+    last_clean_text = ""
+    started = time.perf_counter()
+    for idx, token in enumerate(tokens, 1):
+        raw_text += token
+        clean_text = strip_think_tag(raw_text)
+        if clean_text.startswith(last_clean_text):
+            delta = clean_text[len(last_clean_text) :]
+        else:
+            delta = clean_text
+        last_clean_text = clean_text
+        if idx % window == 0:
+            timings.append(time.perf_counter() - started)
+            started = time.perf_counter()
+    return timings, delta
+
+
+def _incremental(tokens, window):
+    timings = []
+    parser = ThinkStreamParser()
+    started = time.perf_counter()
+    for idx, token in enumerate(tokens, 1):
+        delta, reasoning = parser.feed(token)
+        if idx % window == 0:
+            timings.append(time.perf_counter() - started)
+            started = time.perf_counter()
+    parser.close()
+    return timings, delta
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tokens", type=int, default=8192)
+    parser.add_argument("--think-tokens", type=int, default=1024)
+    parser.add_argument("--window", type=int, default=1024)
+    args = parser.parse_args()
+
+    tokens = list(_token_stream(args.tokens, args.think_tokens))
+    rescan, _ = _rescan(tokens, args.window)
+    incremental, _ = _incremental(tokens, args.window)
+
+    print(f"{'tokens':>12} {'rescan us/tok':>15} {'parser us/tok':>15}")
+    for idx, (old, new) in enumerate(zip(rescan, incremental), 1):
+        upper = idx * args.window
+        print(
+            f"{upper - args.window:>5}-{upper:<6} "
+            f"{old / args.window * 1e6:>15.2f} {new / args.window * 1e6:>15.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
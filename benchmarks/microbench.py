@@ -0,0 +1,302 @@
+"""Microbenchmarks for the backend's pure-Python hot paths.
+
+Usage::
+
+    python -m benchmarks.microbench --save benchmarks/microbench_baseline.json
+    python -m benchmarks.microbench --compare benchmarks/microbench_baseline.json \
+        [--threshold 0.15] [--only storage]
+
+Each case is a ``(name, factory)`` pair; the factory does any set-up and
+returns the callable to time. Each case is timed with an auto-ranged loop
+count, repeated, and the best time per call is kept. ``--save`` writes the
+results as a baseline; ``--compare`` prints the ratio against a baseline
+and exits with status 1 if any case is slower by more than
+``--threshold``. Baselines are machine-specific, so compare runs against
+one saved on the same host.
+
+Storage cases run against ``--conversations`` synthetic conversations in a
+temporary directory, once per storage backend (``storage.*`` is the JSON
+backend, ``storage.sqlite.*`` the SQLite one). Prompt-build cases need the
+tokenizer in ``local_model/`` and are skipped when ``transformers`` is not
+installed.
+"""
+
+import argparse
+import json
+import platform
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from types import SimpleNamespace
+
+from backend import config, storage
+from backend.schemas import ChatRequest
+from backend.sse import sse_event
+from backend.services.think_parser import strip_think_tag
+
+QUESTION = "전세 계약이 끝났는데 집주인이 보증금을 돌려주지 않으면 어떻게 해야 하나요?"
+ANSWER = (
+    "임대차 계약이 종료되면 임대인은 보증금을 반환할 의무가 있습니다. "
+    "먼저 내용증명을 보내고, 임차권등기명령을 신청하는 방법을 고려해 보세요. "
+) * 8
+
+
+def _history(turns):
+    history = []
+    for turn in range(turns):
+        history.append({"role": "user", "content": f"{turn}. {QUESTION}"})
+        history.append({"role": "assistant", "content": ANSWER})
+    return history
+
+
+def _think_output(chars):
+    think = "<think>\n사용자가 보증금 반환 절차를 묻고 있다.\n</think>\n\n"
+    return think + (ANSWER * (chars // len(ANSWER) + 1))[:chars]
+
+
+def _think_cases():
+    for chars in (1_000, 10_000, 100_000):
+        text = _think_output(chars)
+        yield (
+            f"think.strip_think_tag[{chars // 1000}k]",
+            lambda text=text: lambda: strip_think_tag(text),
+        )
+
+
+def _sse_cases():
+    for chars in (100, 4_000):
+        event = {
+            "type": "delta",
+            "mode": "single",
+            "variant": "finetuned",
+            "model": config.MODEL_DISPLAY_NAME,
+            "text": _think_output(chars),
+            "delta": "보증금을 ",
+            "finished": False,
+            "usage": None,
+            "thinking": False,
+        }
+        yield (
+            f"sse.delta_payload[{chars}]",
+            lambda event=event: lambda: sse_event(event),
+        )
+
+
+def _prompt_cases():
+    state = {}
+
+    def setup():
+        if not state:
+            from transformers import AutoTokenizer
+
+            from backend.services.prompt_cache import ConversationPromptCache
+
+            tokenizer = AutoTokenizer.from_pretrained(
+                str(config.FINETUNED_WEIGHTS_PATH)
+            )
+            state["cache"] = ConversationPromptCache(tokenizer, config.SYSTEM_PROMPT)
+        return state["cache"]
+
+    def build(turns, conversation_id):
+        def make():
+            cache = setup()
+            history = [SimpleNamespace(**msg) for msg in _history(turns)]
+            cache.build(conversation_id, history, QUESTION)
+            return lambda: cache.build(conversation_id, history, QUESTION)
+
+        return make
+
+    for turns in (10, 50):
+        yield f"prompt.build_cold[{turns} turns]", build(turns, None)
+        yield f"prompt.build_cached[{turns} turns]", build(turns, f"warm-{turns}")
+
+
+def _storage_cases(conversations, backend):
+    # Files are only created once a storage case is actually run.
+    state = {}
+    prefix = "storage" if backend == "json" else f"storage.{backend}"
+
+    def setup():
+        if not state:
+            path = Path(tempfile.mkdtemp(prefix="lexai-microbench-"))
+            if backend == "sqlite":
+                path = path / "conversations.sqlite3"
+            store = state["store"] = storage.open_store(backend, path)
+            history = state["history"] = _history(5)
+            state["ids"] = [
+                store.save_conversation(None, QUESTION, ANSWER, history)["id"]
+                for _ in range(conversations)
+            ]
+            state["long_history"] = _history(20)
+            state["long_id"] = store.save_conversation(
+                None, QUESTION, ANSWER, state["long_history"]
+            )["id"]
+        return state
+
+    def load():
+        store, ids = setup()["store"], state["ids"]
+        conversation_id = ids[conversations // 2]
+        return lambda: store.load_conversation(conversation_id)
+
+    def save_append():
+        store, long_id = setup()["store"], state["long_id"]
+        long_history = state["long_history"]
+        return lambda: store.save_conversation(
+            long_id, QUESTION, ANSWER, long_history
+        )
+
+    def save_new():
+        store, history = setup()["store"], state["history"]
+        return lambda: store.save_conversation(None, QUESTION, ANSWER, history)
+
+    def list_all():
+        return setup()["store"].list_conversations
+
+    def list_newest():
+        store = setup()["store"]
+        return lambda: store.list_conversations(20)
+
+    def list_page():
+        # The second page of a sidebar search, plus its total count.
+        store = setup()["store"]
+        query = store.list_conversations(1)[0]["title"][:1]
+        first = store.list_conversations(20, None, query)
+        before = (first[-1]["updated_at"], first[-1]["id"])
+
+        def run():
+            store.list_conversations(20, before, query)
+            store.count_conversations(query)
+
+        return run
+
+    yield f"{prefix}.list[{conversations}]", list_all
+    yield f"{prefix}.list_newest[20]", list_newest
+    yield f"{prefix}.list_page[20, q]", list_page
+    yield f"{prefix}.load", load
+    yield f"{prefix}.save_append[20 turns]", save_append
+    # Last: every call adds a conversation.
+    yield f"{prefix}.save_new", save_new
+
+
+def _schema_cases():
+    for turns in (10, 100):
+        payload = {
+            "message": QUESTION,
+            "history": _history(turns),
+            "model_variant": "finetuned",
+        }
+        yield (
+            f"schema.chat_request[{turns * 2} messages]",
+            lambda payload=payload: lambda: ChatRequest.model_validate(payload),
+        )
+
+
+def _time_per_call(fn, repeats, min_seconds):
+    loops = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        elapsed = time.perf_counter() - started
+        if elapsed >= min_seconds:
+            break
+        loops *= 2 if elapsed < min_seconds / 4 else 1 + int(min_seconds / elapsed)
+    best = elapsed / loops
+    for _ in range(repeats - 1):
+        started = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        best = min(best, (time.perf_counter() - started) / loops)
+    return best
+
+
+def _format(seconds):
+    if seconds >= 1e-3:
+        return f"{seconds * 1e3:9.2f} ms"
+    return f"{seconds * 1e6:9.2f} us"
+
+
+def _cases(conversations):
+    yield from _think_cases()
+    yield from _sse_cases()
+    yield from _prompt_cases()
+    yield from _schema_cases()
+    for backend in storage.STORAGE_BACKENDS:
+        yield from _storage_cases(conversations, backend)
+
+
+def run(args):
+    results = {}
+    for name, make in _cases(args.conversations):
+        if args.only and args.only not in name:
+            continue
+        try:
+            fn = make()
+        except ImportError as exc:
+            print(f"{name:<36} skipped ({exc})", file=sys.stderr)
+            continue
+        results[name] = _time_per_call(fn, args.repeats, args.min_seconds)
+        print(f"{name:<36} {_format(results[name])}", flush=True)
+    return results
+
+
+def compare(results, baseline, threshold):
+    regressions = []
+    print(f"\n{'case':<36} {'baseline':>12} {'current':>12} {'ratio':>7}")
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            print(f"{name:<36} {'-':>12} {_format(current)} {'new':>7}")
+            continue
+        ratio = current / previous
+        flag = ""
+        if ratio > 1 + threshold:
+            flag = "  SLOWER"
+            regressions.append(name)
+        print(
+            f"{name:<36} {_format(previous)} {_format(current)} {ratio:6.2f}x{flag}"
+        )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--save", help="Write results as a baseline file")
+    parser.add_argument("--compare", help="Baseline file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.15)
+    parser.add_argument("--only", help="Only run cases whose name contains this")
+    parser.add_argument("--conversations", type=int, default=10_000)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--min-seconds", type=float, default=0.2)
+    args = parser.parse_args()
+
+    results = run(args)
+    if args.save:
+        Path(args.save).write_text(
+            json.dumps(
+                {
+                    "created_at": datetime.now(timezone.utc).isoformat(),
+                    "host": platform.node(),
+                    "python": platform.python_version(),
+                    "results": results,
+                },
+                indent=2,
+                ensure_ascii=False,
+            ),
+            encoding="utf-8",
+        )
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text(encoding="utf-8"))
+        regressions = compare(results, baseline["results"], args.threshold)
+        if regressions:
+            print(
+                f"\n{len(regressions)} case(s) slower than baseline by more than "
+                f"{args.threshold:.0%}: {', '.join(regressions)}"
+            )
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
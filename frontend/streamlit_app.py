@@ -1,6 +1,8 @@
 import base64
 import json
 import os
+import time
+import zlib
 from html import escape as html_escape
 from pathlib import Path
 
@@ -23,6 +25,11 @@ MODEL_VARIANT_OPTIONS = {
 COMPARISON_VARIANTS = ["finetuned", "baseline"]
 DEFAULT_MODEL_VARIANT = "finetuned"
 MAX_TOKEN_FINISH_REASONS = {"length", "max_tokens", "token_limit"}
+# 2 = delta-only frames; _DeltaAssembler rebuilds the cumulative text.
+STREAM_PROTOCOL_VERSION = 2
+# Reconnects to GET /chat/stream/{id} after the connection drops mid-answer.
+STREAM_RESUME_ATTEMPTS = 3
+CONVERSATION_PAGE_SIZE = 30
 
 if LOGO_PATH.exists():
     logo_bytes = LOGO_PATH.read_bytes()
@@ -81,6 +88,12 @@ def init_state():
         st.session_state.conversation_list = []
     if "conversations_loaded" not in st.session_state:
         st.session_state.conversations_loaded = False
+    if "conversation_cursor" not in st.session_state:
+        st.session_state.conversation_cursor = None
+    if "conversation_total" not in st.session_state:
+        st.session_state.conversation_total = 0
+    if "conversation_query" not in st.session_state:
+        st.session_state.conversation_query = ""
     if "rename_target" not in st.session_state:
         st.session_state.rename_target = None
     if "conversation_search" not in st.session_state:
@@ -410,35 +423,120 @@ def render_session_panel():
     )
 
 
+class _DeltaAssembler:
+    """Turn protocol v2 delta frames back into cumulative delta events.
+
+    Frames that carry ``offset``/``checksum`` are checked against the
+    reassembled answer; after a mismatch the variant's deltas are dropped
+    and its text comes from the ``final`` event instead.
+    """
+
+    def __init__(self):
+        self._variants = {}
+
+    def apply(self, event):
+        if event.get("type") != "delta" or "text" in event:
+            return event
+        state = self._variants.setdefault(
+            event.get("variant"),
+            {"text": "", "think": "", "thinking": True, "crc": 0, "broken": False},
+        )
+        if state["broken"]:
+            return None
+        delta = event.get("delta") or ""
+        state["text"] += delta
+        state["crc"] = zlib.crc32(delta.encode("utf-8"), state["crc"])
+        state["think"] += event.get("reasoning") or ""
+        if "thinking" in event:
+            state["thinking"] = bool(event["thinking"])
+        if "offset" in event and (
+            event["offset"] != len(state["text"])
+            or event.get("checksum") != f"{state['crc']:08x}"
+        ):
+            state["broken"] = True
+            return None
+        return {
+            **event,
+            "text": state["text"],
+            "thinking": state["thinking"],
+            "think_text": state["think"] if state["thinking"] else None,
+        }
+
+
+def _sse_events(response):
+    """Yield ``(event_id, event)``; ``event`` is None for ``[DONE]``."""
+
+    event_id = None
+    for raw_line in response.iter_lines(decode_unicode=True):
+        if not raw_line:
+            continue
+        if raw_line.startswith("id:"):
+            event_id = raw_line[3:].strip()
+            continue
+        if not raw_line.startswith("data:"):
+            continue
+        data = raw_line[5:].strip()
+        if not data:
+            continue
+        if data == "[DONE]":
+            yield event_id, None
+            return
+        try:
+            event = json.loads(data.lstrip())
+        except json.JSONDecodeError:
+            continue
+        yield event_id, event
+
+
 def stream_backend(prompt, history, conversation_id, model_variant):
     payload = {
         "conversation_id": conversation_id,
         "message": prompt,
         "history": history,
         "model_variant": model_variant,
+        "protocol_version": STREAM_PROTOCOL_VERSION,
+        "resumable": True,
     }
-    with requests.post(
+    assembler = _DeltaAssembler()
+    response = requests.post(
         f"{BACKEND_URL}/chat/stream",
         json=payload,
         stream=True,
         timeout=None,
-    ) as response:
-        response.raise_for_status()
-        for raw_line in response.iter_lines(decode_unicode=True):
-            if not raw_line:
-                continue
-            if not raw_line.startswith("data:"):
-                continue
-            data = raw_line[5:].strip()
-            if not data:
-                continue
-            if data == "[DONE]":
-                break
+    )
+    generation_id = response.headers.get("X-Generation-Id")
+    last_event_id = 0
+    attempt = 0
+    while True:
+        with response:
+            response.raise_for_status()
             try:
-                event = json.loads(data.lstrip())
-            except json.JSONDecodeError:
-                continue
-            yield event
+                for event_id, event in _sse_events(response):
+                    if event_id:
+                        last_event_id = int(event_id)
+                    if event is None:
+                        return
+                    event = assembler.apply(event)
+                    if event is not None:
+                        yield event
+            except (
+                requests.ConnectionError,
+                requests.exceptions.ChunkedEncodingError,
+            ):
+                if not generation_id or attempt >= STREAM_RESUME_ATTEMPTS:
+                    raise
+        # The connection ended before [DONE]; the backend keeps generating,
+        # so pick the stream up after the last event we saw.
+        if not generation_id or attempt >= STREAM_RESUME_ATTEMPTS:
+            return
+        attempt += 1
+        time.sleep(0.5 * attempt)
+        response = requests.get(
+            f"{BACKEND_URL}/chat/stream/{generation_id}",
+            headers={"Last-Event-ID": str(last_event_id)},
+            stream=True,
+            timeout=None,
+        )
 
 
 def handle_user_prompt(prompt, conversation_placeholder):
@@ -468,13 +566,12 @@ def handle_user_prompt(prompt, conversation_placeholder):
     assistant_placeholders: dict[str, dict] = {}
     placeholder_stack: list[dict] = []
 
-    for variant in variant_sequence:
-        label = MODEL_VARIANT_OPTIONS.get(variant, variant)
+    def add_placeholder(variant, label=None):
         placeholder = {
             "role": "assistant",
             "content": "",
             "variant": variant if variant != "compare" else None,
-            "variant_label": label,
+            "variant_label": label or MODEL_VARIANT_OPTIONS.get(variant, variant),
             "turn_id": turn_id,
             "pending": True,
             "thinking": True,
@@ -485,6 +582,16 @@ def handle_user_prompt(prompt, conversation_placeholder):
         assistant_placeholders[variant] = placeholder
         placeholder_stack.append(placeholder)
 
+    def drop_placeholder(variant):
+        placeholder = assistant_placeholders.pop(variant, None)
+        if placeholder is None:
+            return
+        placeholder_stack.remove(placeholder)
+        st.session_state.messages.remove(placeholder)
+
+    for variant in variant_sequence:
+        add_placeholder(variant)
+
     primary_assistant = placeholder_stack[0] if placeholder_stack else None
     render_conversation(conversation_placeholder)
 
@@ -509,6 +616,11 @@ def handle_user_prompt(prompt, conversation_placeholder):
                             "model": event.get("model", "미상"),
                         }
                     ]
+                if start_mode == "compare":
+                    # The backend may compare more variants than we expected.
+                    for entry in variant_models:
+                        if entry.get("variant") not in assistant_placeholders:
+                            add_placeholder(entry.get("variant"), entry.get("model"))
                 if start_mode == "compare" and variant_models:
                     display_model = " vs ".join(
                         entry.get("model", entry.get("variant", ""))
@@ -547,6 +659,22 @@ def handle_user_prompt(prompt, conversation_placeholder):
                     if finish_reason:
                         target["finish_reason"] = finish_reason
                     render_conversation(conversation_placeholder)
+            elif event_type == "variant_final":
+                # One compare variant is done; the others may still stream.
+                variant = event.get("variant")
+                target = assistant_placeholders.get(variant)
+                if target is not None:
+                    target["content"] = event.get("reply") or target["content"]
+                    target["finish_reason"] = event.get("finish_reason")
+                    target["pending"] = False
+                    target.pop("think_text", None)
+                    target["thinking"] = False
+                st.session_state.session_meta["compare_usage"][variant] = {
+                    "model": event.get("model"),
+                    "usage": event.get("usage"),
+                    "finish_reason": event.get("finish_reason"),
+                }
+                render_conversation(conversation_placeholder)
             elif event_type == "final":
                 variant = event.get("variant", selected_variant)
                 mode = event.get("mode", "single")
@@ -615,7 +743,16 @@ def handle_user_prompt(prompt, conversation_placeholder):
                 render_conversation(conversation_placeholder)
                 break
             elif event_type == "error":
-                st.error(event.get("message", "스트리밍 중 오류가 발생했습니다."))
+                variant = event.get("variant")
+                message = event.get("message", "스트리밍 중 오류가 발생했습니다.")
+                if event.get("mode") == "compare" and variant:
+                    # Only this variant failed; keep the others streaming.
+                    label = MODEL_VARIANT_OPTIONS.get(variant, variant)
+                    st.warning(f"{label}: {message}")
+                    drop_placeholder(variant)
+                    render_conversation(conversation_placeholder)
+                    continue
+                st.error(message)
                 stream_failed = True
                 break
     except requests.RequestException as exc:
@@ -630,15 +767,49 @@ def handle_user_prompt(prompt, conversation_placeholder):
             refresh_conversation_list()
 
 
-def refresh_conversation_list():
+def refresh_conversation_list(more=False):
+    """Fetch the first page of conversations, or with ``more`` the next one.
+
+    A refresh reloads as many conversations as are already shown; the
+    search box is sent as a title prefix (``q``).
+    """
+
+    query = (st.session_state.get("conversation_search") or "").strip()
+    params = {"fields": "id,title,updated_at"}
+    if query:
+        params["q"] = query
+    if more:
+        if not st.session_state.conversation_cursor:
+            return
+        params["cursor"] = st.session_state.conversation_cursor
+        params["limit"] = CONVERSATION_PAGE_SIZE
+    else:
+        shown = len(st.session_state.conversation_list)
+        if query != st.session_state.conversation_query:
+            shown = 0
+        params["limit"] = max(CONVERSATION_PAGE_SIZE, shown)
     try:
-        response = requests.get(f"{BACKEND_URL}/conversations", timeout=10)
+        response = requests.get(
+            f"{BACKEND_URL}/conversations", params=params, timeout=10
+        )
         response.raise_for_status()
     except requests.RequestException:
         return
-    st.session_state.conversation_list = response.json()
+    page = response.json()
+    if more:
+        st.session_state.conversation_list = [
+            *st.session_state.conversation_list,
+            *page,
+        ]
+    else:
+        st.session_state.conversation_list = page
+    st.session_state.conversation_cursor = response.headers.get("X-Next-Cursor")
+    st.session_state.conversation_total = int(
+        response.headers.get("X-Total-Count") or len(page)
+    )
+    st.session_state.conversation_query = query
     st.session_state.conversations_loaded = True
-    for conv in st.session_state.conversation_list:
+    for conv in page:
         conv_id = conv.get("id")
         if not conv_id:
             continue
@@ -671,7 +842,17 @@ def load_conversation(conversation_id):
         st.error(f"대화 로드 실패: {exc}")
         return
     record = response.json()
-    st.session_state.messages = record.get("messages") or []
+    messages = record.get("messages") or []
+    turn_id = 0
+    for message in messages:
+        if message.get("role") == "user":
+            turn_id += 1
+        message["turn_id"] = turn_id
+        if message.get("variant"):
+            message["variant_label"] = MODEL_VARIANT_OPTIONS.get(
+                message["variant"], message.get("model")
+            )
+    st.session_state.messages = messages
     st.session_state.conversation_id = record.get("id")
     st.session_state.disclaimer = st.session_state.disclaimer or ""
     preview_title = _derive_title_from_record(record)
@@ -724,7 +905,10 @@ def main():
     theme_style_slot = st.empty()
     init_state()
 
-    if not st.session_state.conversations_loaded:
+    if not st.session_state.conversations_loaded or (
+        (st.session_state.get("conversation_search") or "").strip()
+        != st.session_state.conversation_query
+    ):
         refresh_conversation_list()
 
     current_theme = st.session_state.ui_theme
@@ -792,7 +976,7 @@ def main():
             if not conversations:
                 empty_message = (
                     "검색 결과가 없습니다."
-                    if st.session_state.conversation_list
+                    if st.session_state.conversation_list or search_term
                     else "저장된 대화가 없습니다."
                 )
                 st.caption(empty_message)
@@ -835,6 +1019,17 @@ def main():
                         ):
                             cancel_rename()
                     row.markdown("</div>", unsafe_allow_html=True)
+            if st.session_state.conversation_cursor:
+                remaining = st.session_state.conversation_total - len(
+                    st.session_state.conversation_list
+                )
+                if st.button(
+                    f"더 보기 ({remaining})",
+                    key="conv-more",
+                    use_container_width=True,
+                ):
+                    refresh_conversation_list(more=True)
+                    st.rerun()
             st.markdown("</div>", unsafe_allow_html=True)
     current_title = st.session_state.get("current_title", "New chat")
 
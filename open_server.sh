@@ -1,3 +1,6 @@
 #!/bin/bash
-rm -rf chat_logs/*
-uvicorn backend.main:app --port 9000
\ No newline at end of file
+# ./open_server.sh --reset clears saved conversations (chat_logs/) first.
+if [ "$1" = "--reset" ]; then
+    rm -rf chat_logs/*
+fi
+uvicorn backend.main:app --port 9000
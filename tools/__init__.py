@@ -0,0 +1 @@
+"""Standalone operational tools for the Lexi backend."""
@@ -0,0 +1,247 @@
+"""Load a running backend with concurrent /chat/stream requests.
+
+Usage: ``python -m tools.loadgen [--url http://localhost:9000]
+[--variant finetuned|baseline|compare] [--ramp 1,2,4,8,16,32]
+[--step-seconds 30] [--protocol-version 1|2] [--prompts questions.txt]
+[--output run.json]``
+
+Each ramp step keeps ``concurrency`` closed-loop clients busy for
+``--step-seconds``; all clients share one keep-alive connection pool. SSE
+events are parsed the way ``stream_backend`` in the frontend parses them.
+Per step the report has TTFT p50/p95/p99, per-stream and aggregate tokens
+per second, error and rejection rates, and disconnects (streams that ended
+before ``[DONE]``). The JSON written with ``--output`` can be diffed between
+runs.
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import platform
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import httpx
+
+DEFAULT_PROMPTS = (
+    "전세 계약이 끝났는데 집주인이 보증금을 돌려주지 않아요. 어떻게 해야 하나요?",
+    "회사에서 갑자기 해고 통보를 받았습니다. 부당해고인지 알고 싶어요.",
+    "중고 거래로 산 물건이 설명과 다릅니다. 환불을 요구할 수 있나요?",
+    "층간소음 문제로 이웃과 분쟁 중입니다. 법적으로 할 수 있는 조치가 있나요?",
+    "교통사고 합의금은 어떻게 산정되나요?",
+)
+
+
+def _percentile(values, fraction):
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, math.ceil(fraction * len(ordered)) - 1))
+    return ordered[index]
+
+
+def _summary(values):
+    return {
+        "p50": _percentile(values, 0.50),
+        "p95": _percentile(values, 0.95),
+        "p99": _percentile(values, 0.99),
+    }
+
+
+async def _sse_events(response):
+    """Yield events like the frontend's ``stream_backend`` does."""
+
+    async for raw_line in response.aiter_lines():
+        if not raw_line or not raw_line.startswith("data:"):
+            continue
+        data = raw_line[5:].strip()
+        if not data:
+            continue
+        if data == "[DONE]":
+            yield None
+            return
+        try:
+            yield json.loads(data.lstrip())
+        except json.JSONDecodeError:
+            continue
+
+
+async def _one_request(client, url, variant, prompt, protocol_version):
+    result = {"status": "ok", "ttft": None, "tokens": 0, "stream_seconds": None}
+    payload = {
+        "message": prompt,
+        "history": [],
+        "model_variant": variant,
+        "protocol_version": protocol_version,
+    }
+    started = time.perf_counter()
+    first_token = None
+    done = False
+    try:
+        async with client.stream("POST", url + "/chat/stream", json=payload) as response:
+            if response.status_code in (429, 503):
+                result["status"] = "rejected"
+                return result
+            response.raise_for_status()
+            async for event in _sse_events(response):
+                if event is None:
+                    done = True
+                    break
+                kind = event.get("type")
+                if kind == "delta" and first_token is None:
+                    first_token = time.perf_counter()
+                elif kind == "error":
+                    result["status"] = "error"
+                    result["error"] = event.get("message")
+                elif kind == "final":
+                    if event.get("mode") == "compare":
+                        usages = [
+                            data.get("usage")
+                            for data in (event.get("variants") or {}).values()
+                        ]
+                    else:
+                        usages = [event.get("usage")]
+                    result["tokens"] = sum(
+                        (usage or {}).get("completion_tokens") or 0
+                        for usage in usages
+                    )
+    except (httpx.RemoteProtocolError, httpx.ReadError):
+        result["status"] = "disconnect"
+        return result
+    except httpx.HTTPError as exc:
+        result["status"] = "error"
+        result["error"] = repr(exc)
+        return result
+
+    finished = time.perf_counter()
+    if not done and result["status"] == "ok":
+        result["status"] = "disconnect"
+    if first_token is not None:
+        result["ttft"] = first_token - started
+        result["stream_seconds"] = finished - first_token
+    return result
+
+
+async def _run_step(
+    client, url, variant, prompts, concurrency, seconds, protocol_version
+):
+    deadline = time.perf_counter() + seconds
+    results = []
+
+    async def worker(offset):
+        index = offset
+        while time.perf_counter() < deadline:
+            prompt = prompts[index % len(prompts)]
+            index += concurrency
+            results.append(
+                await _one_request(client, url, variant, prompt, protocol_version)
+            )
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(offset) for offset in range(concurrency)))
+    wall = time.perf_counter() - started
+
+    ok = [result for result in results if result["status"] == "ok"]
+    counts = {
+        status: sum(result["status"] == status for result in results)
+        for status in ("ok", "error", "rejected", "disconnect")
+    }
+    total = len(results)
+    per_stream = [
+        result["tokens"] / result["stream_seconds"]
+        for result in ok
+        if result["stream_seconds"]
+    ]
+    errors = [result["error"] for result in results if result.get("error")]
+    return {
+        "concurrency": concurrency,
+        "wall_seconds": wall,
+        "requests": total,
+        **counts,
+        "error_rate": counts["error"] / total if total else 0.0,
+        "rejection_rate": counts["rejected"] / total if total else 0.0,
+        "ttft_seconds": _summary([r["ttft"] for r in ok if r["ttft"] is not None]),
+        "stream_tokens_per_second": _summary(per_stream),
+        "aggregate_tokens_per_second": sum(r["tokens"] for r in ok) / wall,
+        "sample_errors": errors[:5],
+    }
+
+
+def _fmt_ms(value):
+    return "-" if value is None else f"{value * 1000:.0f}ms"
+
+
+async def run(args, prompts):
+    ramp = [int(level) for level in args.ramp.split(",")]
+    limits = httpx.Limits(
+        max_connections=max(ramp), max_keepalive_connections=max(ramp)
+    )
+    timeout = httpx.Timeout(args.timeout, connect=10.0)
+    steps = []
+    async with httpx.AsyncClient(limits=limits, timeout=timeout) as client:
+        for concurrency in ramp:
+            step = await _run_step(
+                client,
+                args.url,
+                args.variant,
+                prompts,
+                concurrency,
+                args.step_seconds,
+                args.protocol_version,
+            )
+            steps.append(step)
+            ttft = step["ttft_seconds"]
+            print(
+                f"c={concurrency:<4} req {step['requests']:<5} "
+                f"ttft p50 {_fmt_ms(ttft['p50']):>7} p95 {_fmt_ms(ttft['p95']):>7} "
+                f"p99 {_fmt_ms(ttft['p99']):>7} | "
+                f"{step['aggregate_tokens_per_second']:8.1f} tok/s | "
+                f"err {step['error']} rej {step['rejected']} "
+                f"disc {step['disconnect']}",
+                flush=True,
+            )
+    return steps
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="http://localhost:9000")
+    parser.add_argument(
+        "--variant", choices=("finetuned", "baseline", "compare"), default="finetuned"
+    )
+    parser.add_argument("--ramp", default="1,2,4,8,16,32")
+    parser.add_argument("--step-seconds", type=float, default=30.0)
+    parser.add_argument("--timeout", type=float, default=300.0)
+    parser.add_argument("--protocol-version", type=int, choices=(1, 2), default=1)
+    parser.add_argument("--prompts", help="Text file with one prompt per line")
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    args = parser.parse_args()
+    args.url = args.url.rstrip("/")
+
+    prompts = list(DEFAULT_PROMPTS)
+    if args.prompts:
+        lines = Path(args.prompts).read_text(encoding="utf-8").splitlines()
+        prompts = [line.strip() for line in lines if line.strip()]
+
+    started_at = datetime.now(timezone.utc).isoformat()
+    steps = asyncio.run(run(args, prompts))
+    report = {
+        "started_at": started_at,
+        "host": platform.node(),
+        "url": args.url,
+        "variant": args.variant,
+        "protocol_version": args.protocol_version,
+        "step_seconds": args.step_seconds,
+        "prompts": len(prompts),
+        "steps": steps,
+    }
+    if args.output:
+        Path(args.output).write_text(
+            json.dumps(report, indent=2, ensure_ascii=False), encoding="utf-8"
+        )
+
+
+if __name__ == "__main__":
+    main()
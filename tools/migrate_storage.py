@@ -0,0 +1,57 @@
+"""Copy JSON conversation logs into the SQLite conversation store.
+
+Usage: ``python -m tools.migrate_storage [--source chat_logs]
+[--target chat_logs/conversations.sqlite3]``
+
+Every conversation in ``--source`` (``*.jsonl`` logs and older ``*.json``
+files) is imported with its id, title, timestamps and messages unchanged;
+conversations already in the database are overwritten, so the tool can be
+re-run after more JSON logs were written. Conversations that cannot be read
+are reported and skipped. Set ``STORAGE_BACKEND = "sqlite"`` (or
+``LEXAI_STORAGE=sqlite``) afterwards to serve from the database.
+"""
+
+import argparse
+import sys
+
+from backend import config
+from backend.storage import JsonConversationStore, SqliteConversationStore
+
+
+def migrate(source, target):
+    source_store = JsonConversationStore(source)
+    store = SqliteConversationStore(target)
+    imported, skipped = 0, []
+    try:
+        for summary in source_store.list_conversations():
+            conversation_id = summary.get("id")
+            try:
+                record = source_store.load_conversation(conversation_id)
+                if record is None:
+                    raise ValueError("conversation file disappeared")
+                store.import_record(record)
+            except (ValueError, KeyError, TypeError) as exc:
+                skipped.append((conversation_id, str(exc)))
+                continue
+            imported += 1
+    finally:
+        store.close()
+    return imported, skipped
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--source", default=str(config.CHAT_LOG_DIR))
+    parser.add_argument("--target", default=str(config.SQLITE_DB_PATH))
+    args = parser.parse_args()
+
+    imported, skipped = migrate(args.source, args.target)
+    for name, reason in skipped:
+        print(f"skipped {name}: {reason}", file=sys.stderr)
+    print(f"Imported {imported} conversation(s) into {args.target}")
+    if skipped:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()